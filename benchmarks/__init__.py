@@ -0,0 +1,12 @@
+"""
+benchmarks for trml2pdf
+
+    python -m benchmarks run -o results.json
+    python -m benchmarks compare baseline.json results.json
+
+``run`` times every phase of the rendering (parse, styles, story, layout
+passes, save) for the documents in ``examples/`` and for the synthetic
+workloads in :mod:`benchmarks.synthetic`, and records pages per second and
+the peak resident set size. ``compare`` reports the cases that got slower or
+bigger than a stored baseline.
+"""
@@ -0,0 +1,55 @@
+import sys
+
+import click
+
+from . import runner
+
+BASELINE = str(runner.ROOT_DIR / 'benchmarks' / 'baseline.json')
+
+
+@click.group()
+def main():
+    pass
+
+
+def _print_result(name, result):
+    if 'error' in result:
+        click.echo('%-28s %s' % (name, result['error']))
+        return
+    phases = ' '.join('%s=%.3f' % (k, v) for k, v in result['phases'].items())
+    click.echo('%-28s total=%.3fs pages=%d pages/s=%.1f passes=%d rss=%.1fMB  %s' % (
+        name, result['total'], result['pages'], result['pages_per_sec'] or 0,
+        result['passes'], result['peak_rss'] / 2.0**20, phases))
+
+
+@main.command()
+@click.option('-k', '--filter', 'pattern', default='*', help='glob for the case names, e.g. "synthetic:*"')
+@click.option('-r', '--repeat', default=3, help='renders per case, the median is reported')
+@click.option('-s', '--scale', default=1.0, help='size factor for the synthetic workloads')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='write the results as json')
+@click.option('--save-baseline', is_flag=True, help='store the results as the baseline')
+def run(pattern, repeat, scale, output, save_baseline):
+    """time all benchmark cases"""
+    results = runner.run(pattern, repeat, scale, log=_print_result)
+    if output:
+        runner.dump(results, output)
+    if save_baseline:
+        runner.dump(results, BASELINE)
+
+
+@main.command()
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('-b', '--baseline', default=BASELINE, type=click.Path(exists=True, dir_okay=False))
+@click.option('-t', '--threshold', default=0.1, help='relative slowdown that counts as regression')
+def compare(current, baseline, threshold):
+    """report regressions of CURRENT against the baseline"""
+    regressions = runner.compare(runner.load(baseline), runner.load(current), threshold)
+    for name, metric, old, new, ratio in regressions:
+        click.echo('%-28s %-14s %12.4g -> %12.4g  (%+.0f%%)' % (name, metric, old, new, (ratio - 1) * 100))
+    if regressions:
+        sys.exit(1)
+    click.echo('no regressions above %.0f%%' % (threshold * 100))
+
+
+if __name__ == '__main__':
+    main()
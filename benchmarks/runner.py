@@ -0,0 +1,151 @@
+"""
+run benchmark cases and compare results
+
+every case runs in a fresh interpreter so the peak resident set size
+belongs to that case alone.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import fnmatch
+import platform
+import resource
+import statistics
+import multiprocessing
+from pathlib import Path
+
+from . import synthetic
+
+ROOT_DIR = Path(__file__).parent.parent
+EXAMPLES_DIR = ROOT_DIR / "examples"
+
+# phases shorter than this are too noisy to flag as regression
+MIN_SECONDS = 0.005
+
+
+def collect_cases(pattern='*', scale=1.0):
+    """return ``{name: (kind, argument)}`` for all cases matching ``pattern``"""
+    cases = {}
+    for path in sorted(EXAMPLES_DIR.glob('*.rml')):
+        cases['example:%s' % path.stem] = ('example', str(path))
+    for name, factory in sorted(synthetic.WORKLOADS.items()):
+        cases['synthetic:%s' % name] = ('synthetic', (name, scale))
+    return {k: v for k, v in cases.items() if fnmatch.fnmatch(k, pattern)}
+
+
+def _load(kind, argument):
+    if kind == 'example':
+        with open(argument, 'rb') as f:
+            return f.read(), os.path.dirname(argument)
+    name, scale = argument
+    factory = synthetic.WORKLOADS[name]
+    n = factory.__defaults__[0]
+    return factory(max(1, int(n * scale))), str(EXAMPLES_DIR)
+
+
+def _render(data, basepath):
+    from trml2pdf import RMLDoc
+
+    out = io.BytesIO()
+    stats = RMLDoc(data, basepath).render(out)
+    return stats, out.getvalue()
+
+
+def _run_case(kind, argument, repeat):
+    data, basepath = _load(kind, argument)
+    os.chdir(basepath)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    runs = []
+    for i in range(repeat):
+        stats, pdf = _render(data, basepath)
+        runs.append(stats)
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result = {
+        'pages': stats.pages,
+        'input_bytes': len(data),
+        'output_bytes': len(pdf),
+        'flowables': dict(stats.flowables),
+        'counters': dict(stats.counters),
+        'phases': {},
+    }
+    for phase in stats.timings:
+        if phase != 'total':
+            result['phases'][phase] = statistics.median(run.timings.get(phase, 0.0) for run in runs)
+    result['passes'] = len(stats.passes)
+    result['pass_times'] = [statistics.median(t) for t in zip(*[run.passes for run in runs])]
+    result['total'] = statistics.median(run.total for run in runs)
+    result['pages_per_sec'] = stats.pages / result['total'] if result['total'] else None
+    # ru_maxrss is in kilobytes on linux but in bytes on macos
+    unit = 1 if sys.platform == 'darwin' else 1024
+    result['peak_rss'] = rss_peak * unit
+    result['rss_growth'] = (rss_peak - rss_before) * unit
+    return result
+
+
+def run(pattern='*', repeat=3, scale=1.0, log=None):
+    """run all cases matching ``pattern`` and return the results"""
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name, (kind, argument) in collect_cases(pattern, scale).items():
+        with context.Pool(1) as pool:
+            try:
+                results[name] = pool.apply(_run_case, (kind, argument, repeat))
+            except Exception as e:
+                results[name] = {'error': '%s: %s' % (e.__class__.__name__, e)}
+        if log is not None:
+            log(name, results[name])
+    import reportlab
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'reportlab': reportlab.Version,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'scale': scale,
+        },
+        'results': results,
+    }
+
+
+def _metrics(result):
+    metrics = {'total': result.get('total')}
+    for phase, value in result.get('phases', {}).items():
+        metrics['phase:%s' % phase] = value
+    metrics['peak_rss'] = result.get('peak_rss')
+    return metrics
+
+
+def compare(baseline, current, threshold=0.1):
+    """return a list of ``(case, metric, baseline, current, ratio)`` for
+    all metrics that got worse by more than ``threshold``"""
+    regressions = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None or 'error' in base or 'error' in result:
+            continue
+        base_metrics = _metrics(base)
+        for metric, value in sorted(_metrics(result).items()):
+            old = base_metrics.get(metric)
+            if not old or value is None:
+                continue
+            if metric != 'peak_rss' and max(old, value) < MIN_SECONDS:
+                continue
+            ratio = value / old
+            if ratio > 1 + threshold:
+                regressions.append((name, metric, old, value, ratio))
+    return regressions
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def dump(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
@@ -0,0 +1,129 @@
+"""
+generators for synthetic benchmark documents
+
+every generator returns the rml document as bytes, ``n`` scales the size
+of the workload.
+"""
+
+import math
+import random
+
+HEADER = '''<?xml version="1.0" encoding="utf-8"?>
+<document>
+<template pageSize="(21cm, 29.7cm)">
+  <pageTemplate id="main">
+    <pageGraphics>
+      <setFont name="Helvetica" size="8"/>
+      %(graphics)s
+    </pageGraphics>
+    <frame id="first" x1="2cm" y1="2cm" width="17cm" height="25cm"/>
+  </pageTemplate>
+</template>
+<stylesheet>
+  <paraStyle name="body" fontName="Helvetica" fontSize="10" leading="12"/>
+  <blockTableStyle id="grid">
+    <lineStyle kind="GRID" colorName="black" thickness="0.5"/>
+    <blockFont name="Helvetica" size="8"/>
+  </blockTableStyle>
+</stylesheet>
+<story>
+'''
+
+FOOTER = '''
+</story>
+</document>
+'''
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+         'tempor incididunt ut labore et dolore magna aliqua').split()
+
+
+def _document(story, graphics=''):
+    return (HEADER % {'graphics': graphics} + story + FOOTER).encode('utf-8')
+
+
+def _sentence(rnd, words=40):
+    return ' '.join(rnd.choice(WORDS) for i in range(words))
+
+
+def paragraphs(n=2000):
+    """plain paragraphs with some inline markup"""
+    rnd = random.Random(n)
+    parts = []
+    for i in range(n):
+        parts.append('<para style="body">%d <b>%s</b> %s</para>' % (
+            i, rnd.choice(WORDS), _sentence(rnd)))
+    return _document('\n'.join(parts))
+
+
+def table(n=2000, columns=6):
+    """one long table of short numeric cells"""
+    rows = []
+    for i in range(n):
+        cells = ''.join('<td>%d.%02d</td>' % (i, j) for j in range(columns))
+        rows.append('<tr>%s</tr>' % cells)
+    return _document('<blockTable style="grid" repeatRows="1">%s</blockTable>' % '\n'.join(rows))
+
+
+def headings(n=1000):
+    """numbered headings each followed by a short paragraph"""
+    rnd = random.Random(n)
+    parts = []
+    for i in range(n):
+        level = 1 + i % 3
+        parts.append('<h%d>heading %d</h%d>' % (level, i, level))
+        parts.append('<para style="body">%s</para>' % _sentence(rnd, 15))
+    return _document('\n'.join(parts))
+
+
+def bookmarks(n=5000):
+    """outline entries between one line paragraphs"""
+    parts = []
+    for i in range(n):
+        parts.append('<bookmark level="%d" short="entry %d"/>' % (1 + i % 3, i))
+        parts.append('<para style="body">entry %d</para>' % i)
+    return _document('\n'.join(parts))
+
+
+def lines(n=5000):
+    """an illustration with a polyline of ``n`` points"""
+    points = []
+    for i in range(n):
+        x = 1 + 15.0 * i / n
+        y = 10 + 5 * math.sin(i / 50.0)
+        points.append('%.3fcm %.3fcm' % (x, y))
+    segments = []
+    for a, b in zip(points, points[1:]):
+        segments.append('%s %s' % (a, b))
+    return _document(
+        '<illustration width="17cm" height="20cm"><lines>%s</lines></illustration>'
+        % '\n'.join(segments))
+
+
+def multicolumns(n=3000):
+    """an index like list of short entries in three columns"""
+    entries = ''.join('<para style="body">entry %d, %d</para>' % (i, i * 7 % 300) for i in range(n))
+    return _document('<multicolumns n_columns="3">%s</multicolumns>' % entries)
+
+
+def page_totals(n=300):
+    """many pages with "page x of y" in the page graphics"""
+    rnd = random.Random(n)
+    parts = []
+    for i in range(n):
+        parts.append('<para style="body">%s</para>' % _sentence(rnd))
+        parts.append('<pageBreak/>')
+    graphics = ('<drawRightString x="19cm" y="1cm">page <pageNumber/> of '
+                '<totalPageNumber/></drawRightString>')
+    return _document('\n'.join(parts), graphics)
+
+
+WORKLOADS = {
+    'paragraphs': paragraphs,
+    'table': table,
+    'headings': headings,
+    'bookmarks': bookmarks,
+    'lines': lines,
+    'multicolumns': multicolumns,
+    'page_totals': page_totals,
+}
@@ -0,0 +1,29 @@
+"""rml documents for the tests"""
+
+
+def document(story, graphics='', stylesheet='', docinit='', templates=None):
+    """return an rml document of ``story`` on the page template ``main``,
+    one frame with ``graphics`` as page graphics
+
+    ``templates`` is a list of ``(id, graphics)`` for several page
+    templates, with a story of None there is no ``<story>`` tag.
+    """
+    if templates is None:
+        templates = [('main', graphics)]
+    parts = ['<?xml version="1.0" encoding="utf-8"?>', '<document>']
+    if docinit:
+        parts.append('<docinit>%s</docinit>' % docinit)
+    parts.append('<template>')
+    for name, graphics in templates:
+        parts.append('<pageTemplate id="%s">' % name)
+        if graphics:
+            parts.append('<pageGraphics>%s</pageGraphics>' % graphics)
+        parts.append('<frame id="%s" x1="2cm" y1="2cm" width="17cm" height="25cm"/>' % name)
+        parts.append('</pageTemplate>')
+    parts.append('</template>')
+    if stylesheet:
+        parts.append('<stylesheet>%s</stylesheet>' % stylesheet)
+    if story is not None:
+        parts.append('<story>%s</story>' % story)
+    parts.append('</document>')
+    return '\n'.join(parts)
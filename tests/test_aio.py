@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import unittest
+from concurrent import futures
+
+import trml2pdf
+from trml2pdf import aio
+
+from documents import document
+
+
+def long_document(paragraphs=400):
+    story = ''.join(
+        '<para>paragraph %d with some <b>bold</b> and <i>italic</i> text '
+        'that wraps over more than a single line of the frame</para>' % i
+        for i in range(paragraphs))
+    return document(story).encode('utf-8')
+
+
+class HeldExecutor(futures.ThreadPoolExecutor):
+    """renders start and then wait until ``go`` is set"""
+
+    def __init__(self):
+        super().__init__(max_workers=2)
+        self.started = threading.Event()
+        self.go = threading.Event()
+
+    def submit(self, fn, *args):
+        def held():
+            self.started.set()
+            self.go.wait()
+            return fn(*args)
+        return super().submit(held)
+
+
+class Test(unittest.TestCase):
+    """render concurrently from an event loop"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = futures.ProcessPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def run_loop(self, coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    def test_event_loop_stays_responsive(self):
+        data = long_document()
+
+        async def run():
+            renderer = aio.AsyncRenderer(self.executor)
+            ticks = []
+            done = asyncio.Event()
+
+            async def ticker():
+                while not done.is_set():
+                    ticks.append(renderer.active)
+                    await asyncio.sleep(0.001)
+
+            tick = asyncio.ensure_future(ticker())
+            pdfs = await asyncio.gather(*[renderer.render(data, '.') for i in range(4)])
+            done.set()
+            await tick
+            return pdfs, ticks
+
+        pdfs, ticks = self.run_loop(run())
+        for pdf in pdfs:
+            self.assertTrue(pdf.startswith(b'%PDF'))
+        # the loop kept running while both workers were busy
+        self.assertGreater(ticks.count(2), 1)
+
+    def test_concurrency_limit(self):
+        data = long_document(50)
+
+        async def run():
+            renderer = aio.AsyncRenderer(self.executor, max_concurrency=1)
+            seen = []
+
+            async def watch():
+                while True:
+                    seen.append(renderer.active)
+                    await asyncio.sleep(0)
+
+            watcher = asyncio.ensure_future(watch())
+            tasks = [asyncio.ensure_future(renderer.render(data, '.')) for i in range(3)]
+            await asyncio.sleep(0)
+            started = renderer.active, renderer.waiting
+            await asyncio.gather(*tasks)
+            watcher.cancel()
+            return started, seen, (renderer.active, renderer.waiting)
+
+        started, seen, finished = self.run_loop(run())
+        self.assertEqual(started, (1, 2))
+        self.assertEqual(max(seen), 1)
+        self.assertEqual(finished, (0, 0))
+
+    def test_cancel(self):
+        data = long_document(50)
+
+        async def run():
+            task = asyncio.ensure_future(trml2pdf.render_async(data, '.', executor=self.executor))
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return await trml2pdf.render_async(data, '.', executor=self.executor)
+
+        self.assertTrue(self.run_loop(run()).startswith(b'%PDF'))
+
+    def test_cancel_running(self):
+        data = long_document(5)
+        executor = HeldExecutor()
+
+        async def run():
+            renderer = aio.AsyncRenderer(executor, max_concurrency=1)
+            task = asyncio.ensure_future(renderer.render(data, '.'))
+            while not executor.started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            following = asyncio.ensure_future(renderer.render(data, '.'))
+            await asyncio.sleep(0)
+            # the cancelled render still runs and keeps its slot
+            held = renderer.active, renderer.waiting
+            executor.go.set()
+            pdf = await following
+            return held, pdf, (renderer.active, renderer.waiting)
+
+        try:
+            held, pdf, finished = self.run_loop(run())
+        finally:
+            executor.go.set()
+            executor.shutdown()
+        self.assertEqual(held, (1, 1))
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(finished, (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
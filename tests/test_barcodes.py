@@ -0,0 +1,45 @@
+import unittest
+
+from pdfrw import PdfReader
+import trml2pdf
+from trml2pdf import barcodes
+
+from documents import document
+
+DOCUMENT = document('''
+<barCode code="QR" value="ship 1" width="2cm" height="2cm"/>
+<barCode code="QR" value="ship 1" width="2cm" height="2cm"/>
+<barCode code="Extended39">abc</barCode>
+<barCode code="EAN13" value="123456789012"/>
+<pageBreak/>
+<barCode code="QR" value="ship 1" width="2cm" height="2cm"/>
+''', graphics='<barCode code="Code128" x="1cm" y="1cm" barHeight="1cm">label</barCode>')
+
+
+class Test(unittest.TestCase):
+    """barcodes on the canvas and in the story, drawn once per document"""
+
+    def test_story(self):
+        barcodes.clear_cache()
+        pdf = PdfReader(fdata=trml2pdf.parseString(DOCUMENT, '.'))
+        self.assertEqual(len(pdf.pages), 2)
+        first = pdf.pages[0].Resources.XObject
+        second = pdf.pages[1].Resources.XObject
+        # label, qr code, code 39 and ean 13 on the first page
+        self.assertEqual(len(first), 4)
+        self.assertEqual(len(second), 2)
+        for name in second:
+            self.assertIs(second[name], first[name])
+        self.assertEqual(len(barcodes._cache), 4)
+
+    def test_key(self):
+        qr = barcodes.key_get(trml2pdf.Story().add('barCode', code='QR', width='2cm'), 'x')
+        self.assertEqual(qr, ('QR', 'x', (('width', 2 * 72 / 2.54),)))
+        self.assertEqual(barcodes.size_get(qr)[0], 2 * 72 / 2.54)
+        self.assertEqual(barcodes.key_get(trml2pdf.Story().add('barCode'), 'x')[0], 'Code128')
+        with self.assertRaises(ValueError):
+            barcodes.barcode_get(('Nope', 'x', ()))
+
+
+if __name__ == "__main__":
+    unittest.main()
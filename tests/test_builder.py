@@ -0,0 +1,76 @@
+import os
+import unittest
+
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+STYLESHEET = '''
+  <blockTableStyle id="grid"><lineStyle kind="GRID" colorName="black" thickness="0.5"/></blockTableStyle>
+  <paraStyle name="body" fontName="Helvetica" fontSize="10"/>
+'''
+
+RML = document('''
+<h1 key="first">Chapter &amp; one</h1>
+<para style="body" spaceAfter="6">a <b>bold</b> &amp; <i>italic</i> text</para>
+<spacer length="1cm"/>
+<blockTable style="grid" colWidths="5cm,3cm" repeatRows="1">
+<tr><td>name</td><td>price</td></tr>
+<tr><td>a &lt; b</td><td>1.50</td></tr>
+<tr><td><para style="body">nested</para></td><td/></tr>
+</blockTable>
+<ul><li>one</li><li>two</li></ul>
+<pageBreak/>
+<h2>Second</h2>
+<pdfpage file="ex2.pdf" width="10cm" height="10cm"/>
+''', stylesheet=STYLESHEET)
+
+
+def build():
+    story = trml2pdf.Story()
+    story.h1('Chapter & one', key='first')
+    story.para('a <b>bold</b> &amp; <i>italic</i> text', style='body', spaceAfter=6)
+    story.spacer(length='1cm')
+    table = story.blockTable(style='grid', colWidths='5cm,3cm', repeatRows=1)
+    table.row('name', 'price')
+    table.row('a < b', '1.50')
+    tr = table.tr()
+    tr.td().para('nested', style='body')
+    tr.td()
+    ul = story.ul()
+    ul.li('one')
+    ul.li('two')
+    story.pageBreak()
+    story.h2('Second')
+    story.pdfpage(file='ex2.pdf', width='10cm', height='10cm')
+    return story
+
+
+class Test(unittest.TestCase):
+    """build the story from python instead of xml"""
+
+    def setUp(self):
+        self.invariant = rl_config.invariant
+        rl_config.invariant = 1
+        self.basepath = os.path.join(os.path.dirname(__file__), '..', 'examples')
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+
+    def test_identical(self):
+        parsed = trml2pdf.parseString(RML, self.basepath)
+        built = trml2pdf.parseString(document(None, stylesheet=STYLESHEET), self.basepath, story=build())
+        self.assertEqual(parsed, built)
+
+    def test_tostring(self):
+        story = trml2pdf.Story()
+        para = story.para('x ')
+        para.add('font', 'a & b', color='red "x"').tail = ' <y>'
+        para.add('br')
+        self.assertEqual(''.join(child.tostring() for child in para),
+                         '<font color="red &quot;x&quot;">a &amp; b</font> &lt;y&gt;<br/>')
+
+
+if __name__ == '__main__':
+    unittest.main()
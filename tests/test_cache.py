@@ -0,0 +1,89 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from pathlib import Path
+import trml2pdf
+from trml2pdf.cache import ResultCache
+
+from documents import document
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+DOCUMENT = document('<para>%s</para><pdfpage file="page.pdf" width="5cm" height="5cm"/>')
+
+IMAGES = document('<image file="logo.png" width="2cm" height="2cm"/>',
+                  graphics='<image file="logo.png" x="1cm" y="1cm" width="1cm" height="1cm"/>')
+
+
+class Test(unittest.TestCase):
+    """reuse pdfs rendered before"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.basepath = os.path.join(self.tmpdir, 'doc')
+        os.mkdir(self.basepath)
+        self.page = os.path.join(self.basepath, 'page.pdf')
+        shutil.copy(str(EXAMPLES_DIR / 'ex2.pdf'), self.page)
+        self.cache = ResultCache(os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, text='hello'):
+        out = io.BytesIO()
+        doc = trml2pdf.RMLDoc(DOCUMENT % text, self.basepath)
+        stats = doc.render(out, cache=self.cache)
+        return out.getvalue(), stats
+
+    def test_hit(self):
+        first, stats = self.render()
+        self.assertEqual(stats.counters['cache_misses'], 1)
+        second, stats = self.render()
+        self.assertEqual(stats.counters['cache_hits'], 1)
+        self.assertEqual(first, second)
+        self.cache.clear()
+        # invariant mode, rendering again gives the same bytes
+        self.assertEqual(self.render()[0], first)
+
+    def test_key(self):
+        key = self.cache.key(trml2pdf.RMLDoc(DOCUMENT % 'hello', self.basepath))
+        self.assertNotEqual(key, self.cache.key(trml2pdf.RMLDoc(DOCUMENT % 'world', self.basepath)))
+        with open(self.page, 'ab') as f:
+            f.write(b'\0')
+        os.utime(self.page, ns=(1, 1))
+        self.assertNotEqual(key, self.cache.key(trml2pdf.RMLDoc(DOCUMENT % 'hello', self.basepath)))
+
+    def test_evict(self):
+        self.cache.max_size = 1
+        self.render('a')
+        self.render('b')
+        self.assertEqual(len(list(self.cache._entries())), 0)
+        self.cache.max_size = 10 ** 9
+        self.render('a')
+        self.assertEqual(self.render('a')[1].counters['cache_hits'], 1)
+
+    def test_relative_image(self):
+        # images are read relative to the current directory, not the basepath
+        cwd = os.getcwd()
+        workdir = os.path.join(self.tmpdir, 'work')
+        os.mkdir(workdir)
+        logo = os.path.join(workdir, 'logo.png')
+        shutil.copy(str(EXAMPLES_DIR / 'pict' / 'logo.png'), logo)
+        try:
+            os.chdir(workdir)
+            first = trml2pdf.parseString(IMAGES, self.basepath, cache=self.cache)
+            shutil.copy(str(EXAMPLES_DIR / 'pict' / 'tiny_logo.png'), logo)
+            os.utime(logo, ns=(1, 1))
+            second = trml2pdf.parseString(IMAGES, self.basepath, cache=self.cache)
+        finally:
+            os.chdir(cwd)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        self.assertNotEqual(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
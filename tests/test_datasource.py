@@ -0,0 +1,58 @@
+import os
+import array
+import base64
+import shutil
+import tempfile
+import unittest
+
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+DOCUMENT = document('<illustration width="10cm" height="10cm">%s</illustration>')
+
+POINTS = [10, 10, 100, 10, 100, 10, 100, 100, 100, 100, 10, 100]
+
+
+class Test(unittest.TestCase):
+    """read the coordinates of drawings from files or base64 data"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.invariant = rl_config.invariant
+        rl_config.invariant = 1
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, drawing):
+        return trml2pdf.parseString((DOCUMENT % drawing).encode('utf-8'), self.tmpdir)
+
+    def test_sources(self):
+        expected = self.render('<lines>%s</lines>' % ' '.join(str(x) for x in POINTS))
+        raw = array.array('f', POINTS)
+        if raw.itemsize != 4:
+            self.skipTest('no 32 bit floats')
+        with open(os.path.join(self.tmpdir, 'points.bin'), 'wb') as f:
+            f.write(raw.tobytes())
+        with open(os.path.join(self.tmpdir, 'points.csv'), 'w') as f:
+            f.write('x1,y1,x2,y2\n')
+            for i in range(0, len(POINTS), 4):
+                f.write(','.join(str(x) for x in POINTS[i:i + 4]) + '\n')
+        packed = base64.b64encode(array.array('d', POINTS).tobytes()).decode('ascii')
+
+        self.assertEqual(self.render('<lines file="points.bin" format="float32"/>'), expected)
+        self.assertEqual(self.render('<lines file="points.csv"/>'), expected)
+        self.assertEqual(self.render('<lines encoding="base64">%s</lines>' % packed), expected)
+
+    def test_unit(self):
+        with open(os.path.join(self.tmpdir, 'points.csv'), 'w') as f:
+            f.write('1,2,3,4\n')
+        expected = self.render('<lines>1cm 2cm 3cm 4cm</lines>')
+        self.assertEqual(self.render('<lines file="points.csv" unit="cm"/>'), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,7 @@ import unittest
 from six import text_type
 
 from pathlib import Path
+from pdfrw import PdfReader
 import trml2pdf  # dev mode: python setup.py develop
 
 
@@ -27,7 +28,30 @@ class Test(unittest.TestCase):
         finally:
             os.chdir(work_dir)
 
-    def _run_all_examples(self):
+    def test_run_all_incremental(self):
+        try:
+            work_dir = os.getcwd()
+            os.chdir(EXAMPLES_DIR)
+            self._run_all_examples(incremental=True)
+        finally:
+            os.chdir(work_dir)
+
+    def test_sources(self):
+        from reportlab import rl_config
+        invariant = rl_config.invariant
+        rl_config.invariant = 1
+        try:
+            path = EXAMPLES_DIR / 'ex5.rml'
+            expected = trml2pdf.parseString(path.read_bytes(), str(EXAMPLES_DIR))
+            self.assertEqual(trml2pdf.parseString(path), expected)
+            self.assertEqual(trml2pdf.parseString(str(path)), expected)
+            self.assertEqual(trml2pdf.parseString(path.read_text('utf-8'), str(EXAMPLES_DIR)), expected)
+            with open(path, 'rb') as f:
+                self.assertEqual(trml2pdf.parseString(f, str(EXAMPLES_DIR)), expected)
+        finally:
+            rl_config.invariant = invariant
+
+    def _run_all_examples(self, **kwargs):
         for name in os.listdir('.'):
             if name.endswith(".rml"):
                 path = name  # '{}/{}'.format(EXAMPLES_DIR, name)
@@ -35,8 +59,9 @@ class Test(unittest.TestCase):
                 with open(path,'rb') as inputfile:
                     doc = trml2pdf.RMLDoc(inputfile.read(),path)
                     output = io.BytesIO()
-                    doc.render(output)
+                    doc.render(output, **kwargs)
                     self.assertIsNotNone(output.getvalue())
+                    self.assertTrue(PdfReader(fdata=output.getvalue()).pages)
 
 
 if __name__ == "__main__":
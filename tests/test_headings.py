@@ -0,0 +1,89 @@
+import io
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, PageTemplate, Frame
+from reportlab.platypus.doctemplate import BaseDocTemplate
+import trml2pdf
+from trml2pdf import elements
+from trml2pdf.trml2pdf import RMLFlowable
+from trml2pdf.doctemplate import DocTemplate
+
+from documents import document
+
+DOCUMENT = document('''
+  <h1>Say "hello" &amp; more</h1>
+  <para>text</para>
+  <h2 fontSize="20">bigger</h2>
+  <bookmark level="1" short="mark"/>
+  <bookmark level="2" short="plain" no_toc="1" no_numbering="1"/>
+  <h3 key="third" outline="outline of third">third</h3>
+''')
+
+
+class Test(unittest.TestCase):
+    """headings and bookmarks are one flowable each in the story"""
+
+    def setUp(self):
+        self.compression = rl_config.pageCompression
+        rl_config.pageCompression = 0
+
+    def tearDown(self):
+        rl_config.pageCompression = self.compression
+
+    def render(self):
+        out = io.BytesIO()
+        doc = trml2pdf.RMLDoc(DOCUMENT, '.')
+        doc.render(out)
+        return doc, PdfReader(fdata=out.getvalue())
+
+    def titles(self, entry, depth=0):
+        while entry is not None:
+            yield depth, entry.Title.decode()
+            for item in self.titles(entry.First, depth + 1):
+                yield item
+            entry = entry.Next
+
+    def test_story(self):
+        doc, pdf = self.render()
+        story = RMLFlowable(doc).render(doc.root.xpath('story')[0])
+        self.assertEqual([flow.__class__ for flow in story], [
+            elements.Heading, Paragraph,
+            elements.Heading, elements.Heading, elements.Heading, elements.Heading])
+        # the stylesheet is shared unless the heading changes it
+        self.assertIs(story[0].style, doc.styles.styles['Heading1'])
+        self.assertEqual(story[2].style.fontSize, 20)
+        self.assertEqual(doc.styles.styles['Heading2'].fontSize, 14)
+
+    def test_outline(self):
+        doc, pdf = self.render()
+        self.assertEqual(list(self.titles(pdf.Root.Outlines.First)), [
+            (0, '1. Say "hello" & more'),
+            (1, '1.1. bigger'),
+            (0, '2. mark'),
+            (1, 'plain'),
+            (2, '2.0.1. outline of third'),
+        ])
+        content = pdf.pages[0].Contents.stream
+        self.assertIn('(1. Say "hello" & more)', content)
+        self.assertIn('(2.0.1. third)', content)
+
+    def test_apply(self):
+        # a doc template that hands the heading to apply like any action
+        class Template(DocTemplate):
+            handle_flowable = BaseDocTemplate.handle_flowable
+            custom_metadata = {}
+
+        out = io.BytesIO()
+        doc = Template(out, pageTemplates=[PageTemplate('main', [Frame(0, 0, 500, 700)])])
+        doc.build([elements.Heading('a', 'first', 1, 'first', style=getSampleStyleSheet()['Heading1']),
+                   elements.Heading('b', None, 2, 'second', toc='second')],
+                  canvasmaker=elements.NumberedCanvas)
+        pdf = PdfReader(fdata=out.getvalue())
+        self.assertEqual(list(self.titles(pdf.Root.Outlines.First)), [(0, '1. first'), (1, '1.1. second')])
+        self.assertIn('(1. first)', pdf.pages[0].Contents.stream)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from pdfrw import PdfReader
+import trml2pdf
+from trml2pdf import images
+
+from documents import document
+
+DOCUMENT = document(
+    '<image file="%(jpg)s" width="3cm" height="2cm"/><image file="%(small)s" width="3cm" height="2cm"/>',
+    graphics='<image file="%(png)s" x="1cm" y="1cm" width="3cm" height="2cm"/>')
+
+
+@unittest.skipIf(images.Image is None, 'needs pillow')
+class Test(unittest.TestCase):
+    """scale images down to the resolution they are drawn at"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.paths = {}
+        for name, size, format in (('jpg', (1500, 1000), 'JPEG'), ('png', (1500, 1000), 'PNG'),
+                                   ('small', (150, 100), 'JPEG')):
+            path = self.paths[name] = os.path.join(self.tmpdir, '%s.%s' % (name, format.lower()))
+            images.Image.new('RGB', size, (200, 30, 40)).save(path, format)
+        images.clear_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def render(self, dpi):
+        out = io.BytesIO()
+        stats = trml2pdf.RMLDoc(DOCUMENT % self.paths, self.tmpdir).render(out, image_dpi=dpi)
+        xobjects = PdfReader(fdata=out.getvalue()).pages[0].Resources.XObject.values()
+        return sorted((int(x.Width), int(x.Height), x.Filter[-1]) for x in xobjects), stats
+
+    def test_target_size(self):
+        self.assertEqual(images.target_size((3000, 2000), 72, 48, 72), (72, 48))
+        self.assertEqual(images.target_size((3000, 2000), 72, None, 144), (144, 96))
+        self.assertIsNone(images.target_size((100, 100), 72, 72, 100))
+        self.assertIsNone(images.target_size((100, 100), None, None, 72))
+
+    def test_render(self):
+        full, stats = self.render(None)
+        self.assertEqual(full, [(150, 100, '/DCTDecode'), (1500, 1000, '/DCTDecode'), (1500, 1000, '/FlateDecode')])
+        small, stats = self.render(150)
+        # 3cm at 150dpi, jpeg stays jpeg, the small one is left alone
+        self.assertEqual(small, [(150, 100, '/DCTDecode'), (178, 119, '/DCTDecode'), (178, 119, '/FlateDecode')])
+        self.assertEqual(stats.counters['images_resampled'], 2)
+        self.assertEqual(stats.counters['images_kept'], 1)
+        again, stats = self.render(150)
+        self.assertEqual(again, small)
+        self.assertEqual(stats.counters['images_resample_cached'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
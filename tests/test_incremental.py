@@ -0,0 +1,66 @@
+import io
+import os
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'pict', 'logo.png')
+
+STORY = ''.join(
+    '<para>paragraph %d that wraps over more than a single line of the frame, '
+    'so the story runs over several pages</para>' % i for i in range(300)
+) + '<image file="%s" width="2cm" height="2cm"/>' % LOGO
+
+PAGE_NUMBER = '<drawString x="2cm" y="1cm">page <pageNumber/></drawString>'
+TOTAL_PAGES = '<drawString x="2cm" y="1cm">page <pageNumber/> of <totalPageNumber/></drawString>'
+
+
+class Test(unittest.TestCase):
+    """pages written while the document is built match a render done at once"""
+
+    def setUp(self):
+        self.invariant = rl_config.invariant
+        self.compression = rl_config.pageCompression
+        rl_config.invariant = 1
+        rl_config.pageCompression = 0
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+        rl_config.pageCompression = self.compression
+
+    def render(self, data, incremental):
+        out = io.BytesIO()
+        trml2pdf.RMLDoc(data, '.').render(out, incremental=incremental)
+        return PdfReader(fdata=out.getvalue())
+
+    def compare(self, data):
+        expected = self.render(data, False)
+        pdf = self.render(data, True)
+        self.assertGreater(len(expected.pages), 5)
+        self.assertEqual(len(pdf.pages), len(expected.pages))
+        for page, expected_page in zip(pdf.pages, expected.pages):
+            self.assertEqual(page.Contents.stream, expected_page.Contents.stream)
+            xobjects = page.Resources.XObject or {}
+            expected_xobjects = expected_page.Resources.XObject or {}
+            self.assertEqual(sorted(xobjects.keys()), sorted(expected_xobjects.keys()))
+            for name, xobject in xobjects.items():
+                self.assertEqual(xobject.stream, expected_xobjects[name].stream)
+        return pdf
+
+    def test_pages(self):
+        pdf = self.compare(document(STORY, graphics=PAGE_NUMBER))
+        self.assertIn('(page 3)', pdf.pages[2].Contents.stream)
+
+    def test_total_pages(self):
+        # the total is drawn as a form filled in at save, the same form either way
+        pdf = self.compare(document(STORY, graphics=TOTAL_PAGES))
+        late, = pdf.pages[2].Resources.XObject.values()
+        self.assertIn('(page 3 of %d)' % len(pdf.pages), late.stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
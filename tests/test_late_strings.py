@@ -0,0 +1,50 @@
+import io
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+DOCUMENT = document('''
+  <para>see page</para><ref target="chapter"/>
+  <pageBreak/>
+  <para>second</para>
+  <pageBreak/>
+  <h1 key="chapter">chapter</h1>
+''', graphics='''
+  <setFont name="Helvetica" size="8"/>
+  <drawRightString x="19cm" y="1cm">page <pageNumber/> of <totalPageNumber/></drawRightString>
+  <drawString x="2cm" y="1cm">sheet <pageNumber/> of <totalPageNumber/> sheets</drawString>
+''')
+
+
+class Test(unittest.TestCase):
+    """fill in values known only at the end of the document when saving"""
+
+    def setUp(self):
+        self.compression = rl_config.pageCompression
+        rl_config.pageCompression = 0
+
+    def tearDown(self):
+        rl_config.pageCompression = self.compression
+
+    def forms(self, page):
+        return [xobj.stream for xobj in page.Resources.XObject.values()]
+
+    def test_total_and_ref(self):
+        out = io.BytesIO()
+        doc = trml2pdf.RMLDoc(DOCUMENT, '.')
+        doc.render(out)
+        pdf = PdfReader(fdata=out.getvalue())
+        self.assertEqual(len(pdf.pages), 3)
+        for i, page in enumerate(pdf.pages):
+            self.assertTrue(any('(page %d of 3)' % (i + 1) in form for form in self.forms(page)))
+            # text after the total stays after it
+            self.assertTrue(any('(sheet %d of 3 sheets)' % (i + 1) in form for form in self.forms(page)))
+        self.assertTrue(any('(3)' in form for form in self.forms(pdf.pages[0])))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import io
+import os
+import pickle
+import unittest
+
+import trml2pdf
+from trml2pdf import RenderLimits, RenderBudgetExceeded
+from trml2pdf.limits import Budget
+
+from documents import document
+
+PAGES = document('<para>page</para><pageBreak/>' * 20)
+
+
+class Test(unittest.TestCase):
+    """stop renders going beyond their limits"""
+
+    def render(self, data, **limits):
+        return trml2pdf.RMLDoc(data, '.').render(io.BytesIO(), limits=RenderLimits(**limits))
+
+    def test_pages(self):
+        self.assertEqual(self.render(PAGES, pages=20).pages, 20)
+        with self.assertRaises(RenderBudgetExceeded) as cm:
+            self.render(PAGES, pages=5)
+        e = cm.exception
+        self.assertEqual((e.limit, e.value, e.maximum), ('pages', 6, 5))
+        self.assertGreater(e.stats.total, 0)
+        self.assertGreater(sum(e.stats.flowables.values()), 0)
+
+    def test_passes(self):
+        self.assertEqual(len(self.render(PAGES, passes=1).passes), 1)
+        with self.assertRaises(RenderBudgetExceeded) as cm:
+            self.render(PAGES, passes=0)
+        self.assertEqual(cm.exception.limit, 'passes')
+
+    def test_time(self):
+        with self.assertRaises(RenderBudgetExceeded) as cm:
+            self.render(PAGES, time=0)
+        self.assertEqual(cm.exception.limit, 'time')
+
+    @unittest.skipUnless(os.path.exists('/proc/self/statm'), 'needs /proc')
+    def test_memory(self):
+        # a peak left behind by an earlier render does not hide new growth
+        earlier = b'x' * (200 * 2**20)
+        del earlier
+        budget = Budget(RenderLimits(memory=50 * 2**20), None)
+        data = b'x' * (100 * 2**20)
+        with self.assertRaises(RenderBudgetExceeded) as cm:
+            for i in range(RenderLimits.MEMORY_INTERVAL):
+                budget.check()
+        del data
+        self.assertEqual(cm.exception.limit, 'memory')
+        self.assertGreater(cm.exception.value, 50 * 2**20)
+
+    def test_pickle(self):
+        with self.assertRaises(RenderBudgetExceeded) as cm:
+            self.render(PAGES, pages=1)
+        e = cm.exception
+        copy = pickle.loads(pickle.dumps(e))
+        self.assertEqual((copy.limit, copy.maximum, str(copy)), ('pages', 1, str(e)))
+        self.assertEqual(copy.stats.as_dict(), e.stats.as_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
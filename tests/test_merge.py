@@ -0,0 +1,99 @@
+import io
+import os
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'pict', 'logo.png')
+
+DOCUMENT = document('''
+  <setNextTemplate name="later"/>
+  <h1 key="letter">Dear ${name}</h1>
+  <para>see page</para><ref target="end"/>
+  <pageBreak for="i in range(pages - 1)"/>
+  <h2 key="end">end</h2>
+''', templates=[
+    ('first', '''
+      <setFont name="Helvetica" size="8"/>
+      <drawRightString x="19cm" y="1cm">page <pageNumber/> of <totalPageNumber/></drawRightString>
+    '''),
+    ('later', '''
+      <setFont name="Helvetica" size="8"/>
+      <drawString x="2cm" y="1cm">continued <pageNumber/> of <totalPageNumber/></drawString>
+    '''),
+])
+
+RECORDS = [
+    {'name': 'Ann', 'pages': 2},
+    {'name': 'Bob', 'pages': 1},
+    {'name': 'Cid', 'pages': 3},
+]
+
+
+class Test(unittest.TestCase):
+    """many records into a single pdf"""
+
+    def setUp(self):
+        self.compression = rl_config.pageCompression
+        rl_config.pageCompression = 0
+
+    def tearDown(self):
+        rl_config.pageCompression = self.compression
+
+    def forms(self, page):
+        return [xobj.stream for xobj in page.Resources.XObject.values()]
+
+    def merge(self, records, **kwargs):
+        out = io.BytesIO()
+        doc = trml2pdf.RMLDoc(DOCUMENT, '.')
+        render_stats = doc.merge(out, iter(records), **kwargs)
+        return PdfReader(fdata=out.getvalue()), render_stats
+
+    def test_numbering(self):
+        pdf, render_stats = self.merge(RECORDS)
+        self.assertEqual(len(pdf.pages), 6)
+        self.assertEqual(render_stats.pages, 6)
+        self.assertEqual(render_stats.counters['records'], 3)
+        expected = [
+            'page 1 of 2', 'continued 2 of 2',
+            'page 1 of 1',
+            'page 1 of 3', 'continued 2 of 3', 'continued 3 of 3',
+        ]
+        for page, text in zip(pdf.pages, expected):
+            self.assertTrue(any('(%s)' % text in form for form in self.forms(page)), text)
+        # references point into the same record
+        for page, total in ((0, 2), (2, 1), (3, 3)):
+            self.assertTrue(any('(%d)' % total in form for form in self.forms(pdf.pages[page])))
+
+    def test_outline(self):
+        pdf, render_stats = self.merge(RECORDS, title=lambda record: record['name'])
+        outline = pdf.Root.Outlines
+        titles = []
+        entry = outline.First
+        while entry is not None:
+            titles.append(entry.Title.decode())
+            self.assertEqual(entry.First.Title.decode(), '1. Dear %s' % entry.Title.decode())
+            entry = entry.Next
+        self.assertEqual(titles, ['Ann', 'Bob', 'Cid'])
+
+    def test_repeated_image(self):
+        # an image drawn again after its page was written
+        data = DOCUMENT.replace('<h2 key="end">end</h2>',
+                               '<image file="%s" width="2cm" height="2cm"/>' % LOGO)
+        out = io.BytesIO()
+        trml2pdf.RMLDoc(data, '.').merge(out, RECORDS)
+        pdf = PdfReader(fdata=out.getvalue())
+        images = set(id(xobj) for page in pdf.pages for xobj in page.Resources.XObject.values() if xobj.Subtype == '/Image')
+        self.assertEqual(len(images), 1)
+
+    def test_no_records(self):
+        pdf, render_stats = self.merge([])
+        self.assertEqual(render_stats.counters['records'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from reportlab.platypus import Spacer
+from trml2pdf.elements import MultiColumns
+
+
+class Child(Spacer):
+    """a spacer counting how often it is measured"""
+
+    def __init__(self, height):
+        Spacer.__init__(self, 10, height)
+        self.wraps = 0
+
+    def wrap(self, availWidth, availHeight):
+        self.wraps += 1
+        return Spacer.wrap(self, availWidth, availHeight)
+
+
+class Test(unittest.TestCase):
+    """balance the columns measuring every child once"""
+
+    def test_balance(self):
+        children = [Child(10) for i in range(30)]
+        columns = MultiColumns(3, children, colspace=0)
+        w, h = columns.wrap(300, 1000)
+        self.assertEqual(h, 100)
+        columns.wrap(300, 1000)
+        self.assertEqual([c.wraps for c in children], [1] * 30)
+
+    def test_uneven(self):
+        children = [Child(h) for h in (50, 10, 10, 10, 40, 10, 30)]
+        w, h = MultiColumns(3, children, colspace=0).wrap(300, 1000)
+        self.assertGreaterEqual(h, 60)
+        self.assertLessEqual(h, 60.5)
+
+    def test_split(self):
+        children = [Child(10) for i in range(100)]
+        columns = MultiColumns(2, children, colspace=0)
+        w, h = columns.wrap(300, 200)
+        self.assertGreater(h, 200)
+        first, rest = columns.split(300, 200)
+        self.assertEqual(len(first.children), 40)
+        self.assertEqual(len(rest.children), 60)
+        self.assertEqual(first.wrap(300, 200)[1], 200)
+        self.assertEqual(rest.wrap(300, 1000)[1], 300)
+        self.assertEqual([c.wraps for c in children], [1] * 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import io
+import zlib
+import unittest
+
+from pathlib import Path
+from pdfrw import PdfReader, PdfDict, PdfArray
+import trml2pdf
+from trml2pdf.optimize import Optimizer, _filters, _a85decode
+
+from documents import document
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+DOCUMENT = document('''
+<pdfpage file="ex2.pdf" width="8cm" height="8cm"/>
+<pageBreak/>
+<pdfpage file="ex2.pdf" width="8cm" height="8cm"/>
+<para>text</para>
+''')
+
+
+def decoded(obj):
+    data = obj.stream.encode('latin-1')
+    filters = _filters(obj)
+    if filters[:1] == ['/ASCII85Decode']:
+        data = _a85decode(data)
+        filters = filters[1:]
+    if filters == ['/FlateDecode']:
+        data = zlib.decompress(data)
+    return data
+
+
+def content(data):
+    """everything reachable from the pages, streams decoded"""
+    result = []
+
+    def walk(obj):
+        if isinstance(obj, PdfDict):
+            if obj.stream is not None:
+                result.append(decoded(obj))
+            for key in sorted(obj.keys()):
+                if key not in ('/Parent', '/Length', '/Filter'):
+                    walk(obj[key])
+        elif isinstance(obj, PdfArray):
+            for value in obj:
+                walk(value)
+        else:
+            result.append(str(obj))
+    for page in PdfReader(fdata=data, decompress=False).pages:
+        walk(page)
+    return result
+
+
+class Test(unittest.TestCase):
+    """rewrite saved pdfs smaller"""
+
+    def setUp(self):
+        self.pdf = trml2pdf.parseString(DOCUMENT, str(EXAMPLES_DIR))
+
+    def test_optimize(self):
+        for optimizer in (Optimizer(), Optimizer(level=1, images=True), Optimizer(level=None)):
+            data, report = optimizer.optimize(self.pdf)
+            # both imports of the page share their objects
+            self.assertGreater(report.duplicates, 0)
+            self.assertEqual(report.bytes_out, len(data))
+            self.assertLess(len(data), len(self.pdf))
+            self.assertEqual(report.saved, len(self.pdf) - len(data))
+            self.assertEqual(content(data), content(self.pdf))
+            if optimizer.level is None:
+                self.assertEqual(report.recompressed, 0)
+            else:
+                self.assertGreater(report.recompressed, 0)
+
+    def test_render(self):
+        out = io.BytesIO()
+        doc = trml2pdf.RMLDoc(DOCUMENT, str(EXAMPLES_DIR))
+        stats = doc.render(out, optimizer=Optimizer())
+        self.assertEqual(stats.counters['optimize_saved'], len(self.pdf) - len(out.getvalue()))
+        self.assertIn('optimize', stats.timings)
+        self.assertEqual(len(PdfReader(fdata=out.getvalue()).pages), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
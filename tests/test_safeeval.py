@@ -0,0 +1,38 @@
+import unittest
+
+from trml2pdf import safeeval
+from trml2pdf.doctemplate import DocTemplate
+
+
+class Test(unittest.TestCase):
+    """compile document expressions once and keep them restricted"""
+
+    def test_cached(self):
+        code = safeeval.compile_cached(' a + 1 ')
+        self.assertIs(safeeval.compile_cached('a + 1'), code)
+        self.assertIsNot(safeeval.compile_cached('a + 1', 'exec'), code)
+
+    def test_unsafe(self):
+        for source in ('().__class__', '__import__("os")', '(x for x in ()).gi_frame',
+                       '[lambda: y.__dict__ for y in ()]'):
+            self.assertRaises(ValueError, safeeval.compile_cached, source)
+
+    def test_format_escape(self):
+        # attribute lookups inside replacement fields are not names of the code
+        for source in ('"{0.__globals__[builtins].open}".format(d)',
+                       '"{0.__class__.__mro__[1].__subclasses__}".format(1)',
+                       '"{0.__class__}".format_map({})', 'format(1, "d")',
+                       'str.format("{0.__class__}", 1)'):
+            self.assertRaises(ValueError, safeeval.compile_cached, source)
+        self.assertEqual(eval(safeeval.compile_cached('"%.2f" % x'), safeeval.new_globals(), {'x': 1}), '1.00')
+
+    def test_doc_namespace(self):
+        doc = DocTemplate(None)
+        doc.docExec('total = len(range(3)) + 1', 'forever')
+        self.assertEqual(doc.docEval('total * 2'), 8)
+        # unknown builtins are not available
+        self.assertIsNone(doc.docEval('open("/etc/passwd")'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import json
+import socket
+import tempfile
+import time
+import threading
+import unittest
+from http import client
+
+from pathlib import Path
+from trml2pdf import server
+
+from documents import document
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+SLOW = document('<para>slow <b>paragraph</b> that wraps over more than a single line '
+                'of the frame, so it takes a while</para>' * 5000).encode('utf-8')
+QUICK = document('<para>quick</para>').encode('utf-8')
+
+
+class UnixHTTPConnection(client.HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost')
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+
+
+class ServerTestCase(unittest.TestCase):
+    """a running server on a unix socket"""
+
+    timeout = 10
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.socket_path = os.path.join(cls.tmpdir.name, 'trml2pdf.sock')
+        cls.render_server = server.RenderServer(
+            workers=1, max_queue=1, timeout=cls.timeout, basepath=EXAMPLES_DIR).start()
+        cls.httpd = cls.render_server.make_http_server(socket_path=cls.socket_path)
+        cls.thread = threading.Thread(target=cls.httpd.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        cls.render_server.close()
+        cls.tmpdir.cleanup()
+
+    def request(self, method, path, body=None, headers={}):
+        conn = UnixHTTPConnection(self.socket_path)
+        conn.request(method, path, body, headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+
+
+class Test(ServerTestCase):
+    """render through a running server on a unix socket"""
+
+    def test_render(self):
+        with open(EXAMPLES_DIR / 'ex2.rml', 'rb') as f:
+            status, body = self.request('POST', '/', f.read())
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'%PDF'))
+
+    def test_render_with_assets(self):
+        with open(EXAMPLES_DIR / 'aie.rml', 'rb') as f:
+            rml = f.read().decode('utf-8')
+        assets = {}
+        for name in ('pict/logo.png', 'pict/screenshot.jpg'):
+            with open(EXAMPLES_DIR / name, 'rb') as f:
+                assets[name] = server.base64.b64encode(f.read()).decode('ascii')
+        status, body = self.request(
+                'POST', '/', json.dumps({'rml': rml, 'assets': assets}),
+                {'Content-Type': 'application/json'})
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'%PDF'))
+
+    def test_invalid_asset_name(self):
+        status, body = self.request(
+                'POST', '/', json.dumps({'rml': '<document/>', 'assets': {'../x': ''}}),
+                {'Content-Type': 'application/json'})
+        self.assertEqual(status, 400)
+
+    def test_malformed_requests(self):
+        json_type = {'Content-Type': 'application/json'}
+        for body, headers in [
+                ('{"rml": ', json_type),
+                ('[1, 2]', json_type),
+                ('{"assets": {}}', json_type),
+                ('{"rml": 1}', json_type),
+                ('{"rml": "<document/>", "assets": ["logo.png"]}', json_type),
+                ('{"rml": "<document/>", "assets": {"logo.png": "not base64!"}}', json_type),
+                ('', {'Content-Length': 'many'}),
+                ]:
+            status, response = self.request('POST', '/', body, headers)
+            self.assertEqual(status, 400, body)
+            self.assertIn('invalid request', json.loads(response.decode('utf-8'))['error'])
+        # the server still answers afterwards
+        self.assertEqual(self.request('POST', '/', QUICK)[0], 200)
+
+    def test_health(self):
+        status, body = self.request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body.decode('utf-8'))['workers'], 1)
+
+
+class TestLimits(ServerTestCase):
+    """a full queue is refused and a slow render is stopped"""
+
+    timeout = 1
+
+    def test_timeout(self):
+        status, body = self.request('POST', '/', SLOW)
+        self.assertEqual(status, 504)
+        with self.assertRaises(server.RenderTimeout):
+            self.render_server.render(SLOW)
+        # the worker is still usable
+        self.assertEqual(self.request('POST', '/', QUICK)[0], 200)
+
+    def test_queue_full(self):
+        # one render in the worker and one waiting fill the server
+        statuses = []
+        threads = [threading.Thread(target=lambda: statuses.append(self.request('POST', '/', SLOW)[0]))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        while self.render_server.status()['pending'] < 2:
+            time.sleep(0.01)
+        rejected = self.render_server.status()['rejected']
+        status, body = self.request('POST', '/', QUICK)
+        self.assertEqual(status, 503)
+        with self.assertRaises(server.QueueFull):
+            self.render_server.render(QUICK)
+        self.assertEqual(self.render_server.status()['rejected'], rejected + 2)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(statuses, [504, 504])
+        self.assertEqual(self.request('POST', '/', QUICK)[0], 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
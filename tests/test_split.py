@@ -0,0 +1,95 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'pict', 'logo.png')
+
+DOCUMENT = document('''
+  <para>first</para>
+  <image file="%(logo)s" width="2cm" height="2cm"/>
+  <nextOutput name="b"/>
+  <para>second</para>
+  <image file="%(logo)s" width="2cm" height="2cm"/>
+  <pageBreak/>
+  <image file="%(logo)s" width="2cm" height="2cm"/>
+  <nextOutput name="c"/>
+  <image file="%(logo)s" width="2cm" height="2cm"/>
+''' % {'logo': LOGO}, graphics='''
+  <setFont name="Helvetica" size="8"/>
+  <drawRightString x="19cm" y="1cm">page <pageNumber/> of <totalPageNumber/></drawRightString>
+''')
+
+RECORDS = document('''
+  <para>Dear ${name}</para>
+  <image file="%(logo)s" width="2cm" height="2cm"/>
+''' % {'logo': LOGO})
+
+
+class Test(unittest.TestCase):
+    """one render into several standalone pdfs"""
+
+    def setUp(self):
+        self.compression = rl_config.pageCompression
+        rl_config.pageCompression = 0
+
+    def tearDown(self):
+        rl_config.pageCompression = self.compression
+
+    def forms(self, page):
+        return [xobj.stream for xobj in page.Resources.XObject.values() if xobj.Subtype == '/Form']
+
+    def images(self, page):
+        return [xobj for xobj in page.Resources.XObject.values() if xobj.Subtype == '/Image']
+
+    def split(self, data, incremental=True, **kwargs):
+        outputs = []
+
+        def output(index, name):
+            outputs.append((index, name, io.BytesIO()))
+            return outputs[-1][2]
+        render_stats = trml2pdf.RMLDoc(data, '.').split(output, incremental=incremental, **kwargs)
+        return [(index, name, PdfReader(fdata=out.getvalue())) for index, name, out in outputs], render_stats
+
+    def test_markers(self):
+        for incremental in (True, False):
+            outputs, render_stats = self.split(DOCUMENT, incremental)
+            self.assertEqual([(index, name) for index, name, _ in outputs], [(0, None), (1, 'b'), (2, 'c')])
+            self.assertEqual([len(pdf.pages) for _, _, pdf in outputs], [1, 2, 1])
+            self.assertEqual(render_stats.pages, 4)
+            self.assertEqual(render_stats.counters['outputs'], 3)
+            # read once, embedded in every output
+            self.assertEqual(render_stats.counters['images_shared'], 2)
+            for _, _, pdf in outputs:
+                total = len(pdf.pages)
+                for number, page in enumerate(pdf.pages, 1):
+                    self.assertEqual(len(self.images(page)), 1)
+                    self.assertTrue(any('(page %d of %d)' % (number, total) in form for form in self.forms(page)))
+
+    def test_records(self):
+        records = [{'name': 'ann'}, {'name': 'bob'}]
+        outputs, render_stats = self.split(RECORDS, records=iter(records), name=lambda record: record['name'])
+        self.assertEqual([name for _, name, _ in outputs], ['ann', 'bob'])
+        self.assertEqual(render_stats.counters['records'], 2)
+        for _, _, pdf in outputs:
+            self.assertEqual(len(pdf.pages), 1)
+
+    def test_pattern(self):
+        directory = tempfile.mkdtemp()
+        try:
+            trml2pdf.RMLDoc(DOCUMENT, '.').split(os.path.join(directory, '{name}.pdf'))
+            self.assertEqual(sorted(os.listdir(directory)), ['0.pdf', 'b.pdf', 'c.pdf'])
+            self.assertEqual(len(PdfReader(os.path.join(directory, 'b.pdf')).pages), 2)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    unittest.main()
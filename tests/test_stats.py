@@ -0,0 +1,39 @@
+import io
+import unittest
+
+from pathlib import Path
+import trml2pdf
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+
+class Test(unittest.TestCase):
+    """collect timings and counters while rendering"""
+
+    def render(self, name, **kwargs):
+        with open(EXAMPLES_DIR / name, 'rb') as f:
+            doc = trml2pdf.RMLDoc(f.read(), str(EXAMPLES_DIR))
+        return doc.render(io.BytesIO(), **kwargs)
+
+    def test_story(self):
+        collected = []
+        stats = self.render('ex5.rml', stats_callback=collected.append)
+        self.assertEqual(collected, [stats])
+        self.assertEqual(stats.pages, 1)
+        self.assertEqual(len(stats.passes), 1)
+        self.assertGreater(stats.flowables['para'], 0)
+        self.assertEqual(stats.counters['pageGraphics'], 1)
+        for phase in ('parse', 'styles', 'story', 'layout', 'save'):
+            self.assertIn(phase, stats.timings)
+        self.assertGreaterEqual(stats.total, stats.timings['layout'])
+        self.assertIn('pages 1', stats.format())
+
+    def test_page_drawing(self):
+        stats = self.render('ex1.rml')
+        self.assertEqual(stats.pages, 1)
+        self.assertIn('save', stats.timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import io
+import unittest
+
+from reportlab.platypus import Paragraph
+import trml2pdf
+from trml2pdf.trml2pdf import RMLFlowable
+
+from documents import document
+
+DOCUMENT = document('''
+  <blockTable>
+    <tr><td>1.00</td></tr>
+    <tr><td>a &lt; b</td><td/><td><para>nested</para></td></tr>
+    <tr><td>x <b>y</b> z</td><td>2</td></tr>
+  </blockTable>
+''')
+
+
+class Test(unittest.TestCase):
+    """cells of plain text go into the table as strings"""
+
+    def test_cells(self):
+        doc = trml2pdf.RMLDoc(DOCUMENT, '.')
+        doc.render(io.BytesIO())
+        table, = RMLFlowable(doc).render(doc.root.xpath('story')[0])
+        cells = table._cellvalues
+        self.assertEqual(cells[0], ['1.00', '', ''])
+        self.assertEqual(cells[1][:2], ['a < b', ''])
+        self.assertEqual([flow.__class__ for flow in cells[1][2]], [Paragraph])
+        # markup without flowables is still read as text
+        self.assertEqual(cells[2], ['x y z', '2', ''])
+
+
+if __name__ == "__main__":
+    unittest.main()
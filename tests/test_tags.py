@@ -0,0 +1,58 @@
+import io
+import unittest
+
+from pdfrw import PdfReader
+from reportlab import rl_config
+from reportlab.platypus import Paragraph
+import trml2pdf
+from trml2pdf.trml2pdf import RMLFlowable, RMLCanvas
+
+from documents import document
+
+DOCUMENT = document(
+    '<ledger><entry>rent</entry><entry>food</entry></ledger>',
+    graphics='<stamp text="draft"/>')
+
+
+def ledger(rml_flowable, node):
+    style = rml_flowable.styles.styles['Normal']
+    for entry in node:
+        yield Paragraph('booked %s' % entry.text, style)
+
+
+def stamp(rml_canvas, node):
+    rml_canvas.canvas.setFont('Helvetica', 8)
+    rml_canvas.canvas.drawString(10, 10, node.attrib['text'])
+
+
+class Test(unittest.TestCase):
+    """own tags registered for the story and the page graphics"""
+
+    def setUp(self):
+        self.compression = rl_config.pageCompression
+        rl_config.pageCompression = 0
+        trml2pdf.register_flowable_tag('ledger', ledger)
+        trml2pdf.register_canvas_tag('stamp', stamp)
+
+    def tearDown(self):
+        rl_config.pageCompression = self.compression
+        del RMLFlowable.tags['ledger']
+        del RMLCanvas.tags['stamp']
+
+    def test_render(self):
+        pdf = PdfReader(fdata=trml2pdf.parseString(DOCUMENT, '.'))
+        content = pdf.pages[0].Contents.stream
+        self.assertIn('(booked rent)', content)
+        self.assertIn('(booked food)', content)
+        self.assertIn('(draft)', content)
+
+    def test_builder(self):
+        story = trml2pdf.Story()
+        ledger = story.add('ledger')
+        ledger.add('entry', 'tax')
+        pdf = PdfReader(fdata=trml2pdf.parseString(DOCUMENT, '.', story=story))
+        self.assertIn('(booked tax)', pdf.pages[0].Contents.stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import io
+import unittest
+
+from lxml import etree
+from reportlab import rl_config
+import trml2pdf
+from trml2pdf import template
+
+from documents import document
+
+
+
+class Test(unittest.TestCase):
+    """expand for, if and ${} directives from a data context"""
+
+    def expand(self, xml, **context):
+        return etree.tostring(template.Template(etree.fromstring(xml)).expand(context), encoding='unicode')
+
+    def test_loop(self):
+        self.assertEqual(
+            self.expand('<ul><li for="k, v in items" if="v" n="${k}">${v} $${x}</li></ul>',
+                        items=[('a', '<1>'), ('b', ''), ('c', 'x"y')]),
+            '<ul><li n="a">&lt;1&gt; ${x}</li><li n="c">x"y ${x}</li></ul>')
+
+    def test_nested(self):
+        self.assertEqual(
+            self.expand('<t><tr for="row in rows"><td for="x in row">${x * 2}</td></tr><p if="not rows">empty</p></t>',
+                        rows=[[1, 2], [3]]),
+            '<t><tr><td>2</td><td>4</td></tr><tr><td>6</td></tr></t>')
+
+    def test_comprehensions(self):
+        # nested scopes see the context and the loop variables
+        self.assertEqual(
+            self.expand('<t><p>${", ".join(str(r) for r in rows if r > limit)}</p>'
+                        '<q for="r in table">${[c for c in r if c != skip]}</q></t>',
+                        rows=[1, 5, 9], limit=3, table=[[1, 2], [2, 3]], skip=2),
+            '<t><p>5, 9</p><q>[1]</q><q>[3]</q></t>')
+
+    def test_errors(self):
+        with self.assertRaises(ValueError) as cm:
+            self.expand('<a>\n<b>${missing}</b></a>')
+        self.assertIn('line 2', str(cm.exception))
+        with self.assertRaises(ValueError):
+            self.expand('<a>${().__class__}</a>')
+
+    def test_document(self):
+        invariant = rl_config.invariant
+        rl_config.invariant = 1
+        try:
+            rows = ['first & one', 'second']
+            expanded = trml2pdf.parseString(
+                document('<para for="row in rows">${row}</para>'), context={'rows': rows})
+            plain = trml2pdf.parseString(
+                document('<para>first &amp; one</para><para>second</para>'))
+        finally:
+            rl_config.invariant = invariant
+        self.assertEqual(expanded, plain)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import unittest
+from concurrent import futures
+
+import reportlab
+from reportlab import rl_config
+import trml2pdf
+
+from documents import document
+
+FONTS = os.path.join(os.path.dirname(reportlab.__file__), 'fonts')
+LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'examples', 'pict', 'logo.png')
+
+DOCUMENT = document('''
+  <para style="vera" for="i in range(rows)">%(name)s <seq id="n"/>: ${i} ${text}</para>
+  <blockTable style="grid">
+    <tr for="i in range(rows)"><td>%(name)s</td><td>${i * i}</td></tr>
+  </blockTable>
+  <barCode code="%(code)s" value="%(name)s-${rows}"/>
+  <image file="%(logo)s" width="%(width)scm" height="2cm"/>
+''', docinit='''
+  <registerFont fontName="Vera" fontFile="%(fonts)s/Vera.ttf"/>
+''', graphics='''
+  <setFont name="Vera" size="8"/>
+  <drawRightString x="19cm" y="1cm">%(name)s page <pageNumber/> of <totalPageNumber/></drawRightString>
+''', stylesheet='''
+  <paraStyle name="vera" fontName="Vera" textColor="#%(color)s"/>
+  <blockTableStyle id="grid">
+    <blockBackground colorName="(0.9,0.9,%(shade)s)" start="0,0" stop="-1,0"/>
+  </blockTableStyle>
+''')
+
+VARIANTS = [
+    {'name': 'alpha', 'color': 'ff0000', 'shade': '0.1', 'code': 'Code128', 'width': 2},
+    {'name': 'beta', 'color': '00ff00', 'shade': '0.5', 'code': 'QR', 'width': 3},
+    {'name': 'gamma', 'color': '0000ff', 'shade': '0.9', 'code': 'Standard39', 'width': 4},
+]
+
+
+def render(variant, rows):
+    data = DOCUMENT % dict(variant, fonts=FONTS, logo=LOGO)
+    return trml2pdf.parseString(data, '.', context={'rows': rows, 'text': 'lorem ipsum ' * 8})
+
+
+class Test(unittest.TestCase):
+    """concurrent renders in threads give the same pdfs as serial ones"""
+
+    def setUp(self):
+        self.invariant = rl_config.invariant
+        rl_config.invariant = 1
+
+    def tearDown(self):
+        rl_config.invariant = self.invariant
+
+    def test_stress(self):
+        jobs = [(variant, rows) for rows in (5, 40, 120) for variant in VARIANTS]
+        expected = dict(((variant['name'], rows), render(variant, rows)) for variant, rows in jobs)
+        with futures.ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda job: (job, render(*job)), jobs * 3))
+        for (variant, rows), pdf in results:
+            self.assertEqual(pdf, expected[variant['name'], rows], (variant['name'], rows))
+
+    def test_serial_repeat(self):
+        # counters like <seq/> start over for every document
+        self.assertEqual(render(VARIANTS[0], 5), render(VARIANTS[0], 5))
+
+
+if __name__ == "__main__":
+    unittest.main()
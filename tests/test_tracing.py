@@ -0,0 +1,33 @@
+import io
+import unittest
+
+from pathlib import Path
+from reportlab.platypus import Paragraph
+import trml2pdf
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+
+class Test(unittest.TestCase):
+    """trace the layout calls per flowable class and rml line"""
+
+    def test_trace(self):
+        wrap = Paragraph.__dict__['wrap']
+        with open(EXAMPLES_DIR / 'ex5.rml', 'rb') as f:
+            doc = trml2pdf.RMLDoc(f.read(), str(EXAMPLES_DIR))
+        tracer = trml2pdf.LayoutTracer()
+        doc.render(io.BytesIO(), tracer=tracer)
+        # the original methods are restored afterwards
+        self.assertIs(Paragraph.__dict__['wrap'], wrap)
+
+        rows = tracer.sorted_records()
+        self.assertTrue(rows)
+        self.assertEqual(rows, sorted(rows, key=lambda row: -row[0]))
+        lines = [line for seconds, wrap, split, draw, name, line in rows if name == 'Paragraph']
+        self.assertIn(55, lines)
+        self.assertIn('Paragraph', tracer.report())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+
+from reportlab.lib.units import cm, mm
+from trml2pdf import utils
+
+
+class Test(unittest.TestCase):
+    """parse lists of lengths in one go"""
+
+    def test_coords_get(self):
+        self.assertEqual(utils.coords_get('1 2.5\n -3  4'), [1, 2.5, -3, 4])
+        self.assertEqual(utils.coords_get(' 1cm 2mm 3pt .5 '), [cm, 2 * mm, 3, 0.5])
+        self.assertEqual(utils.coords_get(''), [])
+
+    def test_coords_get_same_as_unit_get(self):
+        text = '2cm 3.2cm 19cm 3.2cm 1in -4mm 7'
+        self.assertEqual(utils.coords_get(text), [utils.unit_get(x) for x in text.split()])
+
+    def test_coords_get_invalid(self):
+        self.assertRaises(ValueError, utils.coords_get, '1cm 2km')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,4 +14,9 @@
 # You should have received a copy of the GNU Lesser General Public
 # License along with this library; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
-from .trml2pdf import RMLDoc
+from .trml2pdf import RMLDoc, parseString, register_flowable_tag, register_canvas_tag
+from .aio import render_async
+from .stats import RenderStats
+from .tracing import LayoutTracer
+from .builder import Story
+from .limits import RenderLimits, RenderBudgetExceeded
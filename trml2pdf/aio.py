@@ -0,0 +1,115 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+render from asyncio code without blocking the event loop
+
+parsing and layout run in an executor, by default a process pool shared by
+all callers. A renderer admits at most ``max_concurrency`` documents to the
+executor at a time, further callers wait for a free slot instead of piling
+up work in the executor queue.
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent import futures
+
+from .trml2pdf import parseString
+
+logger = logging.getLogger(__name__)
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+_renderers = weakref.WeakKeyDictionary()
+
+
+def get_default_executor():
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = futures.ProcessPoolExecutor()
+        return _default_executor
+
+
+class AsyncRenderer(object):
+    """render documents in ``executor`` with at most ``max_concurrency``
+    of them in flight
+
+    ``max_concurrency`` defaults to the number of workers of the executor.
+    """
+
+    def __init__(self, executor=None, max_concurrency=None):
+        self.executor = executor
+        if max_concurrency is None:
+            max_concurrency = getattr(executor, '_max_workers', None) or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def render(self, data, basepath):
+        """return the rendered pdf as bytes
+
+        cancelling the awaiting task withdraws the document from the
+        executor if it did not start yet, a render already running in a
+        worker is finished and its result discarded. It keeps its slot
+        until then.
+        """
+        loop = asyncio.get_event_loop()
+        executor = self.executor or get_default_executor()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            future = executor.submit(parseString, data, basepath)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda future: self._release_threadsafe(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def _release_threadsafe(self, loop):
+        # called from the executor once the render is done or withdrawn
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # the loop is closed, nobody waits for the slot
+            pass
+
+
+async def render_async(data, basepath, executor=None):
+    """render ``data`` in ``executor`` and return the pdf as bytes
+
+    calls sharing the same executor (and event loop) share one
+    :class:`AsyncRenderer`, so together they never occupy more than the
+    executor's workers.
+    """
+    loop = asyncio.get_event_loop()
+    renderers = _renderers.setdefault(loop, {})
+    renderer = renderers.get(executor)
+    if renderer is None:
+        renderer = renderers[executor] = AsyncRenderer(executor)
+    return await renderer.render(data, basepath)
@@ -0,0 +1,146 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+barcodes of the ``barCode`` tag, on the canvas and in the story
+
+``code`` is any symbology of ``reportlab.graphics.barcode`` (``Code128``,
+the default, ``QR``, ``Extended39``, ``EAN13``, ...), the value is the
+``value`` attribute or the text of the tag. ``barWidth``, ``barHeight``,
+``width`` and ``height`` are lengths, ``quiet``, ``checksum`` and
+``humanReadable`` booleans.
+
+an encoded barcode is kept in a process wide cache by symbology, value and
+options, and is drawn once per document as a form XObject, every further
+occurrence only places the form.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+from reportlab.platypus.flowables import Flowable
+from reportlab.graphics import barcode as rl_barcode
+from reportlab.graphics.barcode import code39, code93, code128, common, qr
+
+from . import utils
+
+DEFAULT_CODE = 'Code128'
+
+# barcodes that are flowables themselves, the others become drawings
+FLOWABLES = {
+    'Code128': code128.Code128,
+    'Standard39': code39.Standard39,
+    'Extended39': code39.Extended39,
+    'Standard93': code93.Standard93,
+    'Extended93': code93.Extended93,
+    'I2of5': common.I2of5,
+    'Codabar': common.Codabar,
+    'Code11': common.Code11,
+    'MSI': common.MSI,
+    'QR': qr.QrCode,
+}
+
+LENGTHS = ('barWidth', 'barHeight', 'width', 'height')
+BOOLEANS = ('quiet', 'checksum', 'humanReadable')
+
+# number of encoded barcodes kept
+CACHE_SIZE = 4096
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def key_get(node, value):
+    """the cache key of the ``barCode`` ``node`` with its ``value``"""
+    options = utils.attr_get(node, LENGTHS, dict((name, 'bool') for name in BOOLEANS))
+    return (node.attrib.get('code', DEFAULT_CODE), value, tuple(sorted(options.items())))
+
+
+def _create(key):
+    code, value, options = key
+    options = dict(options)
+    if code in FLOWABLES:
+        return FLOWABLES[code](value, **options)
+    if code not in rl_barcode.getCodes():
+        raise ValueError('unknown barcode %r' % code)
+    return rl_barcode.createBarcodeDrawing(code, value=value, **options)
+
+
+def barcode_get(key):
+    """the encoded barcode of ``key``, a flowable"""
+    with _lock:
+        barcode = _cache.get(key)
+        if barcode is not None:
+            _cache.move_to_end(key)
+            return barcode
+    barcode = _create(key)
+    # encodes the value and computes the size
+    barcode.wrap(0, 0)
+    with _lock:
+        barcode = _cache.setdefault(key, barcode)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return barcode
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+
+def size_get(key):
+    barcode = barcode_get(key)
+    with _lock:
+        return barcode.wrap(0, 0)
+
+
+def form_name(key):
+    return 'rmlBarcode' + hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:20]
+
+
+def draw(canvas, key, x, y):
+    """draw the barcode of ``key`` at ``x``, ``y``, through a form
+    XObject of the document"""
+    name = form_name(key)
+    if not canvas.hasForm(name):
+        barcode = barcode_get(key)
+        with _lock:
+            width, height = barcode.wrap(0, 0)
+            # human readable text is drawn below the bars
+            canvas.beginForm(name, lowerx=-width, lowery=-height, upperx=2 * width, uppery=2 * height)
+            # the flowable keeps the canvas while drawing, it is shared
+            barcode.drawOn(canvas, 0, 0)
+            canvas.endForm()
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.doForm(name)
+    canvas.restoreState()
+
+
+class BarCode(Flowable):
+    """a barcode in the story"""
+
+    def __init__(self, key):
+        Flowable.__init__(self)
+        self.key = key
+        self.width, self.height = size_get(key)
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        draw(self.canv, self.key, 0, 0)
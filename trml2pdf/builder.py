@@ -0,0 +1,141 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+build the story of a document from python
+
+::
+
+    story = builder.Story()
+    story.h1('Invoice', key='invoice')
+    story.para('total: <b>%s</b>' % total, style='Normal')
+    table = story.blockTable(style='grid', colWidths='10cm,3cm')
+    for name, price in rows:
+        table.row(name, '%.2f' % price)
+    RMLDoc(rml).render(out, story=story)
+
+every rml story tag has a method of the same name taking the text and the
+attributes and returning the new node, the nodes are turned into the
+same flowables as the parsed tags. Attribute values are strings as in
+rml, numbers are converted with ``str`` and booleans to ``1`` or ``0``.
+The text of ``para`` and ``xpre`` is paragraph markup, the text of the
+other tags is plain text. The page templates and the stylesheet come from
+the rml document, its ``<story>`` is replaced.
+"""
+
+from xml.sax.saxutils import escape
+
+TAGS = (
+    'para', 'xpre', 'pre', 'title', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'blockTable', 'blockTableStyle', 'tr', 'td', 'ul', 'li', 'image',
+    'pdfpage', 'pdfpages', 'spacer', 'hr', 'barCode', 'pageBreak',
+    'condPageBreak', 'nextFrame', 'setNextTemplate', 'keepTogether',
+    'floatToEnd', 'indent', 'multicolumns', 'bookmark', 'toc', 'ref',
+    'name', 'docpara', 'docexec', 'shrinkFrame', 'myIndex', 'nextOutput',
+)
+
+_attribute_entities = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+
+
+def _value(value):
+    if value is True or value is False:
+        return '1' if value else '0'
+    return str(value)
+
+
+class Node(object):
+    """an rml tag built from python, providing the part of the lxml element
+    interface the story is read with"""
+
+    sourceline = None
+
+    def __init__(self, tag, text=None, **attrib):
+        self.tag = tag
+        self.text = text
+        self.tail = None
+        self.attrib = dict((key, _value(value)) for key, value in attrib.items() if value is not None)
+        self._children = []
+        self._parent = None
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __len__(self):
+        return len(self._children)
+
+    def __contains__(self, node):
+        return node in self._children
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def getparent(self):
+        return self._parent
+
+    def append(self, node):
+        node._parent = self
+        self._children.append(node)
+        return node
+
+    def remove(self, node):
+        self._children.remove(node)
+        node._parent = None
+
+    def add(self, tag, text=None, **attrib):
+        """add a child ``<tag>`` and return it"""
+        return self.append(Node(tag, text, **attrib))
+
+    def row(self, *cells, **attrib):
+        """add a ``<tr>`` with a ``<td>`` of text for every cell"""
+        tr = self.add('tr', **attrib)
+        for cell in cells:
+            tr.add('td', None if cell is None else str(cell))
+        return tr
+
+    def tostring(self):
+        """the xml of the node and its tail, as lxml serializes it"""
+        parts = ['<', self.tag]
+        for key, value in self.attrib.items():
+            parts.append(' %s="%s"' % (key, escape(value, _attribute_entities)))
+        if self.text or self._children:
+            parts.append('>')
+            if self.text:
+                parts.append(escape(self.text))
+            parts.extend(child.tostring() for child in self._children)
+            parts.append('</%s>' % self.tag)
+        else:
+            parts.append('/>')
+        if self.tail:
+            parts.append(escape(self.tail))
+        return ''.join(parts)
+
+
+def _adder(tag):
+    def add(self, text=None, **attrib):
+        return self.add(tag, text, **attrib)
+    add.__name__ = tag
+    add.__doc__ = 'add a ``<%s>`` and return it' % tag
+    return add
+
+for _tag in TAGS:
+    setattr(Node, _tag, _adder(_tag))
+
+
+class Story(Node):
+    """the root of a story built from python"""
+
+    def __init__(self):
+        super().__init__('story')
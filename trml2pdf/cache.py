@@ -0,0 +1,189 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+rendered documents on disk
+
+the key of a document is the sha256 of its xml (after template expansion)
+and of the content of every file it references (images, pdf pages, fonts,
+drawing data). Documents are rendered in invariant mode for the cache, so
+the same key always stands for the same bytes. The least recently used
+files are removed when the cache grows beyond its size, several processes
+may share a directory.
+"""
+
+import os
+import hashlib
+import logging
+import tempfile
+import threading
+
+import reportlab
+from lxml import etree
+
+logger = logging.getLogger(__name__)
+
+# attributes naming files the output depends on
+FILE_ATTRIBUTES = ('file', 'fontFile')
+
+# tags whose file the renderer opens relative to the current directory,
+# the files of all other tags are resolved against the document basepath
+CWD_TAGS = ('image', 'registerFont')
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# digests of referenced files by path, with the stat they are valid for,
+# dropped when it holds more than DIGESTS paths
+DIGESTS = 4096
+_digests = {}
+_lock = threading.Lock()
+
+
+def file_digest(path):
+    """the sha256 of the file at ``path``, remembered until it changes"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return b'missing'
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        entry = _digests.get(path)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    digest = h.digest()
+    with _lock:
+        if len(_digests) >= DIGESTS:
+            _digests.clear()
+        _digests[path] = (stamp, digest)
+    return digest
+
+
+def _file_path(node, name, basepath):
+    """the path the renderer reads the file ``name`` of ``node`` from"""
+    if node.tag in CWD_TAGS:
+        return os.path.abspath(name)
+    return os.path.join(basepath, name)
+
+
+class ResultCache(object):
+    """a directory of rendered pdfs of at most ``max_size`` bytes"""
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = os.path.abspath(directory)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, doc, options=None):
+        """the key of the parsed :class:`RMLDoc` ``doc``, rendered with
+        ``options`` (anything with a stable repr)"""
+        h = hashlib.sha256()
+        h.update(reportlab.Version.encode('ascii'))
+        h.update(repr(options).encode('utf-8'))
+        h.update(etree.tostring(doc.root))
+        # by the name in the document, the assets of a server request are
+        # in a new directory every time
+        files = set()
+        for node in doc.root.iter():
+            for attribute in FILE_ATTRIBUTES:
+                name = node.get(attribute)
+                if name:
+                    files.add((name, _file_path(node, name, doc.basepath)))
+        for name, path in sorted(files):
+            h.update(name.encode('utf-8'))
+            h.update(file_digest(path))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pdf')
+
+    def get(self, key):
+        """the cached pdf of ``key`` or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # the modification time orders the files for eviction
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.pdf'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime_ns, st.st_size, path
+
+    def _evict(self):
+        # other processes may have added or removed files, so start over
+        # from the directory and leave some room to not evict on every put
+        entries = sorted(self._entries())
+        size = sum(x[1] for x in entries)
+        target = self.max_size * 0.9
+        for mtime, file_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= file_size
+            logger.debug('evicted %s', path)
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            for mtime, size, path in list(self._entries()):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._size = 0
@@ -27,8 +27,8 @@ regex_h = re.compile(r'#([0-9a-zA-Z][0-9a-zA-Z])([0-9a-zA-Z][0-9a-zA-Z])([0-9a-z
 
 
 def get(col_str):
-    global allcols
-    if col_str in list(allcols.keys()):
+    # read only, shared by all renders
+    if col_str in allcols:
         return allcols[col_str]
     res = regex_t.search(col_str, 0)
     if res:
@@ -0,0 +1,112 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+coordinates of drawing tags from outside the xml text
+
+``<lines>``, ``<curves>`` and ``<path>`` (and the ``<moveto>`` and
+``<curvesto>`` of a path) accept
+
+``file="points.bin" format="float32"``
+    a raw array of little endian floats, ``format`` is ``float32`` or
+    ``float64`` (the default), the file is mapped instead of read
+``file="points.csv"``
+    a csv file, all cells are read row by row, a header row is skipped.
+    ``format="csv"`` is implied by the extension
+``encoding="base64" format="float32"``
+    the text of the tag is a base64 encoded raw array
+
+``unit`` (``pt``, ``cm``, ``mm`` or ``in``) scales the values, the default
+is points.
+"""
+
+import os
+import csv
+import sys
+import mmap
+import array
+import base64
+
+from . import utils
+
+FORMATS = {
+    'float32': 'f',
+    'float64': 'd',
+}
+
+
+def is_external(node):
+    return 'file' in node.attrib or 'encoding' in node.attrib
+
+
+def _cast(buf, format):
+    """the floats of the little endian raw array in ``buf`` as list"""
+    typecode = FORMATS.get(format)
+    if typecode is None:
+        raise ValueError('unknown data format %r' % format)
+    view = memoryview(buf)
+    size = array.array(typecode).itemsize
+    if len(view) % size:
+        raise ValueError('data length %d is no multiple of %d' % (len(view), size))
+    if sys.byteorder == 'little':
+        return view.cast(typecode).tolist()
+    values = array.array(typecode, view)
+    values.byteswap()
+    return values.tolist()
+
+
+def _read_raw(path, format):
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return _cast(m, format)
+
+
+def _read_csv(path):
+    values = []
+    with open(path, newline='') as f:
+        for i, row in enumerate(csv.reader(f)):
+            try:
+                values.extend(float(cell) for cell in row if cell.strip())
+            except ValueError:
+                if i:
+                    raise
+    return values
+
+
+def load(node, basepath):
+    """return the coordinates referenced by ``node`` as a flat list"""
+    format = node.attrib.get('format')
+    if 'file' in node.attrib:
+        path = node.attrib['file']
+        if not os.path.isabs(path):
+            path = os.path.join(basepath, path)
+        if format == 'csv' or (format is None and path.lower().endswith('.csv')):
+            values = _read_csv(path)
+        else:
+            values = _read_raw(path, format or 'float64')
+    elif node.attrib.get('encoding') == 'base64':
+        values = _cast(base64.b64decode(''.join((node.text or '').split())), format or 'float64')
+    else:
+        raise ValueError('unknown data encoding %r' % node.attrib.get('encoding'))
+    unit = node.attrib.get('unit', 'pt')
+    factor = utils.UNIT_FACTORS.get(unit)
+    if factor is None:
+        raise ValueError('unknown unit %r' % unit)
+    if factor != 1:
+        values = [x * factor for x in values]
+    return values
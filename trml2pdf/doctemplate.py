@@ -1,3 +1,4 @@
+import time
 import logging
 
 from reportlab.platypus.flowables import *
@@ -11,10 +12,28 @@ from reportlab.lib.sequencer import Sequencer
 from reportlab.lib.utils import isSeq, encode_label, decode_label, annotateException, strTypes
 from reportlab.platypus import doctemplate
 
+from . import safeeval
+from . import elements
+
 logger = logging.getLogger(__name__)
 
 
 class DocTemplate(BaseDocTemplate):
+    # write pages while the document is built, see NumberedCanvas.setIncremental
+    incremental = False
+    # RenderStats collecting the layout passes
+    stats = None
+    # tracing.LayoutTracer recording the wrap/split/drawOn calls
+    tracer = None
+    # limits.Budget checked for every pass, page and flowable
+    budget = None
+    # levels the outline entries of the story are moved down
+    outline_offset = 0
+    # elements.SharedImages of the documents of a split render
+    shared_images = None
+    # pages of the documents built before in a split render
+    _pages_done = 0
+
     def get_numbering(self,level):
         nums = []
         for i in range(level):
@@ -22,6 +41,7 @@ class DocTemplate(BaseDocTemplate):
         return '.'.join(nums)
 
     def afterInit(self):
+        self._evalGlobals = safeeval.new_globals()
         self.seq = Sequencer()
         self.levels = {}
         self.level_offset = None
@@ -51,6 +71,15 @@ class DocTemplate(BaseDocTemplate):
                                 )
 
         getattr(self.canv,'setEncrypt',lambda x: None)(self.encrypt)
+        self.canv._stats = self.stats
+        self.canv._shared_images = self.shared_images
+
+        # only a single pass build may write pages before it is finished
+        if self.incremental and hasattr(self.canv,'setIncremental'):
+            if getattr(self,'_indexingFlowables',None):
+                logger.info('document needs several passes, incremental output disabled')
+            else:
+                self.canv.setIncremental(filename or self.filename)
 
         self.canv._cropMarks = self.cropMarks
         self.canv.setAuthor(self.author)
@@ -69,9 +98,110 @@ class DocTemplate(BaseDocTemplate):
             self.canv.setPageCallBack(self._onPage)
         self.handle_documentBegin()
         
+    def handle_pageBegin(self):
+        BaseDocTemplate.handle_pageBegin(self)
+        if self.budget is not None:
+            self.budget.check_page(self._pages_done + self.page)
+
+    def handle_flowable(self, flowables):
+        if self.budget is not None:
+            self.budget.check()
+        if isinstance(flowables[0], elements.Heading):
+            flowables[0:1] = flowables[0].expand(self)
+            return
+        BaseDocTemplate.handle_flowable(self, flowables)
+
+    def build(self, flowables, filename=None, canvasmaker=canvas.Canvas):
+        if self.budget is not None:
+            self.budget.check_pass()
+        if self.tracer is not None:
+            with self.tracer:
+                return self._timedBuild(flowables, filename, canvasmaker)
+        return self._timedBuild(flowables, filename, canvasmaker)
+
+    def mergeBuild(self, stories, filename=None, canvasmaker=canvas.Canvas):
+        """build the document in a single pass from ``stories``, an
+        iterable of flowable lists that is read one list at a time
+
+        every story is a record of its own: it starts on a new page with
+        the first page template and has its own page numbers, heading
+        numbers and destination names, see NumberedCanvas.beginRecord.
+        """
+        if self.budget is not None:
+            self.budget.check_pass()
+        if self.tracer is not None:
+            with self.tracer:
+                return self._timedMergeBuild(stories, filename, canvasmaker)
+        return self._timedMergeBuild(stories, filename, canvasmaker)
+
+    def _timedMergeBuild(self, stories, filename, canvasmaker):
+        start = time.perf_counter()
+        try:
+            self._mergeBuild(stories, filename, canvasmaker)
+        finally:
+            if self.stats is not None:
+                self.stats.add_pass(time.perf_counter() - start)
+
+    def splitBuild(self, segments, canvasmaker=canvas.Canvas):
+        """build every ``(out, flowables)`` of the iterable ``segments``
+        into a document of its own written to ``out``, all in a single
+        pass with the page templates and the shared_images of this
+        template"""
+        if self.budget is not None:
+            self.budget.check_pass()
+        if self.tracer is not None:
+            with self.tracer:
+                return self._timedSplitBuild(segments, canvasmaker)
+        return self._timedSplitBuild(segments, canvasmaker)
+
+    def _timedSplitBuild(self, segments, canvasmaker):
+        start = time.perf_counter()
+        self._pages_done = 0
+        try:
+            for out, flowables in segments:
+                self._mergeBuild([flowables], out, canvasmaker)
+                self._pages_done += self.page
+        finally:
+            if self.stats is not None:
+                self.stats.add_pass(time.perf_counter() - start)
+                self.stats.pages = self._pages_done
+
+    def _mergeBuild(self, stories, filename, canvasmaker):
+        self._startBuild(filename, canvasmaker)
+        canv = self.canv
+        self._savedInfo = canv._doc.info
+        try:
+            canv._doctemplate = self
+            for index, flowables in enumerate(stories):
+                if index:
+                    self.handle_nextPageTemplate(0)
+                    if self._hanging and self._hanging[-1] is doctemplate.PageBegin:
+                        # the page of the next record is not begun yet
+                        self._setPageTemplate()
+                    else:
+                        self.handle_pageBreak()
+                canv.beginRecord('record%d:' % index)
+                self.seq = Sequencer()
+                while flowables:
+                    self.clean_hanging()
+                    self.handle_flowable(flowables)
+        finally:
+            del canv._doctemplate
+        canv._doc.info = self._savedInfo
+        self._endBuild()
+
+    def _timedBuild(self, flowables, filename, canvasmaker):
+        if self.stats is None:
+            return BaseDocTemplate.build(self, flowables, filename, canvasmaker)
+        start = time.perf_counter()
+        try:
+            return BaseDocTemplate.build(self, flowables, filename, canvasmaker)
+        finally:
+            self.stats.add_pass(time.perf_counter() - start)
+
     def docEval(self,expr):
         try:
-            return eval(expr.strip(),{},self._nameSpace)
+            return eval(safeeval.compile_cached(expr,'eval'),self._evalGlobals,self._nameSpace)
         except:
             logger.exception('docEval failed')
             # exc = sys.exc_info()[1]
@@ -80,3 +210,16 @@ class DocTemplate(BaseDocTemplate):
             # exc.args = tuple(args)
             # raise
 
+    def docExec(self,stmt,lifetime):
+        NS = self._nameSpace
+        K0 = set(NS)
+        try:
+            if lifetime not in self._allowedLifetimes:
+                raise ValueError('bad lifetime %r not in %r'%(lifetime,self._allowedLifetimes))
+            exec(safeeval.compile_cached(stmt,'exec'),self._evalGlobals,NS)
+        except:
+            for k in [k for k in NS if k not in K0]:
+                del NS[k]
+            annotateException('\ndocExec %s lifetime=%r failed!\n' % (stmt,lifetime))
+        self._addVars([k for k in NS if k not in K0],lifetime)
+
@@ -1,10 +1,13 @@
-import copy
 import logging
+import threading
+import contextlib
+from collections import OrderedDict
 from math import radians, cos, sin
 from pdfrw import PdfReader, PageMerge
 from pdfrw.buildxobj import pagexobj
 from pdfrw.toreportlab import makerl
 
+from reportlab import rl_config
 from reportlab.pdfbase import pdfdoc
 from reportlab.platypus.flowables import _listWrapOn, _flowableSublist, PageBreak
 from reportlab.lib.utils import annotateException, IdentStr, flatten, isStr, asNative, strTypes
@@ -16,11 +19,14 @@ from reportlab.platypus import frames
 from reportlab.platypus import doctemplate
 from reportlab.platypus import flowables
 from reportlab.platypus import xpreformatted
-from reportlab.pdfgen.canvas import Canvas
+from reportlab.pdfgen.canvas import Canvas, _digester
+from reportlab.lib.utils import ImageReader
 from reportlab.platypus.paragraph import Paragraph, cleanBlockQuotedText
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.pdfbase.pdfdoc import PDFObjectReference
+from reportlab.lib import sequencer as rl_sequencer
+from xml.sax.saxutils import escape
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +82,28 @@ def _calc_pc(V,avail):
 
 tables._calc_pc = _calc_pc
 
+# paragraphs number <seq/> tags with the process wide sequencer of
+# reportlab, a render gets one of its own for the thread it runs in
+_local = threading.local()
+_getSequencer = rl_sequencer.getSequencer
+
+def getSequencer():
+    seq = getattr(_local, 'sequencer', None)
+    return _getSequencer() if seq is None else seq
+
+rl_sequencer.getSequencer = getSequencer
+
+@contextlib.contextmanager
+def own_sequencer():
+    """count the <seq/> tags of the paragraphs created in this block from
+    zero, without touching those of other threads"""
+    previous = getattr(_local, 'sequencer', None)
+    _local.sequencer = rl_sequencer.Sequencer()
+    try:
+        yield _local.sequencer
+    finally:
+        _local.sequencer = previous
+
 class PDFInfo(pdfdoc.PDFInfo):
     def __init__(self,custom_metadata=None):
         super(PDFInfo,self).__init__()
@@ -541,14 +569,244 @@ class Table(tables.Table):
                     for i in range(y0,y1+1,args[3]):
                         spanRanges[x0,i] = (x0, i, x1, i+args[3]-1)
 
+class LateForm(pdfdoc.PDFObject):
+    """stands in for the form of a late string until it is filled in"""
+
+
+class WrittenImage(pdfdoc.PDFObject):
+    """stands in for an image already written, drawing it again needs its
+    size"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+
+class SharedImages(object):
+    """image xobjects shared by the documents of a split render, an image
+    drawn in several of them is read and compressed once
+
+    at most ``max_bytes`` of compressed image data are kept, the least
+    recently used images are dropped first.
+    """
+    def __init__(self, max_bytes=64*1024*1024, stats=None):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self._images = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def xobjectName(doc, image, mask):
+        """the name Canvas.drawImage gives ``image`` in ``doc``"""
+        if isinstance(image, ImageReader):
+            # sets _dataA
+            rawdata = image.getRGBData()
+            smask = image._dataA
+            if mask == 'auto' and smask:
+                mdata = smask.getRGBData()
+            else:
+                mdata = str(mask)
+            if isinstance(mdata, str):
+                mdata = mdata.encode('utf8')
+            name = _digester(rawdata + mdata)
+        else:
+            name = _digester(('%s%s' % (image, mask)).encode('utf-8'))
+        return doc.getXObjectName(name)
+
+    def use(self, doc, name):
+        """add the image ``name`` to ``doc`` if another document drew it"""
+        entry = self._images.get(name)
+        if entry is None or name in doc.idToObject:
+            return
+        self._images.move_to_end(name)
+        # the soft mask first, as drawImage does
+        for internal, obj in entry:
+            if internal not in doc.idToObject:
+                # registered with the document before
+                obj.__dict__.pop('__InternalName__', None)
+                doc.Reference(obj, internal)
+        if self.stats is not None:
+            self.stats.incr('images_shared')
+
+    def add(self, doc, name):
+        """share the image ``name`` just drawn in ``doc``"""
+        if name in self._images:
+            return
+        obj = doc.idToObject.get(name)
+        if not isinstance(obj, pdfdoc.PDFImageXObject):
+            return
+        entry = []
+        smask = getattr(obj, 'smask', None)
+        if smask is not None:
+            mask = doc.idToObject.get(smask.name)
+            if not isinstance(mask, pdfdoc.PDFImageXObject):
+                return
+            entry.append((smask.name, mask))
+        entry.append((name, obj))
+        self._images[name] = entry
+        self._bytes += self._size(entry)
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            _, old = self._images.popitem(last=False)
+            self._bytes -= self._size(old)
+
+    @staticmethod
+    def _size(entry):
+        return sum(len(obj.streamContent) for _, obj in entry)
+
+
+class IncrementalPDFWriter(object):
+    """write the objects of a pdf document to ``out`` while it is built
+
+    page dictionaries, content streams, images and forms are written and
+    dropped as soon as their page is finished, everything else (fonts,
+    outlines, the page tree) follows together with the cross-reference
+    table on :meth:`finish`.
+    """
+    # in place of the objects written
+    WRITTEN = pdfdoc.PDFObject()
+
+    def __init__(self, doc, out):
+        self.doc = doc
+        self._close = not hasattr(out, 'write')
+        self.out = open(out, 'wb') if self._close else out
+        self.file = None
+        self.written = set()
+        self._checked = 0
+        # late string forms to write once they are filled in
+        self._pending = []
+
+    def _write(self, name):
+        doc = self.doc
+        if self.file is None:
+            self.file = pdfdoc.PDFFile(doc._pdfVersion)
+            self.out.write(b''.join(self.file.strings))
+            self.file.strings = []
+            self.file.write = self.out.write
+        obj = doc.idToObject[name]
+        doc.idToOffset[name] = self.file.add(pdfdoc.PDFIndirectObject(name, obj).format(doc))
+        # keep a cheap stand in, the object itself is not needed anymore
+        if isinstance(obj, pdfdoc.PDFImageXObject):
+            doc.idToObject[name] = WrittenImage(obj.width, obj.height)
+        else:
+            doc.idToObject[name] = self.WRITTEN
+        self.written.add(name)
+
+    def flushPage(self, page):
+        """write ``page`` with its content stream and the images and forms
+        registered since the last flush"""
+        doc = self.doc
+        if page.stream is not None and not page.Contents:
+            stream = pdfdoc.PDFStream()
+            if page.compression:
+                stream.filters = rl_config.useA85 and [pdfdoc.PDFBase85Encode, pdfdoc.PDFZCompress] or [pdfdoc.PDFZCompress]
+            stream.content = page.stream
+            stream.__Comment__ = "page stream"
+            page.Contents = doc.Reference(stream)
+            page.stream = None
+        if self._pending:
+            pending = self._pending
+            self._pending = []
+            for name in pending:
+                if isinstance(doc.idToObject[name], LateForm):
+                    self._pending.append(name)
+                else:
+                    self._write(name)
+        numbertoid = doc.numberToId
+        while self._checked < doc.objectcounter:
+            self._checked += 1
+            name = numbertoid.get(self._checked)
+            if name is None or name in self.written:
+                continue
+            obj = doc.idToObject[name]
+            # forms are complete once they are added
+            if (name == page.Contents.name or isinstance(obj, (pdfdoc.PDFImageXObject, pdfdoc.PDFFormXObject))):
+                self._write(name)
+            elif isinstance(obj, LateForm):
+                self._pending.append(name)
+        # the page tree only needs a reference
+        name = page.__InternalName__
+        self._write(name)
+        pages = doc.Pages.pages
+        if pages and pages[-1] is page:
+            pages[-1] = pdfdoc.PDFObjectReference(name)
+        if hasattr(self.out, 'flush'):
+            self.out.flush()
+
+    def finish(self, canvas):
+        """write all remaining objects, the cross-reference table and the
+        trailer, like PDFDocument.GetPDFData does in one go"""
+        doc = self.doc
+        for fnt in doc.delayedFonts:
+            fnt.addObjects(doc)
+        doc.info.invariant = doc.invariant
+        doc.info.digest(doc.signature)
+        doc.Reference(doc.Catalog)
+        doc.Reference(doc.info)
+        doc.Outlines.prepare(doc, canvas)
+        if doc.Outlines.ready < 0:
+            doc.Catalog.Outlines = None
+        cat = doc.Reference(doc.Catalog)
+        info = doc.Reference(doc.info)
+        # objects may be added while formatting
+        counter = 0
+        while True:
+            counter += 1
+            if counter not in doc.numberToId:
+                break
+            name = doc.numberToId[counter]
+            if name not in self.written:
+                self._write(name)
+        ids = [doc.numberToId[i] for i in range(1, counter)]
+        xref = pdfdoc.PDFCrossReferenceTable()
+        xref.addsection(0, ids)
+        xrefoffset = self.file.add(xref.format(doc))
+        trailer = pdfdoc.PDFTrailer(
+            startxref=xrefoffset,
+            Size=len(ids)+1,
+            Root=cat,
+            Info=info,
+            ID=doc.ID(),
+            )
+        self.file.add(trailer.format(doc))
+        doc._savedToFile = True
+        if self._close:
+            self.out.close()
+
+
 class NumberedCanvas(Canvas):
     """
     special Canvas to have total page number available, take from: https://gist.github.com/k4ml/7061027
+
+    values only known when the document is complete (the total page number,
+    the page of a reference) are drawn with :meth:`drawLateString` as a
+    form XObject that :meth:`save` fills in, so every page is passed on to
+    the document as soon as it is finished.
+
+    a merged document is a sequence of records (see :meth:`beginRecord`),
+    page numbers, the total page number and destination names are those of
+    the current record.
     """
+    # RenderStats to report pages and the save time to
+    _stats = None
+    # first page of the current record and prefix of its destination names
+    _record_start = 1
+    _record_prefix = ''
+    # SharedImages of the documents rendered together
+    _shared_images = None
+
     def __init__(self, *args, **kwargs):
         super(NumberedCanvas,self).__init__(*args, **kwargs)
         self._doc.info = PDFInfo()
-        self._saved_page_states = []
+        self._late_strings = []
+        self._late_count = 0
+        self._writer = None
+
+    def setIncremental(self, out):
+        """write finished pages to ``out`` (a file-like or a path) right
+        away, the document is completed by :meth:`save`"""
+        if not isinstance(self._doc.encrypt, pdfdoc.NoEncryption):
+            logger.warning('incremental output is not available for encrypted documents')
+            return
+        self._writer = IncrementalPDFWriter(self._doc, out)
 
     def bookmarkPage(self, key,
                       fit="Fit",
@@ -588,7 +846,7 @@ class NumberedCanvas(Canvas):
 
         (question: do we support /FitB, FitBH and /FitBV
         which are hangovers from version 1.1 / Acrobat 3.0?)"""
-        dest = self._bookmarkReference(key)
+        dest = self._bookmarkReference(self._record_prefix + key)
         self._doc.inPage() # try to enable page-only features
         pageref = self.thisPageRef()
 
@@ -630,27 +888,98 @@ class NumberedCanvas(Canvas):
     def thisPageRef(self):
         return PDFObjectReference('Page%s'%self.getPageNumber())
 
+    def drawLateString(self, x, y, resolve, align='left'):
+        """draw the string returned by ``resolve()`` at save time at ``x``,
+        ``y`` with the current font, ``align`` is ``left``, ``right`` or
+        ``centre``"""
+        name = 'LateString%d' % self._late_count
+        self._late_count += 1
+        self._late_strings.append((name, x, y, resolve, align, self._fontname, self._fontsize))
+        # pages written before save refer to it by number
+        self._doc.Reference(LateForm(), pdfdoc.xObjectName(name))
+        self.doForm(name)
+
+    def beginRecord(self, prefix):
+        """start the next record of a merged document on the next page
+
+        the values of the late strings of the record before are filled in,
+        destination names (anchors, links, outline entries) get ``prefix``
+        from now on so each record may use the same ones.
+        """
+        self._fillLateStrings()
+        self._record_start = self._doc.pageCounter
+        self._record_prefix = prefix
+
+    def recordPageNumber(self):
+        """the number of the current page within its record"""
+        return self.getPageNumber() - self._record_start + 1
+
+    def totalPages(self):
+        return self._doc.pageCounter - self._record_start
+
+    def pageOfDestination(self, key):
+        """the page number an anchor ``key`` points to, None if unknown"""
+        dest = self._destinations.get(self._record_prefix + key)
+        if dest is None or dest.page is None:
+            return None
+        return int(dest.page.name[len('Page'):]) - self._record_start + 1
+
+    def destination(self, key):
+        """the destination of the anchor ``key``, None if not set yet"""
+        return self._destinations.get(self._record_prefix + key)
+
+    def addOutlineEntry(self, title, key, level=0, closed=None):
+        super().addOutlineEntry(title, self._record_prefix + key, level, closed)
+
+    def linkRect(self, contents, destinationname, *args, **kwargs):
+        return super().linkRect(contents, self._record_prefix + destinationname, *args, **kwargs)
+
+    def _fillLateStrings(self):
+        # tiny uncompressed forms, filters would only add to their size
+        for name, x, y, resolve, align, fontName, fontSize in self._late_strings:
+            text = resolve()
+            width = stringWidth(text, fontName, fontSize)
+            x -= {'right': width, 'centre': width/2.0}.get(align, 0)
+            textobject = self.beginText(x, y)
+            textobject.setFont(fontName, fontSize)
+            textobject.textOut(text)
+            form = pdfdoc.PDFFormXObject(x - fontSize, y - fontSize, x + width + fontSize, y + 2*fontSize)
+            form.hasImages = 0
+            form.Contents = pdfdoc.PDFStream(content=textobject.getCode(), filters=[])
+            # takes the place of the LateForm
+            internal = pdfdoc.xObjectName(name)
+            form.__InternalName__ = internal
+            self._doc.idToObject[internal] = form
+        self._late_strings = []
+
+    def drawImage(self, image, x, y, width=None, height=None, mask=None, *args, **kwargs):
+        images = self._shared_images
+        if images is None:
+            return super().drawImage(image, x, y, width, height, mask, *args, **kwargs)
+        name = images.xobjectName(self._doc, image, mask)
+        images.use(self._doc, name)
+        result = super().drawImage(image, x, y, width, height, mask, *args, **kwargs)
+        images.add(self._doc, name)
+        return result
+
     def showPage(self):
-        data = dict(self.__dict__)
-        self._saved_page_states.append(data)
-        self._startPage()
+        super().showPage()
+        if self._writer is not None:
+            self._writer.flushPage(self._doc.Pages[-1])
 
     def save(self):
-        """add page info to each page (page x of y)"""
-        from lxml import etree
-        num_pages = len(self._saved_page_states)
-        for state in self._saved_page_states:
-            for count, _code in enumerate(state['_code']):
-                if isinstance(_code,tuple):
-                    TYPE,canv,element = _code
-                    canv._totalpagecount = num_pages
-                    container = etree.Element('container')
-                    container.append(element)
-                    canv.render(container)
-                    state['_code'][count] = canv.canvas._code.pop()
-            self.__dict__.update(state)
-            super().showPage()
-        super().save()
+        if self._stats is None:
+            return self._save()
+        with self._stats.timer('save'):
+            self._save()
+        self._stats.pages = self._doc.pageCounter - 1
+
+    def _save(self):
+        self._fillLateStrings()
+        if self._writer is not None:
+            self._writer.finish(self)
+        else:
+            super().save()
 
 class PdfPage(flowables.Flowable):
     _fixedWidth = 1
@@ -715,12 +1044,19 @@ class PdfPage(flowables.Flowable):
         canv.doForm(xobj_name)
         canv.restoreState()
 
-class Anchor(flowables.Spacer):
+class SourceLine(object):
+    '''slot for the rml source line RMLFlowable sets on its flowables,
+    the slotted helpers below stay without a __dict__'''
+    __slots__ = ('_rml_line',)
+
+class Anchor(SourceLine, flowables.Spacer):
     '''create a bookmark in the pdf'''
     _ZEROSIZE=1
     _SPACETRANSFER = True
+    __slots__ = ('key',)
+    width = height = 0
+
     def __init__(self,key):
-        flowables.Spacer.__init__(self,0,0)
         self.key = key
 
     def __repr__(self):
@@ -733,8 +1069,8 @@ class Anchor(flowables.Spacer):
         pass
 
     def drawOn(self, canv, x, y, _sW=0):
-        if self.key in self.canv._destinations:
-            dest = self.canv._destinations[self.key]
+        dest = getattr(self.canv,'destination',self.canv._destinations.get)(self.key)
+        if dest is not None:
             thispage = self.canv.thisPageRef().name
             different_page = dest.page is not None and dest.page.name != thispage
             different_pos = (dest.fmt is not None) and abs(dest.fmt.top-y)>1
@@ -744,7 +1080,92 @@ class Anchor(flowables.Spacer):
                 logger.warning('anchor "%s" already set to different pos %s (now %s)',self.key,dest.fmt.top,y)
         self.canv.bookmarkPage(self.key,fit='XYZ',top=y)
 
-class incSeq(doctemplate.ActionFlowable):
+class NextOutput(flowables.Spacer):
+    '''the story after it goes into the next output of a split render,
+    named ``name``'''
+    _ZEROSIZE=1
+    def __init__(self,name=None):
+        flowables.Spacer.__init__(self,0,0)
+        self.name = name
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__,self.name)
+
+    def wrap(self,aW,aH):
+        return 0,0
+
+    def draw(self):
+        pass
+
+class Heading(SourceLine, doctemplate.ActionFlowable):
+    '''a numbered heading or bookmark with its anchor, ``section<level>``
+    variable, toc and outline entries
+
+    a single small object in the story, DocTemplate.handle_flowable
+    replaces it with the flowables of expand once the layout gets to it.
+    without ``style`` no paragraph is drawn, without ``toc`` there is no
+    toc entry.
+    '''
+    __slots__ = ('key','text','level','outline','toc','style','numbering')
+
+    def __init__(self,key,text,level,outline,toc=None,style=None,numbering=True):
+        self.key = key
+        self.text = text
+        self.level = level
+        self.outline = outline
+        self.toc = toc
+        self.style = style
+        self.numbering = numbering
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__,self.key)
+
+    def apply(self,doc_tmpl):
+        # doc templates that do not expand it in handle_flowable
+        flowables = self.expand(doc_tmpl)
+        while flowables:
+            doc_tmpl.clean_hanging()
+            doc_tmpl.handle_flowable(flowables)
+
+    def expand(self,doc_tmpl):
+        level = self.level
+        if self.numbering:
+            doc_tmpl.seq.nextf(level-1)
+            for i in range(level,6):
+                doc_tmpl.seq.reset(i)
+        name = 'section%s' % level
+        doc_tmpl._nameSpace[name] = str(self.outline)
+        doc_tmpl._addVars([name],'forever')
+        # headings have always had the space of their style in front of the paragraph too
+        result = [Anchor(self.key),StyleSpace(self.style)]
+        if self.style is not None:
+            text = '{0}. {1}'.format(doc_tmpl.get_numbering(level),self.text)
+            result.append(Paragraph(escape(text),self.style))
+        if self.toc is not None:
+            result.append(ToTOC(self.key,self.toc,level,self.numbering))
+        result.append(ToOutline(self.key,self.outline,level,self.numbering))
+        return result
+
+class StyleSpace(SourceLine, flowables.Flowable):
+    '''zero sized, takes the space before and after of ``style``'''
+    _ZEROSIZE=1
+    __slots__ = ('style',)
+
+    def __init__(self,style=None):
+        self.style = style
+
+    def __repr__(self):
+        return "%s()" % self.__class__.__name__
+
+    def wrap(self,aW,aH):
+        return 0,0
+
+    def drawOn(self, canv, x, y, _sW=0):
+        pass
+
+class incSeq(SourceLine, doctemplate.ActionFlowable):
+    __slots__ = ('level',)
+
     def __init__(self,level):
         self.level = level
 
@@ -756,7 +1177,9 @@ class incSeq(doctemplate.ActionFlowable):
         for i in range(self.level+1,6):
             doc_tmpl.seq.reset(i)
 
-class ToTOC(doctemplate.ActionFlowable):
+class ToTOC(SourceLine, doctemplate.ActionFlowable):
+    __slots__ = ('key','text','level','numbering')
+
     def __init__(self,key,text,level,numbering=True):
         self.key = key
         self.text = text
@@ -773,7 +1196,9 @@ class ToTOC(doctemplate.ActionFlowable):
             text = self.text
         doc_tmpl.notify('TOCEntry', (self.level-1, text, doc_tmpl.page, self.key))
 
-class ToOutline(doctemplate.ActionFlowable):
+class ToOutline(SourceLine, doctemplate.ActionFlowable):
+    __slots__ = ('key','text','level','numbering')
+
     def __init__(self,key,text,level,numbering=True):
         self.key = key
         self.text = text
@@ -788,7 +1213,7 @@ class ToOutline(doctemplate.ActionFlowable):
             text = '{0}. {1}'.format(doc_tmpl.get_numbering(self.level),self.text)
         else:
             text = self.text
-        doc_tmpl.canv.addOutlineEntry(text, self.key, self.level-1, 0)
+        doc_tmpl.canv.addOutlineEntry(text, self.key, self.level-1+doc_tmpl.outline_offset, 0)
 
 class TableOfContents(tableofcontents.TableOfContents):
     """This creates a formatted table of contents.
@@ -822,24 +1247,51 @@ class XPreformatted(xpreformatted.XPreformatted):
             w += stringWidth(frag.text,frag.fontName,frag.fontSize)
         return w
 
-class Ref(Paragraph):
-    """create a reference """
+class Ref(flowables.Flowable):
+    """the page number of the anchor ``target``, filled in when the
+    document is saved"""
     def __init__(self,target,style):
-        Paragraph.__init__(self,target,style)
+        flowables.Flowable.__init__(self)
         self.target = target
+        self.style = style
+
+    def __repr__(self):
+        return "%s(%s)" % (self.__class__.__name__,self.target)
+
+    def wrap(self,aW,aH):
+        self.width = aW
+        self.height = self.style.leading
+        return self.width,self.height
 
-    def resolve(self,text):
-        self._setup(
-            text,
-            self.style,
-            None,
-            None,
-            lambda x:x
-        )
+    def draw(self):
+        style = self.style
+        canv = self.canv
+        canv.setFont(style.fontName,style.fontSize)
+        canv.setFillColor(style.textColor)
+        y = self.height - style.fontSize
+        if style.alignment == TA_RIGHT:
+            x,align = self.width - style.rightIndent,'right'
+        elif style.alignment == TA_CENTER:
+            x,align = (self.width + style.leftIndent - style.rightIndent)/2.0,'centre'
+        else:
+            x,align = style.leftIndent,'left'
+        if hasattr(canv,'drawLateString'):
+            canv.drawLateString(x,y,lambda: self.resolve(canv),align)
+        else:
+            canv.drawString(x,y,self.target)
 
-class ShrinkFrame(doctemplate.FrameActionFlowable):
+    def resolve(self,canv):
+        page = canv.pageOfDestination(self.target)
+        if page is None:
+            logger.warning('reference to unknown anchor "%s"',self.target)
+            return '?'
+        return str(page)
+
+class ShrinkFrame(SourceLine, doctemplate.FrameActionFlowable):
     """ shrink frame to the current size
     """
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -884,6 +1336,21 @@ class PageTemplate(doctemplate.PageTemplate):
         return PageTemplate(frames,**self._kwargs)
 
 class MultiColumns(flowables.Flowable):
+    """lay out ``children`` in ``n_columns`` columns of balanced height
+
+    the children are measured once per column width, the heights are cached
+    and passed on to the parts of a split. The balanced height is the
+    smallest height for which filling the columns in order needs no more
+    than ``n_columns`` columns, it is found by bisection.
+
+    with ``shrink_last`` false the columns are filled up to the available
+    height instead of being balanced. ``min_height`` and ``stretch_last``
+    are kept for compatibility, balancing makes them unnecessary.
+    """
+
+    # tolerance for comparing heights and the precision of the bisection
+    EPSILON = 1e-6
+    PRECISION = 0.5
 
     def __init__(self,n_columns,children,colspace=10,min_height=100,stretch_last=1.1,shrink_last=True):
         super(MultiColumns,self).__init__()
@@ -893,9 +1360,11 @@ class MultiColumns(flowables.Flowable):
         self.min_height = min_height
         self.stretch_last = stretch_last
         self.shrink_last = shrink_last
+        # (column width, [height of each child or None])
+        self._heights = None
 
-    def duplicate(self,children):
-        return MultiColumns(
+    def duplicate(self,children,heights=None,colwidth=None):
+        result = MultiColumns(
                 self.n_columns,
                 children,
                 self.colspace,
@@ -903,85 +1372,151 @@ class MultiColumns(flowables.Flowable):
                 self.stretch_last,
                 self.shrink_last,
                 )
+        if heights is not None:
+            result._heights = (colwidth,heights)
+        return result
 
     def draw(self):
+        heights = self._heights[1]
         x = 0
         y = self.height
-        for i,child in enumerate(self.children):
-            w,h = child.wrap(self.colwidth,self.height)
-            child.drawOn(self.canv,x,y-h)
-            if (y - h) <= 0:
+        for child,h in zip(self.children,heights):
+            if y < self.height and y - h < -self.EPSILON:
                 x += self.colwidth+self.colspace
                 y = self.height
-            else:
-                y -= h
+            child.drawOn(self.canv,x,y-h)
+            y -= h
 
     def calc_colwidth(self,availWidth):
         return (availWidth-self.colspace*(self.n_columns-1))/self.n_columns
 
+    def _child_heights(self,colwidth,availHeight):
+        """return the height of every child in a column of ``colwidth``"""
+        if self._heights is not None and self._heights[0] == colwidth:
+            heights = self._heights[1]
+        else:
+            heights = [None]*len(self.children)
+        for i,h in enumerate(heights):
+            if h is None:
+                heights[i] = self.children[i].wrap(colwidth,availHeight)[1]
+        self._heights = (colwidth,heights)
+        return heights
+
+    def _columns_needed(self,heights,height):
+        """number of columns of ``height`` needed to place ``heights`` in
+        order, counting stops once there are more than ``n_columns``"""
+        limit = height + self.EPSILON
+        columns = 1
+        used = 0
+        for h in heights:
+            if used and used + h > limit:
+                columns += 1
+                if columns > self.n_columns:
+                    break
+                used = 0
+            used += h
+        return columns
+
+    def _fill_height(self,heights,height):
+        """height of the highest column when filling columns of ``height``"""
+        limit = height + self.EPSILON
+        result = used = 0
+        for h in heights:
+            if used and used + h > limit:
+                used = 0
+            used += h
+            result = max(result,used)
+        return result
+
+    def _balance(self,heights,availHeight):
+        """return the balanced height, a height above ``availHeight`` means
+        the children need to be split"""
+        highest = max(heights)
+        low = max(highest,sum(heights)/self.n_columns)
+        if low > availHeight + self.EPSILON or self._columns_needed(heights,low) <= self.n_columns:
+            return low
+        # filling columns of this height leaves less than the highest child
+        # empty in each column, so it always fits
+        high = low + highest
+        if high > availHeight:
+            if self._columns_needed(heights,availHeight) > self.n_columns:
+                return high
+            high = availHeight
+        while high - low > self.PRECISION:
+            middle = (low+high)/2
+            if self._columns_needed(heights,middle) <= self.n_columns:
+                high = middle
+            else:
+                low = middle
+        return high
+
     def wrap(self,availWidth,availHeight):
-        childheights = []
-        childwidths = []
         self.colwidth = self.calc_colwidth(availWidth)
         self.width = availWidth
-        for child in self.children:
-            w,h = child.wrap(self.colwidth,availHeight)
-            childheights.append(h)
-            childwidths.append(w)
-        height = max(sum(childheights)/self.n_columns,max(childheights))
-        if height < availHeight:
-            if height > self.min_height and len(self.children)<self.n_columns and self.shrink_last:
-                parts = self.split(availWidth,height*self.stretch_last)
-                if len(parts) == 1:
-                    self.children = parts[0].children
-                    w,h = self.wrap(availWidth,availHeight)
-                    self.height = h
-            else:
-                self.height = sum(childheights)/self.n_columns
+        heights = self._child_heights(self.colwidth,availHeight)
+        if not heights:
+            self.height = 0
+        elif self.shrink_last:
+            self.height = self._balance(heights,availHeight)
+        elif self._columns_needed(heights,availHeight) <= self.n_columns:
+            self.height = self._fill_height(heights,availHeight)
         else:
-            self.height = height
+            self.height = max(max(heights),sum(heights)/self.n_columns,availHeight+self.EPSILON)
         return self.width,self.height
 
     def split(self,availWidth,availHeight):
-        this_elements = []
-        sum_height = 0
-        total_height = 0
-        rest = copy.copy(self.children)
-        n_cols = 0
-        c = 0
         colwidth = self.calc_colwidth(availWidth)
-        while len(rest) and n_cols < self.n_columns:
-            child = rest.pop(0)
-            w,h = child.wrap(colwidth,availHeight-total_height)
-            if (total_height+h)<=availHeight:
-                parts = [child]
-            else:
-                parts = child.split(colwidth,availHeight-total_height)
-            if len(parts) == 0:
-                rest.insert(0,child)
-                n_cols += 1
-                total_height = 0
+        heights = self._child_heights(colwidth,availHeight)
+        children = self.children
+        this_elements = []
+        this_heights = []
+        # parts of split children still to place, the next one last
+        pending = []
+        column = 0
+        used = 0
+        i = 0
+        while column < self.n_columns:
+            if pending:
+                child,h = pending.pop()
+                index = None
+            elif i < len(children):
+                child,h = children[i],heights[i]
+                index = i
+                i += 1
             else:
-                while len(parts):
-                    part = parts.pop(0)
-                    w,h = part.wrap(colwidth,availHeight-total_height)
-                    if (total_height+h)<=availHeight:
-                        this_elements.append(part)
-                        c += 1
-                        total_height += h
-                        sum_height += h
-                    else:
-                        for x in reversed(parts):
-                            rest.insert(0,x)
-                        rest.insert(0,part)
-                        n_cols += 1
-                        total_height = 0
-                        break
+                break
+            if h is None:
+                h = child.wrap(colwidth,availHeight)[1]
+            if used + h <= availHeight + self.EPSILON:
+                this_elements.append(child)
+                this_heights.append(h)
+                used += h
+                continue
+            parts = []
+            if used < availHeight:
+                parts = child.split(colwidth,availHeight-used)
+                # a failed split may discard the wrap state (Paragraph does)
+                h = None
+                if index is not None:
+                    heights[index] = None
+            if parts:
+                first_height = parts[0].wrap(colwidth,availHeight-used)[1]
+                if used + first_height <= availHeight + self.EPSILON:
+                    this_elements.append(parts[0])
+                    this_heights.append(first_height)
+                    pending.extend((part,None) for part in reversed(parts[1:]))
+                    child = None
+            if child is not None:
+                pending.append((child,h))
+            column += 1
+            used = 0
         result = []
         if len(this_elements):
-            result.append(self.duplicate(this_elements))
+            result.append(self.duplicate(this_elements,this_heights,colwidth))
+            rest = [child for child,h in reversed(pending)] + children[i:]
             if len(rest):
-                result.append(self.duplicate(rest))
+                rest_heights = [h for child,h in reversed(pending)] + heights[i:]
+                result.append(self.duplicate(rest,rest_heights,colwidth))
         return result
 
     def __str__(self):
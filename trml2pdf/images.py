@@ -0,0 +1,154 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+images resampled to the resolution they are drawn at
+
+an image drawn with more pixels than ``dpi`` needs for its size on the
+page is scaled down (keeping its aspect ratio) before it is embedded,
+jpeg images stay jpeg, everything else becomes png. Images that are small
+enough are used as they are, without decoding them. The resampled images
+are kept in a process wide cache by the digest of the source and the
+pixel size. Pillow is needed, without it images are never resampled.
+"""
+
+import io
+import math
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+# images at most this much larger than needed are left alone
+SLACK = 1.1
+
+# bytes of resampled images kept
+CACHE_SIZE = 64 * 1024 * 1024
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_lock = threading.Lock()
+
+
+def _cached(key):
+    with _lock:
+        data = _cache.get(key)
+        if data is not None:
+            _cache.move_to_end(key)
+        return data
+
+
+def _store(key, data):
+    global _cache_bytes
+    with _lock:
+        if key in _cache:
+            return
+        _cache[key] = data
+        _cache_bytes += len(data)
+        while _cache_bytes > CACHE_SIZE and len(_cache) > 1:
+            _, old = _cache.popitem(last=False)
+            _cache_bytes -= len(old)
+
+
+def clear_cache():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def target_size(size, width, height, dpi):
+    """the pixel size of an image of ``size`` pixels drawn ``width`` by
+    ``height`` points at ``dpi``, None if it needs all its pixels"""
+    scales = []
+    if width:
+        scales.append(width / 72.0 * dpi / size[0])
+    if height:
+        scales.append(height / 72.0 * dpi / size[1])
+    if not scales:
+        return None
+    scale = max(scales)
+    if scale * SLACK >= 1:
+        return None
+    return (max(1, int(math.ceil(size[0] * scale))), max(1, int(math.ceil(size[1] * scale))))
+
+
+def _resample(source, size, quality):
+    img = Image.open(source)
+    out = io.BytesIO()
+    if img.format == 'JPEG':
+        # let the decoder skip what is not needed
+        img.draft(img.mode, size)
+        img = img.resize(size, Image.LANCZOS)
+        img.save(out, 'JPEG', quality=quality)
+    else:
+        if img.mode not in ('1', 'L', 'LA', 'RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'transparency' in img.info or img.mode.endswith('A') else 'RGB')
+        img = img.resize(size, Image.LANCZOS)
+        img.save(out, 'PNG', compress_level=1)
+    return out.getvalue()
+
+
+class Downsampler(object):
+    """resample images to ``dpi``, jpeg images are written with
+    ``quality``, ``stats`` counts what was done"""
+
+    def __init__(self, dpi, quality=85, stats=None):
+        self.dpi = dpi
+        self.quality = quality
+        self.stats = stats
+
+    def _incr(self, name):
+        if self.stats is not None:
+            self.stats.incr(name)
+
+    def downsample(self, source, width, height):
+        """``source`` (a path or bytes) drawn ``width`` by ``height``
+        points, as the source itself or a file like object of the
+        resampled image"""
+        if Image is None or not self.dpi:
+            return source
+        data = source if isinstance(source, bytes) else None
+        try:
+            with Image.open(io.BytesIO(data) if data is not None else source) as img:
+                size = target_size(img.size, width, height, self.dpi)
+        except (IOError, OSError, ValueError):
+            return source
+        if size is None:
+            self._incr('images_kept')
+            return source
+        if data is not None:
+            digest = hashlib.sha256(data).digest()
+        else:
+            digest = cache.file_digest(source)
+        key = (digest, size, self.quality)
+        resampled = _cached(key)
+        if resampled is None:
+            resampled = _resample(io.BytesIO(data) if data is not None else source, size, self.quality)
+            _store(key, resampled)
+            self._incr('images_resampled')
+        else:
+            self._incr('images_resample_cached')
+        return io.BytesIO(resampled)
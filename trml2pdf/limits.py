@@ -0,0 +1,141 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+limits of a single render
+
+the limits are checked while the story is read, for every flowable the
+layout handles and for every new page and layout pass, a render going
+beyond one of them stops with :class:`RenderBudgetExceeded`.
+"""
+
+import sys
+import mmap
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ru_maxrss is in kilobytes on linux and in bytes on macos
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+def peak_memory():
+    """the peak resident size of the process in bytes, None where unknown"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def current_memory():
+    """the resident size of the process in bytes
+
+    read from /proc, elsewhere (macos) this is the peak resident size,
+    which only grows once a render needs more than any render before.
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * mmap.PAGESIZE
+    except (IOError, ValueError, IndexError):
+        return peak_memory()
+
+
+class RenderBudgetExceeded(Exception):
+    """a render went beyond its :class:`RenderLimits`
+
+    ``limit`` is the name of the limit, ``stats`` the :class:`RenderStats`
+    of the render up to this point.
+    """
+
+    def __init__(self, limit, value=None, maximum=None, stats=None):
+        if maximum is None:
+            # re-raised with a longer message by annotateException
+            message = limit
+        else:
+            message = '%s limit exceeded: %s > %s' % (limit, value, maximum)
+        super(RenderBudgetExceeded, self).__init__(message)
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.stats = stats
+
+    def __reduce__(self):
+        # raised in the workers of the render server
+        return (self.__class__, (self.limit, self.value, self.maximum, self.stats))
+
+
+class RenderLimits(object):
+    """the maximum wall ``time`` in seconds, ``pages``, layout ``passes``
+    and growth of the resident ``memory`` in bytes of a render, None is
+    no limit"""
+
+    # the memory is looked at on every n-th check only
+    MEMORY_INTERVAL = 64
+
+    def __init__(self, time=None, pages=None, passes=None, memory=None):
+        self.time = time
+        self.pages = pages
+        self.passes = passes
+        self.memory = memory
+
+    def start(self, stats):
+        return Budget(self, stats)
+
+    def __repr__(self):
+        return '%s(time=%r, pages=%r, passes=%r, memory=%r)' % (
+            self.__class__.__name__, self.time, self.pages, self.passes, self.memory)
+
+
+class Budget(object):
+    """the state of one render checked against its limits"""
+
+    def __init__(self, limits, stats):
+        self.limits = limits
+        self.stats = stats
+        self.passes = 0
+        # the exception raised, reportlab may replace it on the way up
+        self.exceeded = None
+        self._checks = 0
+        self._start = time.perf_counter()
+        self._deadline = None if limits.time is None else self._start + limits.time
+        self._memory = None if limits.memory is None else current_memory()
+
+    def _exceeded(self, limit, value, maximum):
+        self.exceeded = RenderBudgetExceeded(limit, value, maximum, self.stats)
+        raise self.exceeded
+
+    def check(self):
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            self._exceeded('time', round(time.perf_counter() - self._start, 3), self.limits.time)
+        if self._memory is not None:
+            self._checks += 1
+            if self._checks % self.limits.MEMORY_INTERVAL == 0:
+                growth = current_memory() - self._memory
+                if growth > self.limits.memory:
+                    self._exceeded('memory', growth, self.limits.memory)
+
+    def check_page(self, page):
+        if self.limits.pages is not None and page > self.limits.pages:
+            self._exceeded('pages', page, self.limits.pages)
+        self.check()
+
+    def check_pass(self):
+        self.passes += 1
+        if self.limits.passes is not None and self.passes > self.limits.passes:
+            self._exceeded('passes', self.passes, self.limits.passes)
+        self.check()
@@ -0,0 +1,238 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+smaller pdf files after saving
+
+the saved document is read back with pdfrw and written again with
+
+* identical streams and other shared objects (fonts, resources, images,
+  imported pdf pages are the usual suspects) stored once
+* uncompressed streams deflated and the ascii85 layer of ascii85/flate
+  streams removed
+* flate streams re-deflated with the chosen zlib ``level`` when that is
+  smaller, images only with ``images=True``
+
+streams in DCT, JPX, CCITT or JBIG2 encoding are never touched.
+"""
+
+import io
+import time
+import zlib
+import base64
+import hashlib
+import logging
+
+from pdfrw import PdfReader, PdfWriter, PdfDict, PdfArray, PdfName
+
+logger = logging.getLogger(__name__)
+
+# image codecs, recompressing these gains nothing
+CODECS = frozenset(('/DCTDecode', '/JPXDecode', '/CCITTFaxDecode', '/JBIG2Decode'))
+
+# objects that are never merged, even when they look the same
+UNIQUE_TYPES = frozenset(('/Catalog', '/Pages', '/Page', '/Outlines'))
+
+
+class OptimizeReport(object):
+    """the result of :meth:`Optimizer.optimize`, ``seconds`` is the cpu
+    time spent"""
+
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+        self.streams = 0
+        self.duplicates = 0
+        self.recompressed = 0
+
+    @property
+    def saved(self):
+        return self.bytes_in - self.bytes_out
+
+    def as_dict(self):
+        return {
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'saved': self.saved,
+            'seconds': self.seconds,
+            'streams': self.streams,
+            'duplicates': self.duplicates,
+            'recompressed': self.recompressed,
+        }
+
+    def __repr__(self):
+        return '<%s saved=%d of %d bytes in %.4fs>' % (
+            self.__class__.__name__, self.saved, self.bytes_in, self.seconds)
+
+
+def _filters(obj):
+    value = obj.Filter
+    if value is None:
+        return []
+    if isinstance(value, PdfArray):
+        return list(value)
+    return [value]
+
+
+def _a85decode(data):
+    data = data.strip()
+    if data.startswith(b'<~'):
+        data = data[2:]
+    if data.endswith(b'~>'):
+        data = data[:-2]
+    return base64.a85decode(data, ignorechars=b' \t\n\r\x0b')
+
+
+class Optimizer(object):
+    """rewrite saved pdfs smaller
+
+    ``level`` is the zlib level for deflating streams (None leaves the
+    compression alone), ``images`` also re-deflates flate compressed
+    images, ``dedup`` stores identical streams once.
+    """
+
+    def __init__(self, level=9, images=False, dedup=True):
+        self.level = level
+        self.images = images
+        self.dedup = dedup
+
+    def __repr__(self):
+        return '%s(level=%r, images=%r, dedup=%r)' % (
+            self.__class__.__name__, self.level, self.images, self.dedup)
+
+    def optimize(self, data):
+        """return the optimized pdf ``data`` and an :class:`OptimizeReport`"""
+        start = time.process_time()
+        report = OptimizeReport()
+        report.bytes_in = len(data)
+        pdf = PdfReader(fdata=data, decompress=False)
+        objects = []
+        containers = []
+        self._collect(pdf, set(), objects, containers)
+        streams = [x for x in objects if isinstance(x, PdfDict) and x.stream is not None]
+        report.streams = len(streams)
+        if self.level is not None:
+            for obj in streams:
+                if self._compress(obj):
+                    report.recompressed += 1
+        if self.dedup:
+            report.duplicates = self._dedup(objects, containers)
+        out = io.BytesIO()
+        PdfWriter(trailer=pdf).write(out)
+        result = out.getvalue()
+        if len(result) >= len(data):
+            # nothing to gain, keep the original
+            result = data
+        report.bytes_out = len(result)
+        report.seconds = time.process_time() - start
+        return result, report
+
+    def _collect(self, obj, visited, objects, containers):
+        # children before parents, an object is signed after the objects
+        # it refers to
+        if id(obj) in visited:
+            return
+        visited.add(id(obj))
+        containers.append(obj)
+        values = obj.values() if isinstance(obj, PdfDict) else obj
+        for value in values:
+            if isinstance(value, (PdfDict, PdfArray)):
+                self._collect(value, visited, objects, containers)
+        if obj.indirect or getattr(obj, 'stream', None) is not None:
+            objects.append(obj)
+
+    def _compress(self, obj):
+        filters = _filters(obj)
+        if any(x in CODECS for x in filters):
+            return False
+        is_image = obj.Subtype == '/Image'
+        raw = obj.stream.encode('latin-1')
+        params = obj.DecodeParms
+        if filters == ['/ASCII85Decode', '/FlateDecode']:
+            try:
+                deflated = _a85decode(raw)
+            except ValueError:
+                return False
+            if isinstance(params, PdfArray):
+                params = params[1]
+        elif filters == ['/FlateDecode']:
+            if is_image and not self.images:
+                return False
+            deflated = raw
+        elif not filters:
+            deflated = None
+        else:
+            return False
+        if deflated is None:
+            plain = raw
+        elif deflated is raw or not is_image or self.images:
+            try:
+                plain = zlib.decompress(deflated)
+            except zlib.error:
+                return False
+        else:
+            plain = None
+        best = deflated
+        if plain is not None:
+            candidate = zlib.compress(plain, self.level)
+            if best is None or len(candidate) < len(best):
+                best = candidate
+        if best is None or len(best) >= len(raw):
+            return False
+        obj.Filter = PdfName.FlateDecode
+        obj.DecodeParms = params
+        obj.stream = best.decode('latin-1')
+        return True
+
+    def _signature(self, value, canonical):
+        if isinstance(value, PdfDict):
+            if value.indirect or value.stream is not None:
+                return ('ref', id(canonical.get(id(value), value)))
+            return ('dict', tuple(sorted((k, self._signature(v, canonical)) for k, v in value.items())))
+        if isinstance(value, PdfArray):
+            if value.indirect:
+                return ('ref', id(canonical.get(id(value), value)))
+            return ('array', tuple(self._signature(v, canonical) for v in value))
+        return str(value)
+
+    def _dedup(self, objects, containers):
+        canonical = {}
+        seen = {}
+        for obj in objects:
+            if isinstance(obj, PdfArray):
+                key = self._signature(PdfArray(obj), canonical)
+            elif obj.Type in UNIQUE_TYPES or obj.Parent is not None:
+                continue
+            else:
+                items = tuple(sorted((k, self._signature(v, canonical)) for k, v in obj.items() if k != '/Length'))
+                stream = obj.stream
+                key = (items, None if stream is None else hashlib.sha256(stream.encode('latin-1')).digest())
+            first = seen.setdefault(key, obj)
+            if first is not obj:
+                canonical[id(obj)] = first
+        if not canonical:
+            return 0
+        for container in containers:
+            if isinstance(container, PdfDict):
+                for key, value in container.items():
+                    if id(value) in canonical:
+                        container[key] = canonical[id(value)]
+            else:
+                for i, value in enumerate(container):
+                    if id(value) in canonical:
+                        container[i] = canonical[id(value)]
+        return len(canonical)
@@ -0,0 +1,90 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+compiled and checked document expressions
+
+every distinct expression or statement is compiled once and the code
+object is kept in a process wide cache, shared by all pages, passes and
+documents. Code using names with two leading underscores, frame and
+generator internals or string formatting with ``format`` (its replacement
+fields may look up attributes like ``{0.__class__}``) is rejected at
+compile time, and runs with a small set of builtins only. This closes the
+known ways from an expression to the interpreter internals, use ``%``
+formatting instead of ``format``.
+"""
+
+import builtins
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 1024
+
+SAFE_BUILTINS = dict((name, getattr(builtins, name)) for name in (
+    'abs', 'all', 'any', 'bool', 'chr', 'dict', 'divmod', 'enumerate',
+    'filter', 'float', 'int', 'isinstance', 'len', 'list', 'map',
+    'max', 'min', 'ord', 'pow', 'range', 'repr', 'reversed', 'round', 'set',
+    'sorted', 'str', 'sum', 'tuple', 'zip',
+    'Exception', 'ValueError', 'KeyError', 'IndexError', 'TypeError',
+    'ZeroDivisionError',
+))
+
+UNSAFE_NAMES = frozenset((
+    'ag_frame', 'cr_frame', 'gi_frame', 'gi_code', 'tb_frame', 'tb_next',
+    'f_back', 'f_builtins', 'f_code', 'f_globals', 'f_locals', 'mro',
+    'format', 'format_map',
+))
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _check(code, source):
+    for name in code.co_names + code.co_varnames:
+        if name.startswith('__') or name in UNSAFE_NAMES:
+            raise ValueError('name %r not allowed in %r' % (name, source))
+    for const in code.co_consts:
+        if hasattr(const, 'co_names'):
+            _check(const, source)
+
+
+def compile_cached(source, mode='eval'):
+    """return the checked code object of ``source``, ``mode`` is ``eval``
+    or ``exec``"""
+    source = source.strip()
+    key = (source, mode)
+    with _lock:
+        code = _cache.get(key)
+        if code is not None:
+            _cache.move_to_end(key)
+            return code
+    code = compile(source, '<rml>', mode)
+    _check(code, source)
+    with _lock:
+        _cache[key] = code
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return code
+
+
+def new_globals():
+    """globals for running cached code, one per document"""
+    return {'__builtins__': SAFE_BUILTINS}
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
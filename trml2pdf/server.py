@@ -0,0 +1,431 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+long lived render server
+
+a pool of pre-forked workers imports everything and renders some warm-up
+documents once, every request afterwards only pays for its own layout.
+The server speaks plain HTTP, either on localhost or on a unix socket:
+
+    POST /          body is the rml document, answer is the pdf
+    POST /          with ``Content-Type: application/json`` the body is
+                    ``{"rml": "...", "assets": {"logo.png": "<base64>"}}``
+    GET  /health    pool status as json
+
+with a cache directory the workers answer documents rendered before from
+the :class:`cache.ResultCache` without rendering them again.
+"""
+
+import os
+import sys
+import json
+import base64
+import signal
+import logging
+import tempfile
+import threading
+import socketserver
+import multiprocessing
+from http import server as http_server
+from concurrent import futures
+
+import click
+
+from .limits import RenderLimits, RenderBudgetExceeded
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RML = b'''<?xml version="1.0" encoding="utf-8"?>
+<document>
+  <template>
+    <pageTemplate id="main">
+      <pageGraphics>
+        <setFont name="Helvetica" size="8"/>
+        <drawRightString x="19cm" y="1cm">page <pageNumber/> of <totalPageNumber/></drawRightString>
+      </pageGraphics>
+      <frame id="first" x1="2cm" y1="2cm" width="17cm" height="25cm"/>
+    </pageTemplate>
+  </template>
+  <stylesheet>
+    <paraStyle name="body" fontName="Helvetica" fontSize="10"/>
+  </stylesheet>
+  <story>
+    <h1>warm up</h1>
+    <para style="body">warm <b>up</b> <i>the</i> caches</para>
+    <blockTable colWidths="5cm,5cm">
+      <tr><td>a</td><td>b</td></tr>
+    </blockTable>
+  </story>
+</document>
+'''
+
+
+class RenderTimeout(Exception):
+    pass
+
+
+class QueueFull(Exception):
+    pass
+
+
+class InvalidAsset(ValueError):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise RenderTimeout('render did not finish in time')
+
+
+# result cache of the worker process
+_cache = None
+_initialized = False
+
+
+def _init_worker(basepath, warmup, cache_dir=None, cache_size=None):
+    global _cache, _initialized
+    _initialized = True
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, _on_alarm)
+    if basepath:
+        os.chdir(basepath)
+    from . import trml2pdf
+    if cache_dir:
+        from .cache import ResultCache, DEFAULT_MAX_SIZE
+        _cache = ResultCache(cache_dir, cache_size or DEFAULT_MAX_SIZE)
+    documents = [(WARMUP_RML, os.getcwd())]
+    for path in warmup:
+        path = os.path.abspath(path)
+        with open(path, 'rb') as f:
+            documents.append((f.read(), os.path.dirname(path)))
+    for data, path in documents:
+        cwd = os.getcwd()
+        try:
+            os.chdir(path)
+            trml2pdf.parseString(data, path)
+        except Exception:
+            logger.exception('warm up failed')
+        finally:
+            os.chdir(cwd)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _call(initargs, func, *args):
+    # python 3.6 pools have no initializer, the first job of a worker sets it up
+    if not _initialized:
+        _init_worker(*initargs)
+    return func(*args)
+
+
+def _write_assets(directory, assets):
+    for name, data in assets.items():
+        path = os.path.normpath(os.path.join(directory, name))
+        if os.path.isabs(name) or not path.startswith(directory + os.sep):
+            raise InvalidAsset('invalid asset name %r' % name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+
+def _render_job(data, assets, timeout, limits=None):
+    from . import trml2pdf
+    cwd = os.getcwd()
+    # re-arm every second in case the first alarm got swallowed
+    # by one of the catch-all handlers in the renderer
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout, 1)
+    try:
+        if assets:
+            with tempfile.TemporaryDirectory(prefix='trml2pdf-') as basepath:
+                _write_assets(basepath, assets)
+                os.chdir(basepath)
+                return trml2pdf.parseString(data, basepath, cache=_cache, limits=limits)
+        return trml2pdf.parseString(data, cwd, cache=_cache, limits=limits)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        os.chdir(cwd)
+
+
+class RenderServer(object):
+    """a pool of warm render workers
+
+    ``workers`` processes are forked on :meth:`start`, ``max_queue``
+    requests may wait on top of the ones being rendered, everything beyond
+    is rejected with :class:`QueueFull`. A render running longer than
+    ``timeout`` seconds is aborted with :class:`RenderTimeout`. With a
+    ``cache_dir`` the workers share a :class:`cache.ResultCache` of at most
+    ``cache_size`` bytes. Every render is held to the
+    :class:`limits.RenderLimits` ``limits``.
+    """
+
+    def __init__(self, workers=None, max_queue=16, timeout=30,
+                 warmup=(), basepath=None, cache_dir=None, cache_size=None, limits=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.warmup = list(warmup)
+        self.basepath = os.path.abspath(basepath or os.getcwd())
+        self.cache_dir = os.path.abspath(cache_dir) if cache_dir else None
+        self.cache_size = cache_size
+        self.limits = limits
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self._pool = None
+        # pending renders, cancelled on close, with a lock of their own as
+        # the pool calls back while close holds the other one
+        self._futures = set()
+        self._futures_lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    def _initargs(self):
+        return (self.basepath, self.warmup, self.cache_dir, self.cache_size)
+
+    def _create_pool(self):
+        if sys.version_info >= (3, 7):
+            pool = futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=self._initargs())
+        else:
+            pool = futures.ProcessPoolExecutor(max_workers=self.workers)
+        # fork all workers now and wait until they are warm
+        pids = [self._pool_submit(pool, _ping) for i in range(self.workers)]
+        futures.wait(pids)
+        return pool
+
+    def _pool_submit(self, pool, func, *args):
+        if sys.version_info >= (3, 7):
+            return pool.submit(func, *args)
+        return pool.submit(_call, self._initargs(), func, *args)
+
+    def start(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                # renders not started yet are dropped, running ones finish
+                with self._futures_lock:
+                    pending = list(self._futures)
+                for future in pending:
+                    future.cancel()
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self, data, assets):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            try:
+                future = self._pool_submit(self._pool, _render_job, data, assets, self.timeout, self.limits)
+            except futures.process.BrokenProcessPool:
+                logger.warning('worker pool broken, restarting')
+                self._pool.shutdown(wait=False)
+                self._pool = self._create_pool()
+                future = self._pool_submit(self._pool, _render_job, data, assets, self.timeout, self.limits)
+            with self._futures_lock:
+                self._futures.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    def render(self, data, assets=None):
+        """render ``data`` in a worker and return the pdf as bytes
+
+        ``assets`` maps relative file names to their content, they are made
+        available next to the document while it renders.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull('%s requests pending' % (self.workers + self.max_queue))
+        try:
+            future = self._submit(data, assets or {})
+            # the worker enforces the timeout itself, this one only
+            # protects against a worker stuck outside of python code
+            wait = None if not self.timeout else self.timeout + 5
+            try:
+                result = future.result(timeout=wait)
+            except futures.TimeoutError:
+                future.cancel()
+                raise RenderTimeout('render did not finish in time')
+            with self._lock:
+                self.served += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def status(self):
+        with self._lock:
+            served, rejected = self.served, self.rejected
+        with self._futures_lock:
+            pending = len(self._futures)
+        return {
+            'workers': self.workers,
+            'max_queue': self.max_queue,
+            'timeout': self.timeout,
+            'served': served,
+            'rejected': rejected,
+            'pending': pending,
+        }
+
+    def make_http_server(self, host='127.0.0.1', port=8000, socket_path=None):
+        handler = type('Handler', (RenderRequestHandler,), {'render_server': self})
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            return UnixHTTPServer(socket_path, handler)
+        return ThreadingHTTPServer((host, port), handler)
+
+
+# http.server.ThreadingHTTPServer is new in python 3.7
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http_server.HTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class RenderRequestHandler(http_server.BaseHTTPRequestHandler):
+    render_server = None
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        # unix sockets have no peer address
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        logger.info('%s - %s', self.address_string(), format % args)
+
+    def _reply(self, code, body, content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._reply(200, self.render_server.status())
+        else:
+            self._reply(404, {'error': 'not found'})
+
+    def _read_request(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length < 0:
+            raise ValueError('negative Content-Length')
+        body = self.rfile.read(length)
+        if self.headers.get_content_type() != 'application/json':
+            return body, {}
+        request = json.loads(body.decode('utf-8'))
+        if not isinstance(request, dict):
+            raise TypeError('expected a json object')
+        assets = request.get('assets', {})
+        if not isinstance(assets, dict):
+            raise TypeError('assets must be an object')
+        if not isinstance(request['rml'], str):
+            raise TypeError('rml must be a string')
+        data = request['rml'].encode('utf-8')
+        return data, dict((name, base64.b64decode(value)) for name, value in assets.items())
+
+    def do_POST(self):
+        try:
+            data, assets = self._read_request()
+        except (ValueError, KeyError, TypeError) as e:
+            # the body may not have been read
+            self.close_connection = True
+            self._reply(400, {'error': 'invalid request: %s' % e})
+            return
+        try:
+            pdf = self.render_server.render(data, assets)
+        except QueueFull as e:
+            self._reply(503, {'error': str(e)})
+        except RenderTimeout as e:
+            self._reply(504, {'error': str(e)})
+        except RenderBudgetExceeded as e:
+            self._reply(422, {'error': str(e), 'limit': e.limit,
+                              'stats': e.stats.as_dict() if e.stats is not None else None})
+        except InvalidAsset as e:
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            logger.exception('render failed')
+            self._reply(500, {'error': '%s: %s' % (e.__class__.__name__, e)})
+        else:
+            self._reply(200, pdf, 'application/pdf')
+
+
+@click.command()
+@click.option('-l', '--log-level', default='WARNING')
+@click.option('--host', default='127.0.0.1', help='address to listen on')
+@click.option('--port', default=8000, type=int)
+@click.option('--socket', 'socket_path', help='listen on this unix socket instead of tcp')
+@click.option('--workers', type=int, help='number of worker processes, defaults to the cpu count')
+@click.option('--queue', 'max_queue', default=16, type=int, help='requests allowed to wait for a worker')
+@click.option('--timeout', default=30.0, type=float, help='seconds a single render may take')
+@click.option('--warmup', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='rml document rendered by every worker on startup')
+@click.option('--basepath', type=click.Path(exists=True, file_okay=False),
+              help='directory relative file references are resolved against')
+@click.option('--cache-dir', type=click.Path(file_okay=False),
+              help='reuse pdfs rendered before from this directory')
+@click.option('--cache-size', default=256, type=int, help='size limit of the cache directory in MB')
+@click.option('--max-pages', type=int, help='pages a single document may have')
+@click.option('--max-passes', type=int, help='layout passes a single document may take')
+@click.option('--max-memory', type=int, help='MB the memory of a worker may grow by in one render')
+def serve(log_level, host, port, socket_path, workers, max_queue, timeout, warmup, basepath,
+          cache_dir, cache_size, max_pages, max_passes, max_memory):
+    """render rml documents sent over http"""
+    logging.basicConfig(level=log_level)
+    render_server = RenderServer(workers=workers, max_queue=max_queue, timeout=timeout,
+                                 warmup=warmup, basepath=basepath, cache_dir=cache_dir,
+                                 cache_size=cache_size * 1024 * 1024,
+                                 limits=RenderLimits(pages=max_pages, passes=max_passes,
+                                                     memory=max_memory and max_memory * 1024 * 1024))
+    render_server.start()
+    httpd = render_server.make_http_server(host, port, socket_path)
+    logger.warning('serving on %s', socket_path or '%s:%s' % (host, port))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        render_server.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
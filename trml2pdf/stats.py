@@ -0,0 +1,98 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+import time
+import contextlib
+from collections import Counter, defaultdict
+
+clock = time.perf_counter
+
+# order of the phases in reports
+PHASES = ('parse', 'docinit', 'styles', 'templates', 'story', 'layout', 'pageGraphics', 'save')
+
+
+class RenderStats(object):
+    """timings and counters of a single render
+
+    ``timings`` maps phases to seconds, ``passes`` holds the duration of
+    every layout pass, ``flowables`` counts the flowables created per rml
+    tag and ``counters`` everything else (images decoded, cache hits, ...).
+    """
+
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.passes = []
+        self.pages = 0
+        self.flowables = Counter()
+        self.counters = Counter()
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        start = clock()
+        try:
+            yield
+        finally:
+            self.timings[phase] += clock() - start
+
+    def incr(self, name, n=1):
+        self.counters[name] += n
+
+    def add_pass(self, seconds):
+        self.passes.append(seconds)
+        self.timings['layout'] += seconds
+
+    @property
+    def total(self):
+        return self.timings.get('total', 0.0)
+
+    @property
+    def pages_per_second(self):
+        return self.pages / self.total if self.total else None
+
+    def as_dict(self):
+        return {
+            'timings': dict(self.timings),
+            'passes': list(self.passes),
+            'pages': self.pages,
+            'flowables': dict(self.flowables),
+            'counters': dict(self.counters),
+        }
+
+    def format(self):
+        lines = ['total %12.4fs' % self.total]
+        phases = [x for x in PHASES if x in self.timings]
+        phases += sorted(x for x in self.timings if x not in PHASES and x != 'total')
+        for phase in phases:
+            lines.append('  %-14s %8.4fs' % (phase, self.timings[phase]))
+        lines.append('passes %d (%s)' % (len(self.passes), ', '.join('%.4fs' % x for x in self.passes)))
+        if self.pages_per_second:
+            lines.append('pages %d (%.1f pages/s)' % (self.pages, self.pages_per_second))
+        else:
+            lines.append('pages %d' % self.pages)
+        if self.flowables:
+            lines.append('flowables %d' % sum(self.flowables.values()))
+            for tag, n in self.flowables.most_common():
+                lines.append('  %-14s %8d' % (tag, n))
+        if self.counters:
+            lines.append('counters')
+            for name, n in sorted(self.counters.items()):
+                lines.append('  %-14s %8d' % (name, n))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return '<%s total=%.4fs pages=%d passes=%d>' % (
+            self.__class__.__name__, self.total, self.pages, len(self.passes))
@@ -0,0 +1,222 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+data driven rml documents
+
+a document rendered with a ``context`` (a dict) may use
+
+``for="row in rows"``
+    repeat the element for every item, ``for="name, value in items"``
+    unpacks the items
+``if="expr"``
+    keep the element only if ``expr`` is true, it is tested for every
+    repetition of a ``for`` on the same element
+``${expr}``
+    in text and attribute values, replaced by the value of ``expr``
+    (``$${`` is a literal ``${``)
+
+the expressions see the context and the loop variables. The template is
+compiled into xml text: every run of literal text and placeholders
+becomes a single expression (checked and cached by :mod:`safeeval`), so
+expanding it evaluates one expression per repetition, and the result is
+parsed once. libxml2 builds the tree several times faster than creating
+the elements one by one from python.
+"""
+
+import re
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from . import safeeval
+
+_attribute_entities = {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#9;'}
+_placeholder_re = re.compile(r'\$\$\{|\$\{(.*?)\}', re.S)
+
+
+def _text(value):
+    return '' if value is None else escape(str(value))
+
+
+def _attribute(value):
+    return '' if value is None else escape(str(value), _attribute_entities)
+
+
+# available to the compiled expressions
+_HELPERS = {'_text': _text, '_attribute': _attribute}
+_QUOTE = {'_text': escape, '_attribute': lambda x: escape(x, _attribute_entities)}
+
+
+def _evaluate(code, source, node, ns):
+    try:
+        return eval(code, ns)
+    except Exception as e:
+        raise ValueError('%s: %s in %r (line %s)' % (
+            e.__class__.__name__, e, source, node.sourceline)) from e
+
+
+class _Namespace(dict):
+    """the context and loop variables together with the builtins and
+    helpers, eval gets it as globals so comprehensions and lambdas of an
+    expression see the variables too"""
+
+    def child(self):
+        return _Namespace(self)
+
+
+class _Segment(object):
+    """literal xml and placeholders compiled into one expression"""
+
+    def __init__(self):
+        self.items = []
+        self.placeholders = []
+
+    def literal(self, xml):
+        self.items.append(repr(xml))
+
+    def text(self, text, node, quote):
+        pos = 0
+        for match in _placeholder_re.finditer(text):
+            literal = text[pos:match.start()]
+            if match.group(1) is None:
+                literal += '${'
+            if literal:
+                self.literal(_QUOTE[quote](literal))
+            source = match.group(1)
+            if source is not None:
+                # compiled alone first for the check and a clear error
+                self.placeholders.append((safeeval.compile_cached(source), source, node))
+                self.items.append('%s((%s\n))' % (quote, source))
+            pos = match.end()
+        if text[pos:]:
+            self.literal(_QUOTE[quote](text[pos:]))
+
+    def compile(self):
+        if not self.placeholders:
+            return eval(''.join(self.items) or "''")
+        self.code = safeeval.compile_cached("''.join((%s,))" % ', '.join(self.items))
+        return self
+
+    def render(self, ns):
+        try:
+            return eval(self.code, ns)
+        except Exception:
+            for code, source, node in self.placeholders:
+                _evaluate(code, source, node, ns)
+            raise
+
+
+class _Program(object):
+    """the xml text of an element, a list of strings, segments and elements
+    with directives"""
+
+    def __init__(self, node, directives):
+        self.chunks = []
+        self._segment = _Segment()
+        self._element(node, directives)
+        self._flush()
+
+    def _flush(self):
+        if self._segment.items:
+            self.chunks.append(self._segment.compile())
+            self._segment = _Segment()
+
+    def _text(self, text, node, quote='_text'):
+        if text:
+            self._segment.text(text, node, quote)
+
+    def _element(self, node, directives=True):
+        if directives and ('for' in node.attrib or 'if' in node.attrib):
+            self._flush()
+            self.chunks.append(_Element(node))
+            return
+        self._segment.literal('<' + node.tag)
+        for key, value in node.attrib.items():
+            if directives or key not in ('for', 'if'):
+                self._segment.literal(' %s="' % key)
+                self._text(value, node, '_attribute')
+                self._segment.literal('"')
+        self._segment.literal('>')
+        self._text(node.text, node)
+        for child in node:
+            if isinstance(child.tag, str):
+                self._element(child)
+            self._text(child.tail, node)
+        self._segment.literal('</%s>' % node.tag)
+
+    def run(self, out, ns):
+        for chunk in self.chunks:
+            if chunk.__class__ is str:
+                out.append(chunk)
+            elif chunk.__class__ is _Segment:
+                out.append(chunk.render(ns))
+            else:
+                chunk.expand(out, ns)
+
+
+class _Element(object):
+    """an element with a ``for`` or ``if`` directive"""
+
+    def __init__(self, node):
+        self.node = node
+        self.loop = None
+        loop = node.attrib.get('for')
+        if loop is not None:
+            target, sep, source = loop.partition(' in ')
+            if not sep:
+                raise ValueError('invalid for="%s" (line %s)' % (loop, node.sourceline))
+            names = [x.strip() for x in target.split(',')]
+            self.loop = (names, ',' in target, safeeval.compile_cached(source), source)
+        self.condition = None
+        condition = node.attrib.get('if')
+        if condition is not None:
+            self.condition = (safeeval.compile_cached(condition), condition)
+        self.program = _Program(node, directives=False)
+
+    def expand(self, out, ns):
+        if self.loop is None:
+            self._emit(out, ns)
+            return
+        names, unpack, code, source = self.loop
+        local = ns.child()
+        for value in _evaluate(code, source, self.node, ns):
+            if unpack:
+                local.update(zip(names, value))
+            else:
+                local[names[0]] = value
+            self._emit(out, local)
+
+    def _emit(self, out, ns):
+        if self.condition is None or _evaluate(self.condition[0], self.condition[1], self.node, ns):
+            self.program.run(out, ns)
+
+
+class Template(object):
+    """a compiled rml template, :meth:`expand` may be called many times"""
+
+    def __init__(self, root):
+        self.program = _Program(root, directives=False)
+
+    def expand(self, context):
+        """return a new tree with the directives of the template applied"""
+        ns = _Namespace(context)
+        ns.update(safeeval.new_globals())
+        ns.update(_HELPERS)
+        out = []
+        self.program.run(out, ns)
+        parser = etree.XMLParser(huge_tree=True)
+        return etree.fromstring(''.join(out), parser)
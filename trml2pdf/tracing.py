@@ -0,0 +1,156 @@
+# trml2pdf - An RML to PDF converter
+# Copyright (C) 2003, Fabien Pinckaers, UCL, FSA
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+"""
+tracing of the layout calls
+
+while a :class:`LayoutTracer` is active the ``wrap``, ``split`` and
+``drawOn`` methods of all flowable classes are replaced by wrappers that
+count the calls and their cumulative time per flowable class and rml
+source line (``_rml_line``, set by ``RMLFlowable``). The wrappers are
+removed again when the last tracer finishes, and calls made in other threads
+pass through untraced.
+"""
+
+import time
+import logging
+import functools
+import threading
+
+from reportlab.platypus import flowables
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ('wrap', 'split', 'drawOn')
+
+clock = time.perf_counter
+
+_lock = threading.Lock()
+_local = threading.local()
+_originals = {}
+_users = 0
+
+
+def _flowable_classes():
+    classes = [flowables.Flowable]
+    todo = [flowables.Flowable]
+    while todo:
+        for cls in todo.pop().__subclasses__():
+            if cls not in classes:
+                classes.append(cls)
+                todo.append(cls)
+    return classes
+
+
+def _traced(op, func):
+    @functools.wraps(func)
+    def traced(self, *args, **kwargs):
+        tracer = getattr(_local, 'tracer', None)
+        if tracer is None:
+            return func(self, *args, **kwargs)
+        return tracer.call(op, func, self, args, kwargs)
+    return traced
+
+
+def _install():
+    global _users
+    with _lock:
+        if not _users:
+            for cls in _flowable_classes():
+                for op in OPERATIONS:
+                    func = cls.__dict__.get(op)
+                    if func is not None and callable(func):
+                        _originals[cls, op] = func
+                        setattr(cls, op, _traced(op, func))
+        _users += 1
+
+
+def _uninstall():
+    global _users
+    with _lock:
+        _users -= 1
+        if not _users:
+            for (cls, op), func in _originals.items():
+                setattr(cls, op, func)
+            _originals.clear()
+
+
+class LayoutTracer(object):
+    """record the layout calls made while it is active
+
+    use it as context manager or pass it to ``RMLDoc.render(tracer=...)``
+    and print :meth:`report` afterwards.
+    """
+
+    def __init__(self):
+        # (class name, rml line) -> [wrap, split, drawOn, seconds]
+        self.records = {}
+        self._stack = []
+
+    def __enter__(self):
+        if getattr(_local, 'tracer', None) is not None:
+            raise RuntimeError('a layout tracer is already active in this thread')
+        _install()
+        _local.tracer = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.tracer = None
+        _uninstall()
+
+    def call(self, op, func, flowable, args, kwargs):
+        key = (id(flowable), op)
+        if self._stack and self._stack[-1] == key:
+            # a subclass calling the same method of its base class
+            return func(flowable, *args, **kwargs)
+        self._stack.append(key)
+        start = clock()
+        try:
+            result = func(flowable, *args, **kwargs)
+        finally:
+            elapsed = clock() - start
+            self._stack.pop()
+            line = getattr(flowable, '_rml_line', None)
+            record = self.records.get((flowable.__class__.__name__, line))
+            if record is None:
+                record = self.records[flowable.__class__.__name__, line] = [0, 0, 0, 0.0]
+            record[OPERATIONS.index(op)] += 1
+            record[3] += elapsed
+        if op == 'split' and line is not None:
+            # parts of a split flowable still come from the same line
+            for part in result or ():
+                if getattr(part, '_rml_line', None) is None:
+                    try:
+                        part._rml_line = line
+                    except AttributeError:
+                        pass
+        return result
+
+    def sorted_records(self):
+        """``(seconds, wrap, split, drawOn, class name, line)`` tuples, the
+        most expensive first"""
+        rows = []
+        for (name, line), (wrap, split, draw, seconds) in self.records.items():
+            rows.append((seconds, wrap, split, draw, name, line))
+        rows.sort(key=lambda row: (-row[0], row[4], row[5] or 0))
+        return rows
+
+    def report(self, limit=None):
+        lines = ['%10s %8s %8s %8s %6s  %s' % ('seconds', 'wrap', 'split', 'drawOn', 'line', 'class')]
+        for seconds, wrap, split, draw, name, line in self.sorted_records()[:limit]:
+            lines.append('%10.4f %8d %8d %8d %6s  %s' % (
+                seconds, wrap, split, draw, '-' if line is None else line, name))
+        return '\n'.join(lines)
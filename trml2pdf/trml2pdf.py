@@ -23,10 +23,13 @@
 
 import copy
 import os
+import contextlib
 import io
 import sys
+import json
 import base64
 import logging
+import threading
 
 from lxml import etree
 import click
@@ -40,7 +43,17 @@ from pdfrw import PdfReader
 from . import color
 from . import utils
 from . import elements
+from . import stats
+from . import datasource
+from . import tracing
+from . import template
+from . import builder
+from . import cache as result_cache
+from . import optimize
+from . import images
+from . import barcodes
 from .doctemplate import DocTemplate
+from .server import serve
 
 logger = logging.getLogger(__name__)
 
@@ -217,58 +230,306 @@ class RMLStyles(object):
         return self._para_style_update(style, node)
 
 
-class RMLDoc(object):
+# fonts are registered with reportlab for the whole process, by name the
+# file (and its digest) each one was registered from
+_fonts = {}
+_fonts_lock = threading.Lock()
+
+
+def register_font(name, path):
+    """register the truetype font ``path`` as ``name`` for all styles
+
+    a font registered from the same file before is left alone: the font
+    object keeps the subset of every document using it, replacing it would
+    break the renders running in other threads.
+    """
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
 
-    def __init__(self, data,basepath):
-        parser = etree.XMLParser(encoding='utf-8')
-        self.root = etree.fromstring(data,parser)
-        # remove comments
-        for comment in self.root.xpath('//comment()'):
-            parent = comment.getparent()
-            if parent is not None:
-                parent.remove(comment)
+    key = (os.path.abspath(path), result_cache.file_digest(path))
+    with _fonts_lock:
+        previous = _fonts.get(name)
+        if previous == key:
+            return
+        if previous is not None:
+            logger.warning('font "%s" registered again from %s', name, path)
+        pdfmetrics.registerFont(TTFont(name, path))
+        addMapping(name, 0, 0, name)  # normal
+        addMapping(name, 0, 1, name)  # italic
+        addMapping(name, 1, 0, name)  # bold
+        addMapping(name, 1, 1, name)  # italic and bold
+        _fonts[name] = key
+
+
+class RMLDoc(object):
+    """a parsed rml document
+
+    ``data`` is the document as bytes or text, a path or a file-like
+    object. Relative file references are resolved against ``basepath``,
+    by default the directory of a path or the current directory. With a
+    ``context`` the document is a template, see :mod:`trml2pdf.template`.
+    """
+    # limits.Budget of the running render
+    _budget = None
+    # images.Downsampler of the running render
+    _downsampler = None
+
+    def __init__(self, data,basepath=None,context=None):
+        start = stats.clock()
+        parser = etree.XMLParser(encoding='utf-8',remove_comments=True,huge_tree=True)
+        if hasattr(data,'read'):
+            self.root = etree.parse(data,parser).getroot()
+        elif isinstance(data,os.PathLike) or (isinstance(data,str) and not data.lstrip('\ufeff \t\r\n').startswith('<')):
+            path = os.fspath(data)
+            if basepath is None:
+                basepath = os.path.dirname(os.path.abspath(path))
+            self.root = etree.parse(path,parser).getroot()
+        else:
+            if isinstance(data,str):
+                # lxml refuses text with an encoding declaration
+                data = data.encode('utf-8')
+            self.root = etree.fromstring(data,parser)
+        if context is not None:
+            self.root = template.Template(self.root).expand(context)
+        if basepath is None:
+            basepath = os.getcwd()
         self.filename = self.root.get('filename')
         self.basepath = basepath
+        self._parse_time = stats.clock() - start
+        self.stats = stats.RenderStats()
+        # the renders of one document take turns
+        self._lock = threading.Lock()
 
     def docinit(self, node):
-        from reportlab.lib.fonts import addMapping
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-
         for n  in node:
             if n.tag == 'registerFont':
-                name = font.attrib.get('fontName')
-                fname = font.attrib.get('fontFile')
-                pdfmetrics.registerFont(TTFont(name, fname))
-                addMapping(name, 0, 0, name)  # normal
-                addMapping(name, 0, 1, name)  # italic
-                addMapping(name, 1, 0, name)  # bold
-                addMapping(name, 1, 1, name)  # italic and bold
-
-    def render(self, out):
+                register_font(n.attrib.get('fontName'), n.attrib.get('fontFile'))
+
+    def render(self, out, incremental=False, stats_callback=None, tracer=None, story=None, cache=None, limits=None, optimizer=None, image_dpi=None):
+        """render the document as pdf into ``out`` and return the
+        :class:`RenderStats` of this render
+
+        with ``incremental`` finished pages are written to ``out`` while
+        the layout is still running instead of all at the end, this needs a
+        document that is laid out in a single pass (no table of contents or
+        index). ``stats_callback`` is called with the stats when done.
+        a :class:`tracing.LayoutTracer` passed as ``tracer`` records the
+        layout calls of the story. A :class:`builder.Story` passed as
+        ``story`` is rendered instead of the ``<story>`` of the document.
+        with a :class:`cache.ResultCache` the pdf is taken from the cache
+        if it was rendered before, else it is rendered in invariant mode
+        and stored. A render going beyond its :class:`limits.RenderLimits`
+        raises :class:`limits.RenderBudgetExceeded` with the stats so far.
+        the saved pdf is rewritten smaller by an :class:`optimize.Optimizer`
+        passed as ``optimizer``, this needs the whole file and disables
+        ``incremental``. With ``image_dpi`` images are scaled down to the
+        resolution needed for their size on the page, see :mod:`images`.
+        """
+        with self._running(limits, image_dpi) as render_stats:
+            self._render_cached(out, render_stats, incremental, tracer, story, cache, optimizer)
+        if stats_callback is not None:
+            stats_callback(render_stats)
+        return render_stats
+
+    def merge(self, out, records, incremental=True, stats_callback=None, limits=None, image_dpi=None, title=None):
+        """render the ``<story>`` once for every record of the iterable
+        ``records`` into the single pdf ``out`` and return the
+        :class:`RenderStats`
+
+        the story is a template (see :mod:`trml2pdf.template`) expanded
+        with each record, the rest of the document (page templates,
+        styles, fonts and page graphics) is set up once and used as it
+        is. Every record starts on a new page with the first page template,
+        page numbers, the total page number, references and outline
+        entries are those of the record. Records are read and laid out
+        one at a time and finished pages are written right away (unless
+        ``incremental`` is false), so memory does not grow with the
+        number of records. With ``title``, a function of the record, every
+        record gets an outline entry holding its own outline entries.
+        """
+        if not len(self.root.xpath('template')):
+            raise ValueError('merging needs a document with a <template>')
+        with self._running(limits, image_dpi) as render_stats:
+            doc_tmpl = self._doc_template(out, render_stats, incremental)
+            story = template.Template(self.root.xpath('story')[0])
+            if title is not None:
+                doc_tmpl.outline_offset = 1
+            stories = (fis for record, fis in self._records(story, records, render_stats, title))
+            doc_tmpl.mergeBuild(stories, canvasmaker=elements.NumberedCanvas)
+        if stats_callback is not None:
+            stats_callback(render_stats)
+        return render_stats
+
+    def _records(self, story, records, render_stats, title=None):
+        r = RMLFlowable(self)
+        for record in records:
+            with render_stats.timer('story'):
+                fis = [] if title is None else [
+                    elements.Anchor('record'),
+                    elements.ToOutline('record', title(record), 0, numbering=False),
+                ]
+                fis.extend(r.render(story.expand(record)))
+            render_stats.incr('records')
+            yield record, fis
+
+    def split(self, outputs, records=None, name=None, incremental=True, stats_callback=None, limits=None, image_dpi=None):
+        """render the document into several pdfs in a single pass and
+        return the :class:`RenderStats`
+
+        the story is cut at every ``<nextOutput name="..."/>``, with
+        ``records`` (see :meth:`merge`) the story is expanded for every
+        record and every record is cut off as well, ``name`` is then a
+        function of the record giving the name of its output. Every part
+        becomes a complete pdf of its own, written to ``outputs(index,
+        name)``, a path or a binary file object, or to the path
+        ``outputs.format(index=index, name=name)`` for a string. The
+        setup of the document is done once and images drawn in several
+        outputs are read and compressed once.
+        """
+        if not len(self.root.xpath('template')):
+            raise ValueError('splitting needs a document with a <template>')
+        if isinstance(outputs, str):
+            outputs = self._path_outputs(outputs)
+        with self._running(limits, image_dpi) as render_stats:
+            doc_tmpl = self._doc_template(None, render_stats, incremental)
+            doc_tmpl.shared_images = elements.SharedImages(stats=render_stats)
+            story = self.root.xpath('story')[0]
+            if records is None:
+                with render_stats.timer('story'):
+                    parts = [(None, RMLFlowable(self).render(story))]
+            else:
+                parts = ((None if name is None else name(record), fis)
+                    for record, fis in self._records(template.Template(story), records, render_stats))
+            doc_tmpl.splitBuild(self._outputs(parts, outputs, render_stats), canvasmaker=elements.NumberedCanvas)
+        if stats_callback is not None:
+            stats_callback(render_stats)
+        return render_stats
+
+    @staticmethod
+    def _path_outputs(pattern):
+        def output(index, name):
+            path = pattern.format(index=index, name=index if name is None else name)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return path
+        return output
+
+    def _outputs(self, parts, outputs, render_stats):
+        index = 0
+        for name, fis in parts:
+            segments = [(name, [])]
+            for flow in fis:
+                if isinstance(flow, elements.NextOutput):
+                    segments.append((flow.name, []))
+                else:
+                    segments[-1][1].append(flow)
+            for name, segment in segments:
+                if segment:
+                    render_stats.incr('outputs')
+                    yield outputs(index, name), segment
+                    index += 1
+
+    @contextlib.contextmanager
+    def _running(self, limits, image_dpi):
+        with self._lock, elements.own_sequencer():
+            self.stats = render_stats = stats.RenderStats()
+            render_stats.timings['parse'] = self._parse_time
+            start = stats.clock()
+            self._budget = budget = None if limits is None else limits.start(render_stats)
+            if image_dpi:
+                self._downsampler = images.Downsampler(image_dpi, stats=render_stats)
+            try:
+                yield render_stats
+            except Exception:
+                if budget is None or budget.exceeded is None:
+                    raise
+                raise budget.exceeded from None
+            finally:
+                self._budget = None
+                self._downsampler = None
+                render_stats.timings['total'] = stats.clock() - start + self._parse_time
+
+    def _optimize(self, data, optimizer, render_stats):
+        data, report = optimizer.optimize(data)
+        render_stats.timings['optimize'] += report.seconds
+        render_stats.incr('optimize_saved', report.saved)
+        render_stats.incr('optimize_duplicates', report.duplicates)
+        render_stats.incr('optimize_recompressed', report.recompressed)
+        return data
+
+    def _render_cached(self, out, render_stats, incremental, tracer, story, cache, optimizer):
+        if cache is not None and story is None:
+            with render_stats.timer('cache'):
+                key = cache.key(self, (optimizer, self._downsampler and self._downsampler.dpi))
+                data = cache.get(key)
+            if data is None:
+                render_stats.incr('cache_misses')
+                buf = io.BytesIO()
+                self._render(buf, render_stats, tracer=tracer, invariant=True)
+                data = buf.getvalue()
+                if optimizer is not None:
+                    data = self._optimize(data, optimizer, render_stats)
+                with render_stats.timer('cache'):
+                    cache.put(key, data)
+            else:
+                render_stats.incr('cache_hits')
+            out.write(data)
+        elif optimizer is not None:
+            buf = io.BytesIO()
+            self._render(buf, render_stats, tracer=tracer, story=story)
+            out.write(self._optimize(buf.getvalue(), optimizer, render_stats))
+        else:
+            self._render(out, render_stats, incremental, tracer, story)
+
+    def _doc_template(self, out, render_stats, incremental=False, tracer=None, invariant=False):
+        """the fonts and styles set up and the DocTemplate of the document,
+        None for a document without a ``<template>``"""
         el = self.root.xpath('docinit')
         if el:
-            self.docinit(el[0])
+            with render_stats.timer('docinit'):
+                self.docinit(el[0])
 
         el = self.root.xpath('stylesheet')
-        self.styles = RMLStyles(el)
+        with render_stats.timer('styles'):
+            self.styles = RMLStyles(el)
 
         el = self.root.xpath('template')
-        if len(el):
+        if not len(el):
+            return None
+        with render_stats.timer('templates'):
             doc_tmpl = self.get_template(out, el[0], DocTmpl=DocTemplate)
+            doc_tmpl.incremental = incremental
+            doc_tmpl.stats = render_stats
+            doc_tmpl.tracer = tracer
+            doc_tmpl.budget = self._budget
+            if invariant:
+                doc_tmpl.invariant = 1
             doc_tmpl.addPageTemplates(self.get_page_templates())
-            r = RMLFlowable(self)
-            story = self.root.xpath('story')
-            fis = r.render(story[0])
+        return doc_tmpl
+
+    def _render(self, out, render_stats, incremental=False, tracer=None, story=None, invariant=False):
+        doc_tmpl = self._doc_template(out, render_stats, incremental, tracer, invariant)
+        if doc_tmpl is not None:
+            with render_stats.timer('story'):
+                r = RMLFlowable(self)
+                if story is None:
+                    story = self.root.xpath('story')[0]
+                fis = r.render(story)
             doc_tmpl.multiBuild(fis,canvasmaker=elements.NumberedCanvas)
             # doc_tmpl.build(fis,canvasmaker=elements.NumberedCanvas)
         else:
-            self.canvas = canvas.Canvas(out)
+            self.canvas = canvas.Canvas(out, invariant=1 if invariant else None)
             pd = self.root.xpath('pageDrawing')[0]
             pd_obj = RMLCanvas(self.canvas, None, self)
-            pd_obj.render(pd)
-            self.canvas.showPage()
-            self.canvas.save()
+            with render_stats.timer('layout'):
+                pd_obj.render(pd)
+                self.canvas.showPage()
+            with render_stats.timer('save'):
+                self.canvas.save()
+            render_stats.passes.append(render_stats.timings['layout'])
+            render_stats.pages = 1
 
     def get_template(self,out,node,DocTmpl=None):
         if 'pageSize' not in node.attrib:
@@ -328,6 +589,8 @@ class RMLDoc(object):
 
 
 class RMLCanvas(object):
+    # number of curves drawn as one path
+    BATCH_SIZE = 1000
 
     def __init__(self, canvas, doc_tmpl=None, doc=None):
         self.canvas = canvas
@@ -337,54 +600,67 @@ class RMLCanvas(object):
         self._totalpagecount = None
 
     def _textual(self, node):
+        """a copy of ``node`` with the page number and docEval filled in,
+        the tags known only later stay in place as children"""
         nnode = etree.Element(node.tag,**node.attrib)
-        if node.text is None:
-            nnode.text = ''
-        else:
-            nnode.text = copy.deepcopy(node.text)
+        nnode.text = node.text or ''
+
+        def add(text):
+            # after a kept child the text goes into its tail
+            if len(nnode):
+                nnode[-1].tail = (nnode[-1].tail or '') + text
+            else:
+                nnode.text += text
+
+        def keep(n):
+            nn = copy.deepcopy(n)
+            nn.tail = None
+            nnode.append(nn)
+
         for n in node:
             if n.tag == 'pageNumber':
-                nnode.text += str(self.canvas.getPageNumber())
+                add(str(getattr(self.canvas, 'recordPageNumber', self.canvas.getPageNumber)()))
             elif n.tag == 'totalPageNumber':
                 if self._totalpagecount is None:
-                    nnode.append(copy.deepcopy(n))
+                    keep(n)
                 else:
-                    nnode.text += str(self._totalpagecount)
+                    add(str(self._totalpagecount))
             elif n.tag == 'docEval':
                 try:
                     r = self.doc_tmpl.docEval(n.attrib.get('expr',''))
                     if r is not None:
-                        nnode.text += r
+                        add(r)
                 except:
                     logger.exception('docEval failed')
-                    nnode.append(copy.deepcopy(n))
+                    keep(n)
             if n.tail:
-                nnode.text += n.tail
+                add(n.tail)
         return nnode
 
-    def _drawString(self, node):
+    def _late_text(self, nnode):
+        self._totalpagecount = self.canvas.totalPages()
+        return self._textual(nnode).text
+
+    def _draw_text(self, node, draw, align):
         nnode = self._textual(node)
+        pos = utils.attr_get(node, ['x', 'y'])
         if len(nnode) == 0:
-            self.canvas.drawString(
-                text=nnode.text, **utils.attr_get(node, ['x', 'y']))
+            draw(text=nnode.text, **pos)
+        elif hasattr(self.canvas, 'drawLateString'):
+            # total page number or docEval only known at the end
+            self.canvas.drawLateString(
+                pos.get('x', 0), pos.get('y', 0), lambda: self._late_text(nnode), align)
         else:
-            self.canvas._code.append(('POSTPONED',self,nnode))
+            draw(text=nnode.text, **pos)
+
+    def _drawString(self, node):
+        self._draw_text(node, self.canvas.drawString, 'left')
 
     def _drawCenteredString(self, node):
-        nnode = self._textual(node)
-        if len(nnode) == 0:
-            self.canvas.drawCentredString(
-                text=nnode.text, **utils.attr_get(node, ['x', 'y']))
-        else:
-            self.canvas._code.append(('POSTPONED',self,nnode))
+        self._draw_text(node, self.canvas.drawCentredString, 'centre')
 
     def _drawRightString(self, node):
-        nnode = self._textual(node)
-        if len(nnode) == 0:
-            self.canvas.drawRightString(
-                text=nnode.text, **utils.attr_get(node, ['x', 'y']))
-        else:
-            self.canvas._code.append(('POSTPONED',self,nnode))
+        self._draw_text(node, self.canvas.drawRightString, 'right')
 
     def _rect(self, node):
         if 'round' in node.attrib:
@@ -404,20 +680,25 @@ class RMLCanvas(object):
         self.canvas.ellipse(
             x1, y1, x2, y2, **utils.attr_get(node, [], {'fill': 'bool', 'stroke': 'bool'}))
 
-    def _curves(self, node):
-        line_str = utils.text_get(node).split()
+    def _coords(self, node):
+        if datasource.is_external(node):
+            return datasource.load(node, self.doc.basepath)
+        return utils.coords_get(utils.text_get(node))
 
-        while len(line_str) > 7:
-            self.canvas.bezier(*[utils.unit_get(l) for l in line_str[0:8]])
-            line_str = line_str[8:]
+    def _curves(self, node):
+        values = self._coords(node)
+        curves = list(zip(*[iter(values)]*8))
+        # one path per batch instead of a path for every curve
+        for start in range(0, len(curves), self.BATCH_SIZE):
+            path = self.canvas.beginPath()
+            for x1, y1, x2, y2, x3, y3, x4, y4 in curves[start:start+self.BATCH_SIZE]:
+                path.moveTo(x1, y1)
+                path.curveTo(x2, y2, x3, y3, x4, y4)
+            self.canvas.drawPath(path, stroke=1, fill=0)
 
     def _lines(self, node):
-        line_str = utils.text_get(node).split()
-        lines = []
-        while len(line_str) > 3:
-            lines.append([utils.unit_get(l) for l in line_str[0:4]])
-            line_str = line_str[4:]
-        self.canvas.lines(lines)
+        values = self._coords(node)
+        self.canvas.lines(list(zip(*[iter(values)]*4)))
 
     def _grid(self, node):
         xlist = [utils.unit_get(s) for s in node.attrib.get('xs').split(',')]
@@ -492,6 +773,7 @@ class RMLCanvas(object):
         s.write(data)
         s.seek(0)
         img = ImageReader(s)
+        self.doc.stats.incr('images')
         (sx, sy) = img.getSize()
 
         args = {}
@@ -515,90 +797,93 @@ class RMLCanvas(object):
                 args['height'] = sy * args['width'] / sx
         if 'showBoundary' in node and node.attrib.get('showBoundary'):
             self.canvas.rect(args['x'],args['y'],args['width'],args['height'])
+        downsampler = self.doc._downsampler
+        if downsampler is not None and 'width' in args:
+            resampled = downsampler.downsample(data, args['width'], args['height'])
+            if resampled is not data:
+                img = ImageReader(resampled)
         self.canvas.drawImage(img, **args)
 
     def _barcode(self, node):
-        from reportlab.graphics.barcode import code128, qr
-
-        createargs = {}
-        drawargs = {}
-        code_type = node.attrib.get('code')
-        for tag in ('x', 'y'):
-            if tag in node.attrib:
-                drawargs[tag] = utils.unit_get(node.attrib.get(tag))
-
-        if code_type == 'Code128':
-            for tag in ('barWidth', 'barHeight'):
-                if tag in node.attrib:
-                    createargs[tag] = utils.unit_get(node.attrib.get(tag))
-            barcode = code128.Code128(self._textual(node), **createargs)
-        elif code_type == "QR":
-            for tag in ('width', 'height'):
-                if tag in node.attrib:
-                    createargs[tag] = utils.unit_get(node.attrib.get(tag))
-            barcode = qr.QrCode(node.attrib.get('value'), **createargs)
-
-        barcode.drawOn(self.canvas, **drawargs)
+        pos = utils.attr_get(node, ['x', 'y'])
+        value = node.attrib.get('value')
+        if value is None:
+            value = self._textual(node).text
+        barcodes.draw(self.canvas, barcodes.key_get(node, value), pos.get('x', 0), pos.get('y', 0))
 
     def _path(self, node):
         self.path = self.canvas.beginPath()
         self.path.moveTo(**utils.attr_get(node, ['x', 'y']))
+        if datasource.is_external(node):
+            self._path_lines(datasource.load(node, self.doc.basepath))
+        else:
+            self._path_lines(node.text)
         for n in node:
-            if isinstance(n,etree._Element):
-                if n.tag == 'moveto':
-                    vals = utils.text_get(n).split()
-                    self.path.moveTo(
-                        utils.unit_get(vals[0]), utils.unit_get(vals[1]))
-                elif n.tag == 'curvesto':
-                    vals = utils.text_get(n).split()
-                    while len(vals) > 5:
-                        pos = []
-                        while len(pos) < 6:
-                            pos.append(utils.unit_get(vals.pop(0)))
-                        self.path.curveTo(*pos)
-            elif isinstance(n,str):
-                # Not sure if I must merge all TEXT_NODE ?
-                data = n.data.split()
-                while len(data) > 1:
-                    x = utils.unit_get(data.pop(0))
-                    y = utils.unit_get(data.pop(0))
-                    self.path.lineTo(x, y)
+            if n.tag == 'moveto':
+                vals = self._coords(n)
+                self.path.moveTo(vals[0], vals[1])
+            elif n.tag == 'curvesto':
+                vals = self._coords(n)
+                for pos in zip(*[iter(vals)]*6):
+                    self.path.curveTo(*pos)
+            self._path_lines(n.tail)
         if (not 'close' in node) or utils.bool_get(node.attrib.get('close')):
             self.path.close()
         self.canvas.drawPath(
             self.path, **utils.attr_get(node, [], {'fill': 'bool', 'stroke': 'bool'}))
 
+    def _path_lines(self, vals):
+        """draw lines to the points in ``vals``, a list or text"""
+        if isinstance(vals, str):
+            vals = utils.coords_get(vals)
+        if vals:
+            for x, y in zip(*[iter(vals)]*2):
+                self.path.lineTo(x, y)
+
     def _stroke(self,node):
         self.canvas.setStrokeColor(color.get(node.attrib.get('color','')))
         if 'width' in node.attrib:
             self.canvas.setLineWidth(float(node.attrib.get('width')))
 
+    def _fill(self, node):
+        self.canvas.setFillColor(color.get(node.attrib.get('color','')))
+
+    def _setFont(self, node):
+        self.canvas.setFont(node.attrib.get('name'), utils.unit_get(node.attrib.get('size')))
+
+    def _rotate(self, node):
+        self.canvas.rotate(float(node.attrib.get('degrees')))
+
+    # tag -> function(rml_canvas, node), see register_canvas_tag
+    tags = {
+        'drawCentredString': _drawCenteredString,
+        'drawCenteredString': _drawCenteredString,
+        'drawRightString': _drawRightString,
+        'drawString': _drawString,
+        'rect': _rect,
+        'ellipse': _ellipse,
+        'lines': _lines,
+        'grid': _grid,
+        'curves': _curves,
+        'fill': _fill,
+        'stroke': _stroke,
+        'setFont': _setFont,
+        'place': _place,
+        'circle': _circle,
+        'lineMode': _line_mode,
+        'path': _path,
+        'rotate': _rotate,
+        'translate': _translate,
+        'image': _image,
+        'barCode': _barcode,
+    }
+
     def render(self, node):
-        tags = {
-            'drawCentredString': self._drawCenteredString,
-            'drawCenteredString': self._drawCenteredString,
-            'drawRightString': self._drawRightString,
-            'drawString': self._drawString,
-            'rect': self._rect,
-            'ellipse': self._ellipse,
-            'lines': self._lines,
-            'grid': self._grid,
-            'curves': self._curves,
-            'fill': lambda node: self.canvas.setFillColor(color.get(node.attrib.get('color',''))),
-            'stroke':self._stroke,
-            'setFont': lambda node: self.canvas.setFont(node.attrib.get('name'), utils.unit_get(node.attrib.get('size'))),
-            'place': self._place,
-            'circle': self._circle,
-            'lineMode': self._line_mode,
-            'path': self._path,
-            'rotate': lambda node: self.canvas.rotate(float(node.attrib.get('degrees'))),
-            'translate': self._translate,
-            'image': self._image,
-            'barCode': self._barcode,
-        }
+        tags = self.tags
         for nd in node:
-            if nd.tag in tags:
-                tags[nd.tag](nd)
+            draw = tags.get(nd.tag)
+            if draw is not None:
+                draw(self, nd)
             else:
                 logger.warn('unknown tag {}'.format(nd.tag))
 
@@ -611,13 +896,18 @@ class RMLDraw(object):
         self.canvas = None
 
     def render(self, canvas, doc):
-        canvas.saveState()
-        cnv = RMLCanvas(canvas, doc, self.styles)
-        cnv.render(self.node)
-        canvas.restoreState()
+        render_stats = self.styles.stats
+        render_stats.incr('pageGraphics')
+        with render_stats.timer('pageGraphics'):
+            canvas.saveState()
+            cnv = RMLCanvas(canvas, doc, self.styles)
+            cnv.render(self.node)
+            canvas.restoreState()
 
 
 class RMLFlowable(object):
+    # attributes of <h1>..<h6> that leave the heading style alone
+    _heading_attrs = frozenset(('key','short','outline','toc','no_numbering'))
 
     def __init__(self, doc):
         self.doc = doc
@@ -666,33 +956,40 @@ class RMLFlowable(object):
                 kwargs[key] = node.attrib.get(key)
         return platypus.ListFlowable(list_items, style=list_style, start=list_style.__dict__.get('start'),**kwargs)
 
+    def _cell(self, td):
+        flow = []
+        for n in td:
+            for flowable in self._flowable(n):
+                if flowable is not None:
+                    flow.append(flowable)
+        if not len(flow):
+            flow = self._textual(td)
+        return flow
+
     def _table(self, node):
         length = 0
         colwidths = None
         rowheights = None
         data = []
         style = None
-        for style_node in node.xpath('blockTableStyle'):
+        for style_node in _child_get(node, 'blockTableStyle'):
             style = RMLStyles._table_style_get(style_node)
         for tr in _child_get(node, 'tr'):
             columns = []
-            for td in _child_get(tr, 'td'):
-                flow = []
-                for n in td:
-                    for flowable in self._flowable(n):
-                        if flowable is not None:
-                            flow.append(flowable)
-                if not len(flow):
-                    flow = self._textual(td)
-                columns.append(flow)
+            for td in tr:
+                if td.tag != 'td':
+                    continue
+                if len(td):
+                    columns.append(self._cell(td))
+                else:
+                    # plain text, the table draws strings itself
+                    columns.append(td.text or '')
             if len(columns) > length:
                 length = len(columns)
-                for ab in data:
-                    while len(ab) < length:
-                        ab.append('')
-            while len(columns) < length:
-                columns.append('')
             data.append(columns)
+        for columns in data:
+            if len(columns) < length:
+                columns.extend([''] * (length - len(columns)))
         if 'colWidths' in node.attrib:
             colwidths = [
                 utils.unit_get(f.strip()) for f in node.attrib.get('colWidths').split(',')]
@@ -702,7 +999,7 @@ class RMLFlowable(object):
                 rowheights = [utils.unit_get(f.strip()) for f in value.split(',')]
             else:
                 rowheights = utils.unit_get(value.strip())
-        table = elements.Table(data=data, colWidths=colwidths, rowHeights=rowheights, **(
+        table = elements.Table(data=data, colWidths=colwidths, rowHeights=rowheights, normalizedData=1, **(
             utils.attr_get(
                 node, ['splitByRow','spaceBefore','spaceAfter'],
                 {'repeatRows': 'int', 'repeatCols': 'int','hAlign':'str','vAlign':'str'})
@@ -719,9 +1016,9 @@ class RMLFlowable(object):
 
     def _illustration(self, node):
         class Illustration(platypus.flowables.Flowable):
-            def __init__(self, node, styles):
+            def __init__(self, node, doc):
                 self.node = node
-                self.styles = styles
+                self.doc = doc
                 self.width = utils.unit_get(node.attrib.get('width'))
                 self.height = utils.unit_get(node.attrib.get('height'))
 
@@ -730,9 +1027,9 @@ class RMLFlowable(object):
 
             def draw(self):
                 canvas = self.canv
-                drw = RMLDraw(self.node, self.styles)
+                drw = RMLDraw(self.node, self.doc)
                 drw.render(self.canv, None)
-        return Illustration(node, self.styles)
+        return Illustration(node, self.doc)
 
     def _floattoend(self,node):
         content = []
@@ -753,7 +1050,10 @@ class RMLFlowable(object):
     def _serialize_paragraph_content(self,node):
         parts = []
         for child in node:
-            parts.append(etree.tostring(child).decode('utf-8'))
+            if isinstance(child, builder.Node):
+                parts.append(child.tostring())
+            else:
+                parts.append(etree.tostring(child).decode('utf-8'))
         res = ''.join(parts)
         if node.text:
             return ''.join((node.text,res))
@@ -773,200 +1073,287 @@ class RMLFlowable(object):
         return d
 
     def _flowable(self, node):
-        if node.tag == 'para':
-            style = self.styles.para_style_get(node)
-            yield platypus.Paragraph(self._serialize_paragraph_content(node), style)
-        elif node.tag == 'shrinkFrame':
-            yield elements.ShrinkFrame()
-        elif node.tag == 'docpara':
-            style = self.styles.para_style_get(node)
-            expr = node.attrib.get('expr','')
-            yield platypus.flowables.DocPara(expr,style=style)
-        elif node.tag == 'docexec':
-            stmt = node.attrib.get('stmt','')
-            yield platypus.flowables.DocExec(stmt)
-        elif node.tag == 'ref':
-            style = self.styles.para_style_get(node)
-            yield elements.Ref(node.attrib.get('target'),style)
-        elif node.tag == 'toc':
-            styles = []
-            style_names = node.attrib.get('levelStyles','')
-            for style_name in style_names.split(','):
-                styles.append(self.styles.styles[style_name])
-            toc = elements.TableOfContents(levelStyles=styles)
-            yield toc
-        elif node.tag == 'name':
-            self.styles.names[
-                node.attrib.get('id')] = node.attrib.get('value')
-            yield None
-        elif node.tag == 'xpre':
-            style = self.styles.para_style_get(node)
-            raw = self._serialize_paragraph_content(node)
-            yield elements.XPreformatted(raw, style, **(utils.attr_get(node, [], {'bulletText': 'str', 'dedent': 'int', 'frags': 'int'})))
-        elif node.tag == 'pre':
-            style = self.styles.para_style_get(node)
-            text = self._textual(node)
-            yield platypus.Preformatted(text, style, **(utils.attr_get(node, [], {'bulletText': 'str', 'dedent': 'int'})))
-        elif node.tag == 'illustration':
-            yield self._illustration(node)
-        elif node.tag == 'blockTable':
-            yield self._table(node)
-        elif node.tag == 'floatToEnd':
-            yield self._floattoend(node)
-        elif node.tag == 'keepTogether':
-            yield self._keeptogether(node)
-        elif node.tag == 'title':
-            style = copy.deepcopy(self.styles.styles['Title'])
-            self.styles._para_style_update(style,node)
-            yield platypus.Paragraph(self._textual(node), style, **(utils.attr_get(node, [], {'bulletText': 'str'})))
-        elif node.tag in ('h1','h2','h3','h4','h5','h6'):
-            level = int(node.tag[1])
-            yield elements.incSeq(level-1)
-            no_numbering = node.attrib.get('no_numbering')
-            style = copy.deepcopy(self.styles.styles['Heading%s'%(level)])
-            self.styles._para_style_update(style,node)
-            text = self._textual(node)
-            if 'key' in node.attrib:
-                key = node.attrib.get('key',text)
-            else:
-                key = node.tag+text
-            short = node.attrib.get('short',text.strip())
-            outline = node.attrib.get('outline',short)
-            yield elements.Anchor(key)
-            yield platypus.flowables.DocExec('section%s="%s"'%(level,outline))
-            yield platypus.flowables.DocPara('"{0}. %s".format(doc.get_numbering(%s))'%(text.strip(),level),style=style)
-            yield elements.ToTOC(key,node.attrib.get('toc',short),level)
-            yield elements.ToOutline(key,outline,level)
-        elif node.tag == 'image':
-            attrs = utils.attr_get(node, ['width', 'height', 'kind', 'hAlign','mask','lazy'])
-            if 'mask' not in attrs:
-                attrs['mask'] = (250, 255, 250, 255, 250, 255)
-            yield platypus.Image(
-                node.attrib.get('file'),**attrs)
-        elif node.tag == 'bookmark':
-            level = int(node.attrib['level'])
-            kwargs = utils.attr_get(node,[],{
-                'no_toc':'bool',
-                'no_numbering':'bool',
-                })
-            if not kwargs.get('no_numbering'):
-                yield elements.incSeq(level-1)
-            short = node.attrib.get('short')
-            outline = node.attrib.get('outline',short)
-            key = node.attrib.get('key',outline)
-            yield platypus.flowables.DocExec('section%s="%s"'%(level,outline))
-            yield elements.Anchor(key)
-            if not kwargs.get('no_toc'):
-                yield elements.ToTOC(key,node.attrib.get('toc',short),level,numbering=not kwargs.get('no_numbering'))
-            yield elements.ToOutline(key,outline,level,numbering=not kwargs.get('no_numbering'))
-        elif node.tag == 'pdfpage':
-            page_number = node.attrib.get('page')
-            if not page_number:
-                page_number = 0
-            else:
-                page_number = int(page_number)
-            if node.text is None:
-                filepath = node.attrib.get('file')
-                if not os.path.isabs(filepath):
-                    filepath = os.path.join(self.doc.basepath,filepath)
-                page = PdfReader(filepath, decompress=False).pages[page_number]
-            else:
-                data = base64.b64decode(node.text.encode('ascii'))
-                page = PdfReader(fdata=data, decompress=False).pages[page_number]
-            yield elements.PdfPage(page, **(utils.attr_get(node, ['width', 'height', 'kind','hAlign','rotation'])))
-        elif node.tag == 'pdfpages':
-            wrapper = node.attrib.get('wrapper')
-            if node.text is None:
-                filepath = node.attrib.get('file')
-                if not os.path.isabs(filepath):
-                    filepath = os.path.join(self.doc.basepath,filepath)
-                try:
-                    pdf = PdfReader(filepath, decompress=False)
-                except:
-                    logger.error('Failed to read pdf %s',filepath)
-                    raise
-            else:
-                data = base64.b64decode(node.text.encode('ascii'))
-                pdf = PdfReader(fdata=data, decompress=False)
-            options = utils.attr_get(node, ['width', 'height', 'kind','hAlign','rotation'])
-            if wrapper:
-                Wrapper = globals()[wrapper]
-                for page in pdf.pages:
-                    yield Wrapper(elements.PdfPage(page,**options))
-            else:
-                for page in pdf.pages:
-                    yield elements.PdfPage(page,**options)
+        budget = self.doc._budget
+        if budget is not None:
+            budget.check()
+        flowables = self.doc.stats.flowables
+        for flow in self._create_flowable(node):
+            if flow is not None:
+                flowables[node.tag] += 1
+                if getattr(flow, '_rml_line', None) is None:
+                    flow._rml_line = node.sourceline
+            yield flow
+
+    def _create_flowable(self, node):
+        create = self.tags.get(node.tag)
+        if create is not None:
+            return create(self, node)
+        if node.tag.endswith('Template'):
+            return ()
+        logger.warn('flowable "%s" not yet implemented',node.tag)
+        return (None,)
+
+    def _create_para(self, node):
+        style = self.styles.para_style_get(node)
+        yield platypus.Paragraph(self._serialize_paragraph_content(node), style)
+
+    def _create_shrinkFrame(self, node):
+        yield elements.ShrinkFrame()
+
+    def _create_docpara(self, node):
+        style = self.styles.para_style_get(node)
+        expr = node.attrib.get('expr','')
+        yield platypus.flowables.DocPara(expr,style=style)
+
+    def _create_nextOutput(self, node):
+        yield elements.NextOutput(node.attrib.get('name'))
+
+    def _create_docexec(self, node):
+        stmt = node.attrib.get('stmt','')
+        yield platypus.flowables.DocExec(stmt)
+
+    def _create_ref(self, node):
+        style = self.styles.para_style_get(node)
+        yield elements.Ref(node.attrib.get('target'),style)
+
+    def _create_toc(self, node):
+        styles = []
+        style_names = node.attrib.get('levelStyles','')
+        for style_name in style_names.split(','):
+            styles.append(self.styles.styles[style_name])
+        toc = elements.TableOfContents(levelStyles=styles)
+        yield toc
+
+    def _create_name(self, node):
+        self.styles.names[
+            node.attrib.get('id')] = node.attrib.get('value')
+        yield None
+
+    def _create_xpre(self, node):
+        style = self.styles.para_style_get(node)
+        raw = self._serialize_paragraph_content(node)
+        yield elements.XPreformatted(raw, style, **(utils.attr_get(node, [], {'bulletText': 'str', 'dedent': 'int', 'frags': 'int'})))
+
+    def _create_pre(self, node):
+        style = self.styles.para_style_get(node)
+        text = self._textual(node)
+        yield platypus.Preformatted(text, style, **(utils.attr_get(node, [], {'bulletText': 'str', 'dedent': 'int'})))
+
+    def _create_illustration(self, node):
+        yield self._illustration(node)
+
+    def _create_blockTable(self, node):
+        yield self._table(node)
+
+    def _create_floatToEnd(self, node):
+        yield self._floattoend(node)
+
+    def _create_keepTogether(self, node):
+        yield self._keeptogether(node)
+
+    def _create_title(self, node):
+        style = copy.deepcopy(self.styles.styles['Title'])
+        self.styles._para_style_update(style,node)
+        yield platypus.Paragraph(self._textual(node), style, **(utils.attr_get(node, [], {'bulletText': 'str'})))
+
+    def _create_heading(self, node):
+        level = int(node.tag[1])
+        style = self.styles.styles['Heading%s'%(level)]
+        # headings are many, share the style unless it is changed
+        if set(node.attrib) - self._heading_attrs:
+            style = self.styles._para_style_update(copy.deepcopy(style),node)
+        text = self._textual(node)
+        if 'key' in node.attrib:
+            key = node.attrib.get('key',text)
+        else:
+            key = node.tag+text
+        short = node.attrib.get('short',text.strip())
+        outline = node.attrib.get('outline',short)
+        yield elements.Heading(key,text.strip(),level,outline,toc=node.attrib.get('toc',short),style=style)
+
+    def _create_image(self, node):
+        attrs = utils.attr_get(node, ['width', 'height', 'kind', 'hAlign','mask','lazy'])
+        if 'mask' not in attrs:
+            attrs['mask'] = (250, 255, 250, 255, 250, 255)
+        self.doc.stats.incr('images')
+        source = node.attrib.get('file')
+        downsampler = self.doc._downsampler
+        # the drawn size must not depend on the pixels
+        if downsampler is not None and 'width' in attrs and 'height' in attrs and attrs.get('kind') != '%':
+            source = downsampler.downsample(source, attrs['width'], attrs['height'])
+        yield platypus.Image(
+            source,**attrs)
+
+    def _create_bookmark(self, node):
+        level = int(node.attrib['level'])
+        kwargs = utils.attr_get(node,[],{
+            'no_toc':'bool',
+            'no_numbering':'bool',
+            })
+        short = node.attrib.get('short')
+        outline = node.attrib.get('outline',short)
+        key = node.attrib.get('key',outline)
+        toc = None if kwargs.get('no_toc') else node.attrib.get('toc',short)
+        yield elements.Heading(key,None,level,outline,toc=toc,numbering=not kwargs.get('no_numbering'))
+
+    def _create_pdfpage(self, node):
+        page_number = node.attrib.get('page')
+        if not page_number:
+            page_number = 0
+        else:
+            page_number = int(page_number)
+        if node.text is None:
+            filepath = node.attrib.get('file')
+            if not os.path.isabs(filepath):
+                filepath = os.path.join(self.doc.basepath,filepath)
+            page = PdfReader(filepath, decompress=False).pages[page_number]
+        else:
+            data = base64.b64decode(node.text.encode('ascii'))
+            page = PdfReader(fdata=data, decompress=False).pages[page_number]
+        yield elements.PdfPage(page, **(utils.attr_get(node, ['width', 'height', 'kind','hAlign','rotation'])))
 
-        elif node.tag == 'spacer':
-            if 'width' in node.attrib:
-                width = utils.unit_get(node.attrib.get('width'))
-            else:
-                width = utils.unit_get('1cm')
-            length = utils.unit_get(node.attrib.get('length'))
-            yield platypus.Spacer(width=width, height=length)
-        elif node.tag == 'barCode':
-            yield code39.Extended39(self._textual(node))
-        elif node.tag == 'myIndex':
-            yield elements.MyIndexing()
-        elif node.tag == 'pageBreak':
-            yield platypus.PageBreak()
-        elif node.tag == 'condPageBreak':
-            yield platypus.CondPageBreak(**(utils.attr_get(node, ['height'])))
-        elif node.tag == 'setNextTemplate':
-            yield platypus.NextPageTemplate(str(node.attrib.get('name')))
-        elif node.tag == 'nextFrame':
-            yield platypus.CondPageBreak(1000)  # TODO: change the 1000 !
-        elif node.tag == 'ul':
-            yield self._list(node)
-        elif node.tag == 'hr':
-            kw = {}
-            if 'thickness' in node.attrib:
-                kw['thickness'] = utils.unit_get(node.attrib.get('thickness'))
-            if 'spaceBefore' in node.attrib:
-                kw['spaceBefore'] = utils.unit_get(node.attrib.get('spaceBefore'))
-            if 'spaceAfter' in node.attrib:
-                kw['spaceAfter'] = utils.unit_get(node.attrib.get('spaceAfter'))
-            if 'color' in node.attrib:
-                kw['color'] = color.get(node.attrib.get('color',''))
-            if 'width' in node.attrib:
-                kw['width'] = node.attrib.get('width')
-            if 'dash' in node.attrib:
-                kw['dash'] = node.attrib.get('dash')
-            if 'hAlign' in node.attrib:
-                kw['hAlign'] = node.attrib.get('hAlign')
-            if 'cAlign' in node.attrib:
-                kw['cAlign'] = node.attrib.get('cAlign')
-            yield platypus.flowables.HRFlowable(**kw)
-        elif node.tag == 'multicolumns':
-            kwargs = utils.attr_get(node,[],{
-                'n_columns':'int',
-                'stretch_last':'float',
-                'shrink_last':'bool',
-                })
-            if 'colspace' in node.attrib:
-                kwargs['colspace'] = utils.unit_get(node.attrib['colspace'])
-            kwargs['children'] = children = []
-            for child in node:
-                for n in self._flowable(child):
-                    children.append(n)
-            multicolumn = elements.MultiColumns(**kwargs)
-            yield multicolumn
-        elif node.tag == 'indent':
-            from reportlab.platypus.paraparser import _num
-            kw = {}
-            for key in ('left','right'):
-                if key in node.attrib:
-                    kw[key] = _num(node.attrib.get(key))
-            yield doctemplate.Indenter(**kw)
-            for child in node:
-                for flow in self._flowable(child):
-                    yield flow
-            yield doctemplate.Indenter(**{x:-1*y for x,y in kw.items()})
-        elif node.tag.endswith('Template'):
-            pass
+    def _create_pdfpages(self, node):
+        wrapper = node.attrib.get('wrapper')
+        if node.text is None:
+            filepath = node.attrib.get('file')
+            if not os.path.isabs(filepath):
+                filepath = os.path.join(self.doc.basepath,filepath)
+            try:
+                pdf = PdfReader(filepath, decompress=False)
+            except:
+                logger.error('Failed to read pdf %s',filepath)
+                raise
         else:
-            logger.warn('flowable "%s" not yet implemented',node.tag)
-            yield None
+            data = base64.b64decode(node.text.encode('ascii'))
+            pdf = PdfReader(fdata=data, decompress=False)
+        options = utils.attr_get(node, ['width', 'height', 'kind','hAlign','rotation'])
+        if wrapper:
+            Wrapper = globals()[wrapper]
+            for page in pdf.pages:
+                yield Wrapper(elements.PdfPage(page,**options))
+        else:
+            for page in pdf.pages:
+                yield elements.PdfPage(page,**options)
+
+    def _create_spacer(self, node):
+        if 'width' in node.attrib:
+            width = utils.unit_get(node.attrib.get('width'))
+        else:
+            width = utils.unit_get('1cm')
+        length = utils.unit_get(node.attrib.get('length'))
+        yield platypus.Spacer(width=width, height=length)
+
+    def _create_barCode(self, node):
+        value = node.attrib.get('value')
+        if value is None:
+            value = self._textual(node)
+        yield barcodes.BarCode(barcodes.key_get(node, value))
+
+    def _create_myIndex(self, node):
+        yield elements.MyIndexing()
+
+    def _create_pageBreak(self, node):
+        yield platypus.PageBreak()
+
+    def _create_condPageBreak(self, node):
+        yield platypus.CondPageBreak(**(utils.attr_get(node, ['height'])))
+
+    def _create_setNextTemplate(self, node):
+        yield platypus.NextPageTemplate(str(node.attrib.get('name')))
+
+    def _create_nextFrame(self, node):
+        yield platypus.CondPageBreak(1000)  # TODO: change the 1000 !
+
+    def _create_ul(self, node):
+        yield self._list(node)
+
+    def _create_hr(self, node):
+        kw = {}
+        if 'thickness' in node.attrib:
+            kw['thickness'] = utils.unit_get(node.attrib.get('thickness'))
+        if 'spaceBefore' in node.attrib:
+            kw['spaceBefore'] = utils.unit_get(node.attrib.get('spaceBefore'))
+        if 'spaceAfter' in node.attrib:
+            kw['spaceAfter'] = utils.unit_get(node.attrib.get('spaceAfter'))
+        if 'color' in node.attrib:
+            kw['color'] = color.get(node.attrib.get('color',''))
+        if 'width' in node.attrib:
+            kw['width'] = node.attrib.get('width')
+        if 'dash' in node.attrib:
+            kw['dash'] = node.attrib.get('dash')
+        if 'hAlign' in node.attrib:
+            kw['hAlign'] = node.attrib.get('hAlign')
+        if 'cAlign' in node.attrib:
+            kw['cAlign'] = node.attrib.get('cAlign')
+        yield platypus.flowables.HRFlowable(**kw)
+
+    def _create_multicolumns(self, node):
+        kwargs = utils.attr_get(node,[],{
+            'n_columns':'int',
+            'stretch_last':'float',
+            'shrink_last':'bool',
+            })
+        if 'colspace' in node.attrib:
+            kwargs['colspace'] = utils.unit_get(node.attrib['colspace'])
+        kwargs['children'] = children = []
+        for child in node:
+            for n in self._flowable(child):
+                children.append(n)
+        multicolumn = elements.MultiColumns(**kwargs)
+        yield multicolumn
+
+    def _create_indent(self, node):
+        from reportlab.platypus.paraparser import _num
+        kw = {}
+        for key in ('left','right'):
+            if key in node.attrib:
+                kw[key] = _num(node.attrib.get(key))
+        yield doctemplate.Indenter(**kw)
+        for child in node:
+            for flow in self._flowable(child):
+                yield flow
+        yield doctemplate.Indenter(**{x:-1*y for x,y in kw.items()})
+
+    # tag -> function(rml_flowable, node) returning an iterable of
+    # flowables, see register_flowable_tag
+    tags = {
+        'para': _create_para,
+        'shrinkFrame': _create_shrinkFrame,
+        'docpara': _create_docpara,
+        'nextOutput': _create_nextOutput,
+        'docexec': _create_docexec,
+        'ref': _create_ref,
+        'toc': _create_toc,
+        'name': _create_name,
+        'xpre': _create_xpre,
+        'pre': _create_pre,
+        'illustration': _create_illustration,
+        'blockTable': _create_blockTable,
+        'floatToEnd': _create_floatToEnd,
+        'keepTogether': _create_keepTogether,
+        'title': _create_title,
+        'h1': _create_heading,
+        'h2': _create_heading,
+        'h3': _create_heading,
+        'h4': _create_heading,
+        'h5': _create_heading,
+        'h6': _create_heading,
+        'image': _create_image,
+        'bookmark': _create_bookmark,
+        'pdfpage': _create_pdfpage,
+        'pdfpages': _create_pdfpages,
+        'spacer': _create_spacer,
+        'barCode': _create_barCode,
+        'myIndex': _create_myIndex,
+        'pageBreak': _create_pageBreak,
+        'condPageBreak': _create_condPageBreak,
+        'setNextTemplate': _create_setNextTemplate,
+        'nextFrame': _create_nextFrame,
+        'ul': _create_ul,
+        'hr': _create_hr,
+        'multicolumns': _create_multicolumns,
+        'indent': _create_indent,
+    }
 
     def render(self, node_story):
         story = []
@@ -977,25 +1364,134 @@ class RMLFlowable(object):
         return story
 
 
-@click.command()
+def register_flowable_tag(tag, create):
+    """render the story tag ``tag`` with ``create(rml_flowable, node)``
+
+    ``create`` returns an iterable of flowables. ``rml_flowable.styles``
+    holds the stylesheet, ``rml_flowable.render(node)`` returns the
+    flowables of the children of ``node``. a tag of rml is replaced.
+    """
+    RMLFlowable.tags[tag] = create
+
+
+def register_canvas_tag(tag, draw):
+    """draw the tag ``tag`` of page graphics and illustrations with
+    ``draw(rml_canvas, node)``, ``rml_canvas.canvas`` is the reportlab canvas"""
+    RMLCanvas.tags[tag] = draw
+
+
+def parseString(data, basepath=None, context=None, story=None, cache=None, limits=None, optimizer=None, image_dpi=None):
+    """render the rml document ``data`` and return the pdf as bytes"""
+    out = io.BytesIO()
+    RMLDoc(data, basepath, context).render(out, story=story, cache=cache, limits=limits, optimizer=optimizer, image_dpi=image_dpi)
+    return out.getvalue()
+
+
+class DefaultCommandGroup(click.Group):
+    """run the ``render`` command unless a subcommand is given, so
+    ``trml2pdf file.rml`` keeps working"""
+
+    def parse_args(self, ctx, args):
+        if args and args[0] not in self.commands and args[0] != '--help':
+            args = ['render'] + list(args)
+        return super(DefaultCommandGroup, self).parse_args(ctx, args)
+
+
+@click.group(cls=DefaultCommandGroup)
+def main():
+    pass
+
+
+@main.command()
 @click.option('-l','--log-level',default='WARNING')
 @click.argument('fromfile')
 @click.option('-o','--tofile')
-def main(fromfile,tofile,log_level):
+@click.option('--incremental',is_flag=True,help='write pages as soon as they are finished')
+@click.option('--stats','show_stats',is_flag=True,help='print timings and counters to stderr')
+@click.option('--trace',is_flag=True,help='print the wrap/split/drawOn calls per flowable to stderr')
+@click.option('--cache-dir',type=click.Path(file_okay=False),help='reuse pdfs rendered before from this directory')
+@click.option('--cache-size',default=256,type=int,help='size limit of the cache directory in MB')
+@click.option('--optimize','optimize_output',is_flag=True,help='store identical objects once and recompress streams after saving')
+@click.option('--zlib-level',default=9,type=click.IntRange(0,9),help='zlib level of --optimize')
+@click.option('--recompress-images',is_flag=True,help='let --optimize recompress flate images too')
+@click.option('--image-dpi',type=int,help='scale images down to this resolution for their size on the page')
+def render(fromfile,tofile,log_level,incremental,show_stats,trace,cache_dir,cache_size,optimize_output,zlib_level,recompress_images,image_dpi):
+    """render a rml file to pdf, - reads from stdin or writes to stdout"""
     logging.basicConfig(level=log_level)
-    from_path = os.path.abspath(fromfile)
-    with open(from_path,'rb') as i:
-        r = RMLDoc(i.read(),os.path.dirname(from_path))
+    if fromfile == '-':
+        r = RMLDoc(click.get_binary_stream('stdin'))
+    else:
+        r = RMLDoc(os.path.abspath(fromfile))
     if tofile is None:
-        to_path = '%s.pdf'%os.path.splitext(fromfile)[0]
+        tofile = '-' if fromfile == '-' else '%s.pdf'%os.path.splitext(fromfile)[0]
+    tracer = tracing.LayoutTracer() if trace else None
+    cache = None
+    if cache_dir:
+        cache = result_cache.ResultCache(cache_dir,cache_size*1024*1024)
+    optimizer = None
+    if optimize_output:
+        optimizer = optimize.Optimizer(level=zlib_level,images=recompress_images)
+    if tofile == '-':
+        render_stats = r.render(click.get_binary_stream('stdout'),incremental=incremental,tracer=tracer,cache=cache,optimizer=optimizer,image_dpi=image_dpi)
     else:
-        to_path = os.path.abspath(tofile)
-    with open(to_path,'wb') as o:
-        r.render(o)
+        with open(os.path.abspath(tofile),'wb') as o:
+            render_stats = r.render(o,incremental=incremental,tracer=tracer,cache=cache,optimizer=optimizer,image_dpi=image_dpi)
+    if show_stats:
+        click.echo(render_stats.format(),err=True)
+    if tracer is not None:
+        click.echo(tracer.report(),err=True)
 
 
-if __name__ == "__main__":
-    main()
+@main.command()
+@click.option('-l','--log-level',default='WARNING')
+@click.argument('fromfile')
+@click.argument('records',type=click.File('r'))
+@click.option('-o','--tofile',help='the merged pdf, by default next to the template, - for stdout')
+@click.option('--title',help='add an outline entry per record with the value of this field')
+@click.option('--stats','show_stats',is_flag=True,help='print timings and counters to stderr')
+@click.option('--image-dpi',type=int,help='scale images down to this resolution for their size on the page')
+def merge(fromfile,records,tofile,log_level,title,show_stats,image_dpi):
+    """render the story of a rml template once for every record of a
+    json lines file (- for stdin) into a single pdf"""
+    logging.basicConfig(level=log_level)
+    r = RMLDoc(os.path.abspath(fromfile))
+    if tofile is None:
+        tofile = '%s.pdf'%os.path.splitext(fromfile)[0]
+    rows = (json.loads(line) for line in records if line.strip())
+    title_get = None if title is None else (lambda record: str(record.get(title,'')))
+    if tofile == '-':
+        render_stats = r.merge(click.get_binary_stream('stdout'),rows,title=title_get,image_dpi=image_dpi)
+    else:
+        with open(os.path.abspath(tofile),'wb') as o:
+            render_stats = r.merge(o,rows,title=title_get,image_dpi=image_dpi)
+    if show_stats:
+        click.echo(render_stats.format(),err=True)
 
 
+@main.command()
+@click.option('-l','--log-level',default='WARNING')
+@click.argument('fromfile')
+@click.option('-o','--tofile',default='{name}.pdf',show_default=True,help='path of every output, {index} and {name} are filled in')
+@click.option('--records',type=click.File('r'),help='expand the story for every record of this json lines file (- for stdin)')
+@click.option('--name',help='the record field naming its output')
+@click.option('--stats','show_stats',is_flag=True,help='print timings and counters to stderr')
+@click.option('--image-dpi',type=int,help='scale images down to this resolution for their size on the page')
+def split(fromfile,tofile,log_level,records,name,show_stats,image_dpi):
+    """render a rml file into one pdf for every part of the story between
+    <nextOutput/> tags or for every record"""
+    logging.basicConfig(level=log_level)
+    r = RMLDoc(os.path.abspath(fromfile))
+    rows = None
+    if records is not None:
+        rows = (json.loads(line) for line in records if line.strip())
+    name_get = None if name is None else (lambda record: str(record.get(name,'')))
+    render_stats = r.split(tofile,rows,name=name_get,image_dpi=image_dpi)
+    if show_stats:
+        click.echo(render_stats.format(),err=True)
+
+
+main.add_command(serve)
 
+
+if __name__ == "__main__":
+    main()